@@ -10,24 +10,130 @@ When running train_queue.py, configuration changes are relative to this config.p
 
 When a run starts, this file is stored as a config.json file. To ensure easy restoration of
 parameters, please only use simple types such as string, ints, floats, tuples (no lists) and dicts.
+New attributes must also be declared in the __slots__ of their config class.
+Config snapshots can also be serialized using configs_to_json_bytes(...) and quickly restored
+using load_configs_json(...).
 """
 
 
-import datetime
+import copy
+import functools
+import hashlib
 import pathlib
-
-# The config_confidential.py file must be created by the user in the ./utils folder.
-# It must contain the following fields:
-#     data_root_path, logs_root_dir,
-#     comet_api_key, comet_project_name, comet_workspace
-from utils import config_confidential
+import warnings
+from typing import Tuple
+
+import utils.jsonio
+
+
+@functools.lru_cache(maxsize=1)
+def _load_confidential():
+    """ Imports the config_confidential module on first use only, such that code which never builds
+    a ModelConfig (offline eval, unit tests, ...) does not require this file. """
+    # The config_confidential.py file must be created by the user in the ./utils folder.
+    # It must contain the following fields:
+    #     data_root_path, logs_root_dir,
+    #     comet_api_key, comet_project_name, comet_workspace
+    from utils import config_confidential
+    return config_confidential
+
+
+class _DerivedAttribute:
+    """ Read-only config attribute, computed from other attributes and cached by the config instance.
+    Similar to functools.cached_property, which cannot be used with __slots__ classes. """
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return instance._derived_values[self.name]
+        except KeyError:
+            value = instance._derived_values[self.name] = self.func(instance)
+            return value
+
+
+class _BaseConfig:
+    """ Base class for ModelConfig and TrainConfig: derived attributes invalidation and (de)serialization.
+    Sub-classes use __slots__ (smaller instances, faster attributes access): all attributes set in __init__,
+    or later, must be declared in __slots__. """
+    __slots__ = ('_derived_values', )
+    # Derived attributes which must be re-computed when these attributes are re-assigned
+    _invalidated_attributes = dict()
+
+    def __new__(cls, *args, **kwargs):
+        instance = super().__new__(cls)
+        object.__setattr__(instance, '_derived_values', dict())
+        return instance
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        for derived_name in self._invalidated_attributes.get(name, ()):
+            self._derived_values.pop(derived_name, None)
+
+    @classmethod
+    def attributes_names(cls):
+        """ Names of all (non-derived) attributes, as declared in __slots__. """
+        return [name for c in reversed(cls.__mro__) for name in c.__dict__.get('__slots__', ())
+                if name != '_derived_values']
+
+    @classmethod
+    def derived_attributes_names(cls):
+        return [name for name in dir(cls) if isinstance(getattr(cls, name, None), _DerivedAttribute)]
+
+    def to_dict(self, include_derived=True):
+        """ Returns a shallow copy of this config's attributes. """
+        attributes = {k: getattr(self, k) for k in self.attributes_names() if hasattr(self, k)}
+        if include_derived:
+            attributes.update({k: getattr(self, k) for k in self.derived_attributes_names()})
+        return attributes
+
+    @classmethod
+    def from_dict(cls, attributes: dict):
+        """ Builds a config instance from a dict of attributes, without calling __init__ (which would
+        e.g. require the config_confidential file). Derived attributes are ignored (computed when read). """
+        instance = cls.__new__(cls)
+        instance.__setstate__(attributes)
+        return instance
+
+    def __getstate__(self):
+        return self.to_dict(include_derived=False)
+
+    def __setstate__(self, state: dict):
+        """ Also allows to unpickle configs which were pickled before __slots__ were used (state is the
+        former __dict__, which may contain derived or deprecated attributes). """
+        attributes_names, derived_names = set(self.attributes_names()), set(self.derived_attributes_names())
+        for k, v in state.items():
+            if k in attributes_names:
+                setattr(self, k, v)
+            elif k not in derived_names:
+                warnings.warn("Attribute '{}' is not available anymore in {}; it will be ignored"
+                              .format(k, type(self).__name__))
 
 
 # ===================================================================================================================
 # ================================================= Model configuration =============================================
 # ===================================================================================================================
-class ModelConfig:
+class ModelConfig(_BaseConfig):
+    __slots__ = ('data_root_path', 'logs_root_dir', 'name', 'run_name', 'pretrained_VAE_checkpoint',
+                 'allow_erase_run', 'comet_api_key', 'comet_project_name', 'comet_workspace',
+                 'comet_experiment_key', 'comet_tags', 'vae_main_conv_architecture',
+                 'vae_latent_extract_architecture', 'vae_latent_levels', 'audio_decoder_distribution',
+                 'attention_gamma', 'vae_preset_architecture', 'vae_preset_encode_add', 'preset_hidden_size',
+                 'preset_decoder_numerical_distribution', 'preset_ae_method', 'params_regression_architecture',
+                 'dim_z', 'approx_requested_dim_z', 'latent_flow_arch', 'note_duration', 'sampling_rate',
+                 'stft_args', 'mel_bins', 'spectrogram_size', 'mel_f_limits', 'required_dataset_midi_notes',
+                 'midi_notes', 'main_midi_note_index', 'stack_spectrograms', 'spectrogram_min_dB',
+                 'input_audio_tensor_size', 'synth', 'synth_args_str', 'synth_params_count', 'dataset_labels',
+                 'dataset_synth_args')
+    _invalidated_attributes = {'midi_notes': ('increased_dataset_size', 'concat_midi_to_z'),
+                               'stack_spectrograms': ('increased_dataset_size', 'concat_midi_to_z')}
+
     def __init__(self):
+        config_confidential = _load_confidential()
         # ----------------------------------------------- Data ---------------------------------------------------
         self.data_root_path = config_confidential.data_root_path
         self.logs_root_dir = config_confidential.logs_root_dir
@@ -107,7 +213,7 @@ class ModelConfig:
 
         # --------------------------------------------- Latent space -----------------------------------------------
         # If True, encoder output is reduced by 2 for 1 MIDI pitch and 1 velocity to be concat to the latent vector
-        self.concat_midi_to_z = None  # See update_dynamic_config_params() - FIXME deprecated
+        # self.concat_midi_to_z is a cached property, computed from midi notes - FIXME deprecated
         # Latent space dimension  ********* this dim is automatically set when using a Hierarchical VAE *************
         self.dim_z = -1
         self.approx_requested_dim_z = 256  # Hierarchical VAE will try to get close to this, will often be higher
@@ -143,14 +249,14 @@ class ModelConfig:
         self.stack_spectrograms = True  # If True, dataset will feed multi-channel spectrograms to the encoder
         # If True, each preset is presented several times per epoch (nb of train epochs must be reduced) such that the
         # dataset size is increased (6x bigger with 6 MIDI notes) -> warmup and patience epochs must be scaled
-        self.increased_dataset_size = None  # See update_dynamic_config_params()
+        # self.increased_dataset_size is a cached property, computed from midi notes and stack_spectrograms
         self.spectrogram_min_dB = -120.0
         self.input_audio_tensor_size = None  # see update_dynamic_config_params()
 
         # ---------------------------------- Synth (not used during pre-training) ----------------------------------
         self.synth = 'dexed'
-        # Dexed-specific auto rename: '*' in 'al*_op*_lab*' will be replaced by the actual algos, operators and labels
-        self.synth_args_str = 'al*_op*_lab*'  # Auto-generated string (see end of script)
+        # Dexed-specific summary of the dataset's algos, operators and labels ('*' if all used), e.g. 'al*_op123_lab*'
+        self.synth_args_str = None  # see update_dynamic_config_params()
         self.synth_params_count = -1  # Will be set automatically - see data.build.get_full_and_split_datasets
         # flags/values to describe the dataset to be used
         self.dataset_labels = None  # tuple of labels (e.g. ('harmonic', 'percussive')), or None to use all labels
@@ -160,16 +266,46 @@ class ModelConfig:
         self.dataset_synth_args = (None, [1, 2, 3, 4, 5, 6])
         # Directory for saving metrics, samples, models, etc... see README.md
 
+    @_DerivedAttribute
+    def increased_dataset_size(self):
+        return (len(self.midi_notes) > 1) and not self.stack_spectrograms
+
+    @_DerivedAttribute
+    def concat_midi_to_z(self):
+        return (len(self.midi_notes) > 1) and not self.stack_spectrograms
+
 
 # ===================================================================================================================
 # ======================================= Training procedure configuration ==========================================
 # ===================================================================================================================
-class TrainConfig:
+class TrainConfig(_BaseConfig):
+    __slots__ = ('pretrain_audio_only', 'evaluate_interpolation_after_training', 'start_datetime',
+                 'minibatch_size', 'main_cuda_device_idx', 'test_holdout_proportion', 'k_folds',
+                 'current_k_fold', 'start_epoch', 'n_epochs', 'pretrain_synths_max_imbalance_ratio',
+                 'attention_gamma_warmup_period', 'reconstruction_loss', 'latent_loss',
+                 'mmd_compensation_factor', 'mmd_num_estimates', 'normalize_losses', 'normalize_latent_loss',
+                 'beta', 'beta_start_value', 'beta_warmup_epochs', 'dkl_auto_gamma', 'latent_free_bits',
+                 'params_loss_compensation_factor', 'params_loss_exclude_useless',
+                 'params_loss_with_permutations', 'preset_CE_label_smoothing', 'preset_CE_use_weights',
+                 'preset_sched_sampling_max_p', 'preset_sched_sampling_warmup_epochs',
+                 'preset_alignment_criterion', 'optimizer', 'adam_betas', 'initial_learning_rate',
+                 'initial_audio_latent_lr_factor_after_pretrain', 'lr_warmup_epochs', 'lr_warmup_start_factor',
+                 'scheduler_name', 'scheduler_lr_factor', 'scheduler_period', 'scheduler_patience',
+                 'scheduler_cooldown', 'scheduler_threshold', 'early_stop_lr_ratio', 'weight_decay',
+                 'ae_fc_dropout', 'preset_cat_dropout', 'preset_internal_dropout', 'validate_period',
+                 'plot_period', 'large_plots_min_period', 'plot_epoch_0', 'verbosity', 'init_security_pause',
+                 'logged_samples_count', 'dataloader_pin_memory', 'dataloader_persistent_workers',
+                 'dataloader_prefetch_factor', 'dataloader_preload_spectrograms_max_GB', 'use_gds',
+                 'write_model_summary', 'use_channels_last', 'cudnn_benchmark', 'allow_tf32_matmul', 'use_amp',
+                 'profiler_enabled', 'profiler_epoch_to_record', 'profiler_kwargs', 'profiler_schedule_kwargs')
+    _invalidated_attributes = {'initial_learning_rate': ('early_stop_lr_threshold', ),
+                               'early_stop_lr_ratio': ('early_stop_lr_threshold', )}
+
     def __init__(self):
         self.pretrain_audio_only = False  # Should we pre-train the audio+latent parts of the auto-encoder model only?
         # Interpolation will be evaluated vs. a reference model, which must have been evaluated first
         self.evaluate_interpolation_after_training = True  # Parallel eval (long, CPU-intensive)
-        self.start_datetime = datetime.datetime.now().isoformat()
+        self.start_datetime = None  # Set when the run actually starts, see ensure_start_datetime()
 
         # 256 is okay for smaller conv structures - reduce to 64 to fit '_big' models into 24GB GPU RAM
         self.minibatch_size = 64  # reduce for big models - also smaller N seems to improve VAE pretraining perfs...
@@ -267,7 +403,7 @@ class TrainConfig:
         # Training considered "dead" when dynamic LR reaches this ratio of a the initial LR
         # Early stop is currently used for the regression loss only, for the 'ReduceLROnPlateau' scheduler only.
         self.early_stop_lr_ratio = 1e-4
-        self.early_stop_lr_threshold = None  # See update_dynamic_config_params()
+        # self.early_stop_lr_threshold is a cached property (dict of LR thresholds)
 
         # -------------------------------------------- Regularization -----------------------------------------------
         # WD definitely helps for regularization but significantly impairs results. 1e-4 seems to be a good compromise
@@ -289,20 +425,148 @@ class TrainConfig:
         self.logged_samples_count = 4  # See update_dynamic_config_params()
 
         # -------------------------------------- Performance and Profiling ------------------------------------------
-        self.dataloader_pin_memory = False
+        self.dataloader_pin_memory = False  # If True, minibatches are moved to the GPU asynchronously
         self.dataloader_persistent_workers = True
+        # Minibatches loaded in advance by each worker (see AudioDataset.recommended_loader_kwargs for usual values)
+        self.dataloader_prefetch_factor = 4
+        # Spectrograms stores are loaded into shared RAM if their total size is below this limit (0.0: disabled)
+        self.dataloader_preload_spectrograms_max_GB = 0.0
+        # Checkpoints weights moved directly between GPU memory and disk (GPUDirect Storage, requires torch.cuda.gds)
+        self.use_gds = False
+        self.write_model_summary = True  # Torchinfo summary (forward passes of all sub-models) written at epoch 0
+        # Conv weights and input spectrograms use the NHWC memory format (faster cuDNN kernels on recent GPUs)
+        self.use_channels_last = False
+        # Fastest conv algorithms are searched for each input shape, but results are not reproducible anymore
+        self.cudnn_benchmark = False
+        self.allow_tf32_matmul = False  # TF32 (10-bit mantissa) matmuls on Ampere+ GPUs (convs use TF32 by default)
+        self.use_amp = False  # bfloat16 autocast of the model's forward passes (no GradScaler required)
         self.profiler_enabled = False
         self.profiler_epoch_to_record = 0  # The profiler will record a few minibatches of this given epoch
         self.profiler_kwargs = {'record_shapes': True, 'with_stack': True}
         self.profiler_schedule_kwargs = {'skip_first': 5, 'wait': 1, 'warmup': 1, 'active': 3, 'repeat': 2}
 
+    def ensure_start_datetime(self):
+        """ Sets start_datetime to the current date and time, if it has not been set yet. """
+        if self.start_datetime is None:
+            import datetime
+            self.start_datetime = datetime.datetime.now().isoformat()
+        return self.start_datetime
+
+    @_DerivedAttribute
+    def early_stop_lr_threshold(self):
+        return {k: lr * self.early_stop_lr_ratio for k, lr in self.initial_learning_rate.items()}
+
+
+class ConfigOverlay:
+    """ Copy-on-write view of a base ModelConfig or TrainConfig: only modified attributes are stored by the overlay,
+    other attributes are read from the base config (which is never modified).
+    Used by train_queue.py to apply per-run modifications, without copying the base configs for each run. """
+    __slots__ = ('_base', '_overrides')
+
+    def __init__(self, base_config: _BaseConfig):
+        object.__setattr__(self, '_base', base_config)
+        object.__setattr__(self, '_overrides', dict())
+
+    def __getattr__(self, name):  # Called only if name is not found by the usual lookup (not a slot)
+        if name in self._overrides:
+            return self._overrides[name]
+        derived_attribute = getattr(type(self._base), name, None)
+        if isinstance(derived_attribute, _DerivedAttribute):  # Computed from this overlay's (modified) attributes
+            return derived_attribute.func(self)
+        value = getattr(self._base, name)
+        if isinstance(value, (list, dict)):  # Might be modified in-place: copied on first read
+            value = copy.deepcopy(value)
+            self._overrides[name] = value
+        return value
+
+    def __setattr__(self, name, value):
+        self._overrides[name] = value
+
+    def to_dict(self, include_derived=True):
+        attributes = {**self._base.to_dict(include_derived=False), **self._overrides}
+        if include_derived:
+            attributes.update({k: getattr(self, k) for k in self._base.derived_attributes_names()})
+        return attributes
+
+    def materialize(self):
+        """ Returns a new config instance (same class as the base config) with the modified attributes. """
+        attributes = {k: (copy.deepcopy(v) if isinstance(v, (list, dict)) else v)
+                      for k, v in self._base.to_dict().items() if k not in self._overrides}
+        config_instance = self._base.from_dict(attributes)
+        for k, v in self._overrides.items():  # setattr after base attributes: derived attributes invalidation
+            setattr(config_instance, k, v)
+        return config_instance
+
+
+_content_version_prefix = b'# content-version: '
+
+
+def _encode_json_value(v):
+    """ Converts a config attribute to a JSON-compatible value. Tuples are tagged, such that they
+    are not restored as lists. """
+    if isinstance(v, tuple):
+        return {'__tuple__': [_encode_json_value(x) for x in v]}
+    elif isinstance(v, list):
+        return [_encode_json_value(x) for x in v]
+    elif isinstance(v, dict):
+        return {k: _encode_json_value(x) for k, x in v.items()}
+    else:
+        return v
+
+
+def _decode_json_value(v):
+    if isinstance(v, list):
+        return [_decode_json_value(x) for x in v]
+    elif isinstance(v, dict):
+        if len(v) == 1 and '__tuple__' in v:
+            return tuple(_decode_json_value(x) for x in v['__tuple__'])
+        return {k: _decode_json_value(x) for k, x in v.items()}
+    else:
+        return v
+
+
+def configs_to_json_bytes(model_config: ModelConfig, train_config: TrainConfig) -> bytes:
+    """ Serializes both configs into a compact JSON object. The first line is a '# content-version: <sha1>'
+    header, such that the hash of the JSON body can be read without parsing it. """
+    body = utils.jsonio.dumps({'model': _encode_json_value(model_config.to_dict()),
+                               'train': _encode_json_value(train_config.to_dict())})
+    return _content_version_prefix + hashlib.sha1(body).hexdigest().encode() + b'\n' + body
+
+
+def configs_from_json_bytes(json_bytes: bytes) -> Tuple[ModelConfig, TrainConfig]:
+    """ Builds new config instances from bytes returned by configs_to_json_bytes(...). """
+    if json_bytes.startswith(_content_version_prefix):
+        json_bytes = json_bytes.split(b'\n', 1)[1]
+    return _configs_from_json_dict(utils.jsonio.loads(json_bytes))
+
 
+@functools.lru_cache(maxsize=8)
+def _parse_cached(hash_hex: str, path: str):
+    """ Parses the JSON body of a configs file. Results are cached by content hash (and path). """
+    with open(path, 'rb') as f:
+        f.readline()  # content-version header
+        return utils.jsonio.loads(f.read())
 
 
+def load_configs_json(path) -> Tuple[ModelConfig, TrainConfig]:
+    """ Loads configs from a file written using configs_to_json_bytes(...). Only the header line is read if
+    this file's content has already been parsed by this process. Returned configs can be freely modified. """
+    with open(path, 'rb') as f:
+        header = f.readline().rstrip(b'\n')
+    if not header.startswith(_content_version_prefix):
+        raise ValueError("'{}' does not start with a content-version header".format(path))
+    hash_hex = header[len(_content_version_prefix):].decode()
+    return _configs_from_json_dict(_parse_cached(hash_hex, str(path)))
+
+
+def _configs_from_json_dict(configs_dict: dict):
+    # Decoding builds new containers: the cached dict is never shared with the returned configs
+    return (ModelConfig.from_dict(_decode_json_value(configs_dict['model'])),
+            TrainConfig.from_dict(_decode_json_value(configs_dict['train'])))
+
 
 def update_dynamic_config_params(model_config: ModelConfig, train_config: TrainConfig):
     """ This function must be called before using any train attribute """
-
     # TODO perform config coherence checks in this function
 
     if train_config.pretrain_audio_only:
@@ -314,40 +578,36 @@ def update_dynamic_config_params(model_config: ModelConfig, train_config: TrainC
         train_config.lr_warmup_epochs = train_config.lr_warmup_epochs // 2
         train_config.lr_warmup_start_factor *= 2
     else:
-        train_config.initial_learning_rate['audio'] *= train_config.initial_audio_latent_lr_factor_after_pretrain
-        train_config.initial_learning_rate['latent'] *= train_config.initial_audio_latent_lr_factor_after_pretrain
+        # New dict (not modified in-place) such that derived attributes are invalidated
+        lr_factor = train_config.initial_audio_latent_lr_factor_after_pretrain
+        train_config.initial_learning_rate = {k: (lr * lr_factor if k in ['audio', 'latent'] else lr)
+                                              for k, lr in train_config.initial_learning_rate.items()}
 
     # stack_spectrograms must be False for 1-note datasets - security check
     model_config.stack_spectrograms = model_config.stack_spectrograms and (len(model_config.midi_notes) > 1)
-    # Artificially increased data size? FIXME remove - we'll always stack now
-    model_config.increased_dataset_size = (len(model_config.midi_notes) > 1) and not model_config.stack_spectrograms
-    model_config.concat_midi_to_z = (len(model_config.midi_notes) > 1) and not model_config.stack_spectrograms
+    # Artificially increased data size (model_config.increased_dataset_size) and concat_midi_to_z are now
+    # cached properties. FIXME remove - we'll always stack now
     # Mini-batch size can be smaller for the last mini-batches and/or during evaluation
     model_config.input_audio_tensor_size = \
         (train_config.minibatch_size, 1 if not model_config.stack_spectrograms else len(model_config.midi_notes),
          model_config.spectrogram_size[0], model_config.spectrogram_size[1])
 
     # Dynamic train hyper-params
-    train_config.early_stop_lr_threshold = {k: lr * train_config.early_stop_lr_ratio
-                                            for k, lr in train_config.initial_learning_rate.items()}
+    # train_config.early_stop_lr_threshold is a cached property
     train_config.logged_samples_count = max(train_config.logged_samples_count, len(model_config.midi_notes))
     # Train hyper-params (epochs counts) that should be increased when using a subset of the dataset
     if model_config.dataset_synth_args[0] is not None:  # Limited Dexed algorithms?  TODO handle non-dexed synth
-        train_config.n_epochs = 700
-        train_config.lr_warmup_epochs = 10
-        train_config.scheduler_patience = 10
-        train_config.scheduler_cooldown = 10
-        train_config.beta_warmup_epochs = 40
+        for attr_name, value in (('n_epochs', 700), ('lr_warmup_epochs', 10), ('scheduler_patience', 10),
+                                 ('scheduler_cooldown', 10), ('beta_warmup_epochs', 40)):
+            setattr(train_config, attr_name, value)
     # Train hyper-params (epochs counts) that should be reduced with artificially increased datasets
     # Augmented  datasets introduce 6x more backprops <=> 6x more epochs. Patience and cooldown must however remain >= 2
     if model_config.increased_dataset_size:  # Stacked spectrogram do not increase the dataset size (number of items)
         # FIXME handle the dicts
         N = len(model_config.midi_notes) - 1  # reduce a bit less that dataset's size increase
-        train_config.n_epochs = 1 + train_config.n_epochs // N
-        train_config.lr_warmup_epochs = 1 + train_config.lr_warmup_epochs // N
-        train_config.scheduler_patience = 1 + train_config.scheduler_patience // N
-        train_config.scheduler_cooldown = 1 + train_config.scheduler_cooldown // N
-        train_config.beta_warmup_epochs = 1 + train_config.beta_warmup_epochs // N
+        for attr_name in ('n_epochs', 'lr_warmup_epochs', 'scheduler_patience', 'scheduler_cooldown',
+                          'beta_warmup_epochs'):
+            setattr(train_config, attr_name, 1 + getattr(train_config, attr_name) // N)
 
     # Hparams that may be useless, depending on some other hparams
     if train_config.pretrain_audio_only or model_config.preset_ae_method != 'aligned_vaes':
@@ -355,15 +615,12 @@ def update_dynamic_config_params(model_config: ModelConfig, train_config: TrainC
 
     # Automatic model.synth string update - to summarize this info into 1 Tensorboard string hparam
     if model_config.synth == "dexed":
-        if model_config.dataset_synth_args[0] is not None:  # Algorithms
-            model_config.synth_args_str = model_config.synth_args_str.replace(
-                "al*", "al" + '.'.join([str(alg) for alg in model_config.dataset_synth_args[0]]))
-        if model_config.dataset_synth_args[1] is not None:  # Operators
-            model_config.synth_args_str = model_config.synth_args_str.replace(
-                "_op*", "_op" + ''.join([str(op) for op in model_config.dataset_synth_args[1]]))
-        if model_config.dataset_labels is not None:  # Labels
-            model_config.synth_args_str = model_config.synth_args_str.replace(
-                "_lab*", '_' + '_'.join([label[0:4] for label in model_config.dataset_labels]))
+        algos, operators = model_config.dataset_synth_args[0], model_config.dataset_synth_args[1]
+        labels = model_config.dataset_labels
+        al_str = '.'.join(map(str, algos)) if algos is not None else '*'
+        op_str = ''.join(map(str, operators)) if operators is not None else '*'
+        lab_str = '_'.join(label[0:4] for label in labels) if labels is not None else 'lab*'
+        model_config.synth_args_str = f"al{al_str}_op{op_str}_{lab_str}"
     else:
         raise NotImplementedError("Unknown synth prefix for model.synth '{}'".format(model_config.synth))
 
@@ -5,16 +5,17 @@ or a PresetDataset (with synthesis parameters).
 Only a few methods are abstract, most of the implementation is ready-to-use for various synths or audio datasets.
 """
 
+import functools
 import os
 import pathlib
 import pickle
 import shutil
+import sys
 import warnings
 from abc import ABC, abstractmethod  # Abstract Base Class
-from typing import Sequence, Optional, List, Dict, Tuple
+from typing import Sequence, Optional, List, Dict, Tuple, NamedTuple
 
 import pandas as pd
-import json
 from datetime import datetime
 import multiprocessing
 
@@ -23,12 +24,73 @@ import torch.utils
 import torch.utils.data
 import numpy as np
 
+import utils.jsonio
 import utils.torchspectrograms
 
 # See https://github.com/pytorch/audio/issues/903
 # torchaudio.set_audio_backend("sox_io")
 
 
+# Spectrograms stores loaded into shared memory (keys are store files paths). Module-level, such that
+# copies of a dataset (e.g. train/validation datasets, forked dataloader workers) share the same data.
+_preloaded_spectrograms_stores = dict()  # type: Dict[str, torch.Tensor]
+
+# Stores are built from many small arrays: writes are gathered into large chunks by the file object's buffer
+_store_write_buffer_size = 16 * 1024 * 1024
+
+
+def _save_tensor_file(t: torch.Tensor, file_path: pathlib.Path):
+    """ Saves a small CPU tensor as a raw .npy file (much less overhead than the zip+pickle format of torch.save) """
+    np.save(file_path, t.numpy())
+
+
+def _load_tensor_file(file_path: pathlib.Path) -> torch.Tensor:
+    """ Loads a tensor saved by _save_tensor_file (.npy file), or from a .pt file (older datasets). """
+    if file_path.suffix == '.pt':
+        # Files contain a single tensor: the restricted (faster and safer) unpickler can be used
+        return torch.load(file_path, map_location='cpu', weights_only=True)
+    return torch.from_numpy(np.load(file_path))
+
+
+def _get_tensor_files_suffix(npy_file_path: pathlib.Path) -> str:
+    """ Returns '.npy', or '.pt' if the given .npy file does not exist (older datasets). To be called once per
+    dataset (not for each item), with the path of any individual file of that dataset. """
+    return '.npy' if os.path.exists(npy_file_path) else '.pt'
+
+
+def _set_single_thread_worker():
+    """ Initializer of multiprocessing pool workers: each process handles its own subset of data using a single
+    thread, in order to avoid over-subscription of CPU cores by MKL and/or PyTorch intra-op threads. """
+    os.environ['OMP_NUM_THREADS'] = '1'
+    os.environ['MKL_NUM_THREADS'] = '1'
+    torch.set_num_threads(1)
+
+
+class SpecBatch(NamedTuple):
+    """ Item returned by an AudioDataset, or minibatch of such items (the default DataLoader collate function
+    keeps the NamedTuple type). All fields are tensors, such that all of them are pinned by DataLoaders built
+    with pin_memory=True. Pinned minibatches can then be moved using .to(device, non_blocking=True). """
+    spec: torch.Tensor
+    uid: torch.Tensor
+    notes: torch.Tensor
+    labels: torch.Tensor
+
+    def pin_memory(self):
+        return SpecBatch(*[t.pin_memory() for t in self])
+
+
+class PresetSpecBatch(NamedTuple):
+    """ Item returned by a PresetDataset (see SpecBatch), with a learnable preset tensor. """
+    spec: torch.Tensor
+    preset: torch.Tensor
+    uid: torch.Tensor
+    notes: torch.Tensor
+    labels: torch.Tensor
+
+    def pin_memory(self):
+        return PresetSpecBatch(*[t.pin_memory() for t in self])
+
+
 class AudioDataset(torch.utils.data.Dataset, ABC):
     def __init__(self, note_duration,
                  n_fft, fft_hop, Fs,
@@ -78,6 +140,7 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
         self.fft_hop = fft_hop
         self.Fs = Fs
         self.midi_notes = midi_notes
+        self._midi_notes_tensor = torch.tensor(self.midi_notes, dtype=torch.int32)  # Sliced by __getitem__
         if len(self.midi_notes) == 1:  # A 1-note dataset cannot handle multi-note stacked spectrograms
             assert not multichannel_stacked_spectrograms  # Check ctor arguments
         self._multichannel_stacked_spectrograms = multichannel_stacked_spectrograms
@@ -90,9 +153,10 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
             warnings.warn("Data will be generated and loaded from this script's folder")
         self._data_augmentation = data_augmentation
         self._random_seed = random_seed
-        self._rng = np.random.default_rng(seed=self._random_seed)
-        self._last_variation = -1
+        # Data augmentation RNG, (re-)seeded in each DataLoader worker process (see _pick_variation)
+        self._rng, self._rng_seed = None, None  # type: Optional[np.random.Generator], Optional[int]
         # - - - - - Attributes to be set by the child concrete class - - - - -
+        self._uid_to_index = None  # type: Optional[Dict[int, int]]
         self.valid_preset_UIDs = np.zeros((0,))  # UIDs (may be indexes) of valid presets for this dataset
         # - - - Spectrogram utility class - - -
         if self.n_mel_bins <= 0:
@@ -105,6 +169,21 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
         self.spectrogram_normalization = spectrogram_normalization
         # will be automatically assigned after regeneration of spectrograms
         self.spec_stats = None  # type: Optional[dict]
+        # Memory-mapped spectrograms store and its index: opened on first use (by each dataloader worker)
+        self._specs_memmap = None  # type: Optional[np.memmap]
+        self._specs_store_exists = None  # type: Optional[bool]  # Checked once, on first access
+        self._preload_spectrograms = False  # See preload_spectrograms_store
+        # Individual spectrogram files paths (no store available), built on first access
+        self._spec_files_paths = dict()  # type: Dict[Tuple[int, int, int, int], pathlib.Path]
+        self._spec_files_suffix = None  # type: Optional[str]  # Checked once, on first access
+        self._specs_store_index = None  # type: Optional[Dict[Tuple[int, int, int, int], Tuple[int, Tuple[int, ...]]]]
+
+    def __getstate__(self):
+        """ The memory-mapped spectrograms store must not be pickled (e.g. sent to spawned dataloader workers),
+        otherwise its whole content would be copied. It will be re-opened by the unpickled instance. """
+        state = self.__dict__.copy()
+        state['_specs_memmap'], state['_specs_store_index'] = None, None
+        return state
 
     @property
     @abstractmethod
@@ -130,39 +209,51 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
             return self.valid_presets_count * self.midi_notes_per_preset
 
     def __getitem__(self, i):
-        """ Returns a tuple containing :
+        """ Returns a SpecBatch named tuple containing :
                 - a 2D scaled dB spectrograms tensor (1st dim: MIDI note, 2nd dim: freq; 2rd dim: time),
                 - a 1d singleton tensor containing the preset UID
                 - a 2d tensor of MIDI notes (1st dim: MIDI note index, 2nd dim: pitch, velocity
                 - a 1d tensor of labels (0, 1 values)
         """
+        preset_UID, midi_note_indexes = self._get_preset_UID_and_midi_note_indexes(i)
+        return self._get_spectrograms_item(preset_UID, midi_note_indexes, self._pick_variation(preset_UID))
+
+    def _get_preset_UID_and_midi_note_indexes(self, i):
+        """ Returns the preset UID and the slice of MIDI notes indexes corresponding to dataset index i. """
         # If several notes available but single-spectrogram output: we have to convert i into a UID and a note index
         if self.midi_notes_per_preset > 1 and not self._multichannel_stacked_spectrograms:
             preset_index = i // self.midi_notes_per_preset
-            midi_note_indexes = [i % self.midi_notes_per_preset]
+            midi_note_indexes = slice(i % self.midi_notes_per_preset, i % self.midi_notes_per_preset + 1)
         else:
             preset_index = i
-            midi_note_indexes = range(self.midi_notes_per_preset)
-        # Load params and a list of spectrograms (1-element list is fine). 1 spectrogram per MIDI
-        preset_UID = self.valid_preset_UIDs[preset_index]
+            midi_note_indexes = slice(None)
+        return self.valid_preset_UIDs[preset_index], midi_note_indexes
+
+    def _pick_variation(self, preset_UID) -> int:
+        """ Returns a random data augmentation variation (the same variation is used for all notes). The RNG is
+        seeded from the seed of the current DataLoader worker process, such that forked workers do not all draw the
+        same 'random' variations. """
+        if not self._data_augmentation:
+            return 0
+        worker_info = torch.utils.data.get_worker_info()
+        worker_seed = self._random_seed if worker_info is None else worker_info.seed
+        if self._rng_seed != worker_seed:
+            self._rng, self._rng_seed = np.random.default_rng(seed=worker_seed), worker_seed
+        return int(self._rng.integers(0, self.get_nb_variations_per_note(preset_UID)))
+
+    def _get_spectrograms_item(self, preset_UID, midi_note_indexes: slice, variation: int):
+        # Load a list of spectrograms (1-element list is fine). 1 spectrogram per MIDI
         spectrograms = list()
         # TODO random noise added to spectrograms?
-        # The same variation is used for all notes (and is stored for child __getitem__ methods that call this one)
-        if self._data_augmentation:
-            self._last_variation = self._rng.integers(0, self.get_nb_variations_per_note(preset_UID))
-        else:
-            self._last_variation = 0
-        for midi_note_idx in midi_note_indexes:
-            midi_pitch, midi_vel = self.midi_notes[midi_note_idx]
+        for midi_pitch, midi_vel in self.midi_notes[midi_note_indexes]:
             # Spectrogram, or Mel-Spectrogram if requested (see ctor arguments)
-            spectrograms.append(torch.load(self.get_spec_file_path(
-                preset_UID, midi_pitch, midi_vel, self._last_variation)))
+            spectrograms.append(self.load_spectrogram(preset_UID, midi_pitch, midi_vel, variation))
 
         # Tuple output. Warning: torch.from_numpy does not copy values (torch.tensor(...) ctor does)
-        return torch.stack(spectrograms), \
-            torch.tensor(preset_UID, dtype=torch.int32), \
-            torch.tensor([self.midi_notes[i] for i in midi_note_indexes], dtype=torch.int32), \
-            self.get_labels_tensor(preset_UID)
+        return SpecBatch(torch.stack(spectrograms),
+                         torch.tensor(preset_UID, dtype=torch.int32),
+                         self._midi_notes_tensor[midi_note_indexes],  # View: will be copied by the collate fn
+                         self.get_labels_tensor(preset_UID))
 
     @property
     @abstractmethod
@@ -171,6 +262,15 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
         available presets in this dataset (some presets can be excluded from learning). """
         pass
 
+    @property
+    def valid_preset_UIDs(self):
+        return self._valid_preset_UIDs
+
+    @valid_preset_UIDs.setter
+    def valid_preset_UIDs(self, preset_UIDs):
+        self._valid_preset_UIDs = preset_UIDs
+        self._uid_to_index = None  # UID -> index dict will be re-built on next access
+
     @property
     def valid_presets_count(self):
         """ Total number of presets currently available from this dataset (presets that have not been invalidated). """
@@ -206,9 +306,10 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
 
     def get_index_from_preset_UID(self, preset_UID):
         """ Returns the dataset index (or list of indexes) of a preset described by its UID. """
-        try:
-            index_in_valid_list = list(self.valid_preset_UIDs).index(preset_UID)
-        except ValueError:
+        if self._uid_to_index is None:
+            self._uid_to_index = {int(uid): i for i, uid in enumerate(self.valid_preset_UIDs)}
+        index_in_valid_list = self._uid_to_index.get(int(preset_UID), None)
+        if index_in_valid_list is None:
             raise ValueError("Preset UID {} is not a valid preset UID (it might have been excluded from this dataset)"
                              .format(preset_UID))
         # Check: are there multiple MIDI notes per preset? (dataset size artificial increase)
@@ -246,6 +347,25 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
          different MIDI notes. """
         return self._multichannel_stacked_spectrograms
 
+    # ================================== DataLoader settings =================================
+
+    @staticmethod
+    def worker_init_fn(worker_id):
+        """ DataLoader worker initialization: seeds numpy's global RNG using the seed given by PyTorch to this
+        worker (otherwise, forked workers would share the same numpy global RNG state). The data augmentation RNG of
+        this class does not need this function (see _pick_variation). """
+        np.random.seed(torch.utils.data.get_worker_info().seed % (2 ** 32))
+
+    @classmethod
+    def recommended_loader_kwargs(cls, num_workers=8):
+        """ Returns known-good kwargs for a torch.utils.data.DataLoader of this dataset. Items are small and fast to
+        read from the spectrograms store, so workers' startup time (at each epoch, if not persistent) would dominate.
+        Workers prefetch a few minibatches, and minibatches are pinned for asynchronous host-to-device copies. """
+        if num_workers == 0:
+            return {'num_workers': 0, 'pin_memory': True}
+        return {'num_workers': num_workers, 'prefetch_factor': 4, 'persistent_workers': True, 'pin_memory': True,
+                'worker_init_fn': cls.worker_init_fn}
+
     # ================================== Labels =================================
 
     def get_labels_tensor(self, preset_UID):
@@ -253,6 +373,11 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
         corresponding label. """
         return torch.tensor([1], dtype=torch.int8)  # 'NoLabel' is the only default label
 
+    def get_labels_matrix(self, preset_UIDs: Sequence[int]) -> np.ndarray:
+        """ Returns a (N, L) int8 array of labels (see get_labels_tensor) for the given N preset UIDs.
+        Can be overridden by child classes which are able to gather labels of many presets more efficiently. """
+        return torch.stack([self.get_labels_tensor(preset_UID) for preset_UID in preset_UIDs]).cpu().numpy()
+
     def get_labels_name(self, preset_UID: int) -> List[str]:
         """ Returns the list of string labels assigned to a preset """
         return ['NoLabel']  # Default: all presets are tagged with this dummy label. Implement in concrete class
@@ -265,10 +390,10 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
         return "'{}'. {}".format(self.get_name_from_preset_UID(preset_UID, long_name=True),
                                  ', '.join(self.get_labels_name(preset_UID)))
 
-    @property
+    @functools.cached_property
     def available_labels_names(self):
         """ Returns a list of string description of labels if self._available_labels_path file exists,
-            otherwise returns a default 'NoLabel' string.
+            otherwise returns a default 'NoLabel' string. Loaded once, then cached (until save_labels is called).
         """
         try:
             with open(self._available_labels_path, 'rb') as f:
@@ -285,9 +410,8 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
         """ Returns the number of labelled samples (default 'NoLabel' excluded). """
         if self.available_labels_names == ['NoLabel']:
             return 0
-        # build numpy matrix from list of 1D tensors, then count non-zero for each row (columns axis)
-        labels_mat = [self.get_labels_tensor(preset_UID).cpu().numpy() for preset_UID in self.valid_preset_UIDs]
-        return (np.count_nonzero(np.asarray(labels_mat), axis=1) > 0).sum()
+        labels_mat = self.get_labels_matrix(self.valid_preset_UIDs)
+        return int(labels_mat.any(axis=1).sum())
 
     @abstractmethod
     def get_original_instrument_family(self, preset_UID: int) -> str:
@@ -306,6 +430,7 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
             raise ValueError("labels_names must be sorted")
         with open(self._available_labels_path, 'wb') as f:
             pickle.dump(labels_names, f)
+        self.__dict__.pop('available_labels_names', None)  # Invalidates the cached property
         # Per-UID labels are to be saved by the calling child class
 
     # ================================== WAV files =================================
@@ -342,9 +467,11 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
         """ Useful to delay a 'note-on' event of a few samples, using zeros at the beginning. """
         rng = np.random.default_rng(seed=random_seed)
         n_roll_samples = rng.integers(1, int(self.Fs * 0.002), endpoint=True)  # max 2ms delay
-        audio = np.roll(audio, n_roll_samples, axis=0)
-        audio[:n_roll_samples] = 0.0
-        return audio
+        # Single pass over the audio (np.roll would copy all samples, then some would be overwritten by zeros)
+        delayed_audio = np.empty_like(audio)
+        delayed_audio[:n_roll_samples] = 0.0
+        delayed_audio[n_roll_samples:] = audio[:audio.shape[0] - n_roll_samples]
+        return delayed_audio
 
     # ================================== Spectrograms (and spectrograms' stats) =================================
 
@@ -353,8 +480,7 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
         can depend on child class constructor arguments). """
         if self.spectrogram_normalization is not None:
             try:
-                f = open(self._spectrogram_stats_file, 'r')
-                self.spec_stats = json.load(f)
+                self.spec_stats = utils.jsonio.load(self._spectrogram_stats_file)
             except IOError:
                 self.spec_stats = None
                 raise FileNotFoundError("Cannot open '{}' spectrograms' stats file.".format(self._spectrogram_stats_file))
@@ -376,8 +502,116 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
         return self.data_storage_path.joinpath("Specs_{}".format(self._spectrogram_description))
 
     def get_spec_file_path(self, preset_UID, midi_note, midi_velocity, variation=0):
+        """ Path to an individual .npy spectrogram file. Those files are deleted after they have been gathered
+        into the spectrograms store (see _build_spectrograms_store). """
         return self._spectrograms_folder\
-            .joinpath('{}.pt'.format(self.get_audio_file_stem(preset_UID, midi_note, midi_velocity, variation) ))
+            .joinpath('{}.npy'.format(self.get_audio_file_stem(preset_UID, midi_note, midi_velocity, variation) ))
+
+    @property
+    def _spectrograms_store_dtype(self):
+        """ Normalized spectrograms are stored as float16 values (half the disk space and I/O bandwidth). Values
+        before normalization (dB, possibly large absolute values) are stored as float32. """
+        return np.float32 if self.spectrogram_normalization is None else np.float16
+
+    @property
+    def _spectrograms_store_file(self):
+        """ Single binary file containing all (normalized) spectrograms of this dataset. The storage dtype
+        is part of the file name. """
+        dtype_suffix = '_fp16' if self._spectrograms_store_dtype == np.float16 else ''
+        return self._spectrograms_folder.joinpath('spectrograms{}.bin'.format(dtype_suffix))
+
+    @property
+    def _spectrograms_store_index_file(self):
+        return self._spectrograms_folder.joinpath('spectrograms_index.npy')
+
+    def load_spectrogram(self, preset_UID, midi_note, midi_velocity, variation=0) -> torch.Tensor:
+        """ Returns a pre-computed (normalized) spectrogram, read from the memory-mapped spectrograms store
+        or from an individual file (datasets generated before the store was available). """
+        if self._specs_memmap is None:
+            if self._specs_store_exists is None:
+                self._specs_store_exists = os.path.exists(self._spectrograms_store_file)
+            if not self._specs_store_exists:
+                key = (int(preset_UID), midi_note, midi_velocity, variation)
+                file_path = self._spec_files_paths.get(key, None)
+                if file_path is None:
+                    file_path = self.get_spec_file_path(preset_UID, midi_note, midi_velocity, variation)
+                    if self._spec_files_suffix is None:
+                        self._spec_files_suffix = _get_tensor_files_suffix(file_path)
+                    file_path = file_path.with_suffix(self._spec_files_suffix)
+                    self._spec_files_paths[key] = file_path
+                return _load_tensor_file(file_path)
+            self._open_spectrograms_store()
+        offset, shape = self._specs_store_index[(int(preset_UID), midi_note, midi_velocity, variation)]
+        n_values = int(np.prod(shape))
+        # Copy from the (read-only) page cache into a new float32 tensor
+        return torch.from_numpy(np.array(self._specs_memmap[offset:offset + n_values], dtype=np.float32)
+                                .reshape(shape))
+
+    def _open_spectrograms_store(self):
+        index = np.load(self._spectrograms_store_index_file)
+        self._specs_store_index = {
+            (int(row['UID']), int(row['pitch']), int(row['vel']), int(row['variation'])):
+                (int(row['offset']), (int(row['height']), int(row['width'])))
+            for row in index
+        }
+        store_key = str(self._spectrograms_store_file)
+        if self._preload_spectrograms and store_key not in _preloaded_spectrograms_stores:
+            specs = np.fromfile(self._spectrograms_store_file, dtype=self._spectrograms_store_dtype)
+            _preloaded_spectrograms_stores[store_key] = torch.from_numpy(specs).share_memory_()
+        if self._preload_spectrograms:  # numpy view of the shared tensor
+            self._specs_memmap = _preloaded_spectrograms_stores[store_key].numpy()
+        else:
+            self._specs_memmap = np.memmap(self._spectrograms_store_file, dtype=self._spectrograms_store_dtype,
+                                           mode='r')
+
+    @property
+    def spectrograms_store_files(self) -> List[pathlib.Path]:
+        """ List of spectrograms store files used by this dataset (empty if the store has not been built). """
+        return [self._spectrograms_store_file] if os.path.exists(self._spectrograms_store_file) else []
+
+    def preload_spectrograms_store(self):
+        """ Loads the whole spectrograms store into shared memory, such that items are then read from RAM only.
+        Should be called before dataloader workers are created (forked workers will share the preloaded data,
+        spawned workers will load their own copy). """
+        if len(self.spectrograms_store_files) == 0:
+            warnings.warn("Spectrograms store {} not found: spectrograms cannot be preloaded"
+                          .format(self._spectrograms_store_file))
+            return
+        self._preload_spectrograms = True
+        self._open_spectrograms_store()
+
+    def _build_spectrograms_store(self):
+        """ Gathers all individual (un-normalized) .npy spectrogram files into a single binary file (and its .npy
+        index), then deletes the .npy files. Spectrograms are normalized using global stats while being gathered,
+        such that each spectrogram is written only once after stats have been computed. """
+        index = np.zeros((self.nb_valid_audio_files, ), dtype=[('UID', np.int64), ('pitch', np.int64),
+                                                              ('vel', np.int64), ('variation', np.int64),
+                                                              ('offset', np.int64), ('height', np.int64),
+                                                              ('width', np.int64)])
+        i, offset = 0, 0
+        tmp_store_file = self._spectrograms_store_file.with_suffix('.tmp')
+        with open(tmp_store_file, 'wb', buffering=_store_write_buffer_size) as f:
+            for preset_UID in self.valid_preset_UIDs:
+                for midi_note in self.midi_notes:
+                    pitch, vel = midi_note[0], midi_note[1]
+                    for variation in range(self.get_nb_variations_per_note(preset_UID)):
+                        file_path = self.get_spec_file_path(preset_UID, pitch, vel, variation)
+                        spectrogram = self.normalize_spectrogram(_load_tensor_file(file_path))
+                        spectrogram = spectrogram.numpy().astype(self._spectrograms_store_dtype)
+                        f.write(spectrogram)  # Contiguous array (from astype): written without a bytes copy
+                        index[i] = (preset_UID, pitch, vel, variation, offset, spectrogram.shape[0],
+                                    spectrogram.shape[1])
+                        offset += spectrogram.size
+                        i += 1
+        np.save(self._spectrograms_store_index_file, index)
+        os.replace(tmp_store_file, self._spectrograms_store_file)  # Atomic: the store is complete or does not exist
+        # Single scan of the (possibly huge) folder, no Path instance built for each entry
+        with os.scandir(self._spectrograms_folder) as dir_entries:
+            for entry in dir_entries:
+                if entry.name.endswith('.npy') and entry.name != self._spectrograms_store_index_file.name:
+                    os.remove(entry.path)
+        self._specs_memmap, self._specs_store_index = None, None  # Will be re-opened on next access
+        self._specs_store_exists = True
 
     @property
     def _spectrogram_stats_folder(self):
@@ -400,31 +634,46 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
     def _spectrogram_full_stats_file(self):
         return self._spectrogram_stats_folder.joinpath(self._spectrogram_description + '_full.csv')
 
+    @property
+    def spec_stats(self) -> Optional[dict]:
+        return self._spec_stats
+
+    @spec_stats.setter
+    def spec_stats(self, stats: Optional[dict]):
+        self._spec_stats = stats
+        # (normalization, scale, bias) tuple, will be re-computed on next access
+        self._normalization_scale_bias = None  # type: Optional[Tuple[str, float, float]]
+
+    def _get_normalization_scale_bias(self) -> Tuple[float, float]:
+        """ Returns (scale, bias) floats such that normalized_spectrogram = spectrogram * scale + bias.
+        Computed once from the spectrograms' stats (scalars can be used with tensors on any device). """
+        if self._normalization_scale_bias is None \
+                or self._normalization_scale_bias[0] != self.spectrogram_normalization:
+            if self.spectrogram_normalization is not None and self.spec_stats is None:
+                self._load_spectrogram_stats()
+            if self.spectrogram_normalization == 'min_max':  # result in [-1, 1]
+                scale = 2.0 / (self.spec_stats['max'] - self.spec_stats['min'])
+                bias = -1.0 - self.spec_stats['min'] * scale
+            elif self.spectrogram_normalization == 'mean_std':
+                scale = 1.0 / self.spec_stats['std']
+                bias = -self.spec_stats['mean'] * scale
+            else:
+                raise ValueError("Cannot perform spectrogram normalization '{}'"
+                                 .format(self.spectrogram_normalization))
+            self._normalization_scale_bias = (self.spectrogram_normalization, scale, bias)
+        return self._normalization_scale_bias[1], self._normalization_scale_bias[2]
+
     def normalize_spectrogram(self, spectrogram: torch.Tensor) -> torch.Tensor:
-        if self.spectrogram_normalization is not None and self.spec_stats is None:
-            self._load_spectrogram_stats()
-        if self.spectrogram_normalization == 'min_max':  # result in [-1, 1]
-            return -1.0 + (spectrogram - self.spec_stats['min'])\
-                   / ((self.spec_stats['max'] - self.spec_stats['min']) / 2.0)
-        elif self.spectrogram_normalization == 'mean_std':
-            return (spectrogram - self.spec_stats['mean']) / self.spec_stats['std']
-        elif self.spectrogram_normalization is None:
+        if self.spectrogram_normalization is None:
             return spectrogram
-        else:
-            raise ValueError("Cannot perform spectrogram normalization '{}'".format(self.spectrogram_normalization))
+        scale, bias = self._get_normalization_scale_bias()
+        return spectrogram.mul(scale).add_(bias)
 
     def denormalize_spectrogram(self, spectrogram: torch.Tensor) -> torch.Tensor:
-        if self.spectrogram_normalization is not None and self.spec_stats is None:
-            self._load_spectrogram_stats()
-        if self.spectrogram_normalization == 'min_max':  # result in [-1, 1]
-            return (spectrogram + 1.0) * ((self.spec_stats['max'] - self.spec_stats['min']) / 2.0)\
-                   + self.spec_stats['min']
-        elif self.spectrogram_normalization == 'mean_std':
-            return spectrogram * self.spec_stats['std'] + self.spec_stats['mean']
-        elif self.spectrogram_normalization is None:
+        if self.spectrogram_normalization is None:
             return spectrogram
-        else:
-            raise ValueError("Cannot undo spectrogram normalization '{}'".format(self.spectrogram_normalization))
+        scale, bias = self._get_normalization_scale_bias()
+        return spectrogram.sub(bias).div_(scale)
 
     def compute_and_store_spectrograms_and_stats(self):
         """ Pre-computes and stores all spectrograms from audio files (must have been rendered previously),
@@ -439,33 +688,43 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
         t_start = datetime.now()
         # 0) clear previous stats files
         self._init_specs_and_stats_files()
-        # 1) Compute and store spectrograms and stats
-        # MKL and/or PyTorch do not use hyper-threading, and it gives better results... don't use multi-proc here
-        #     -> single "batch" containing the full dataset
-        full_stats = self._compute_and_store_spectrograms_and_stats_batch(self.valid_preset_UIDs)
+        # 1) Compute and store spectrograms and stats - multi-processed, each worker writes its own .npy files
+        if sys.gettrace() is None:  # if No PyCharm debugger
+            num_workers = os.cpu_count()
+            split_preset_UIDs = np.array_split(self.valid_preset_UIDs, num_workers)
+            with multiprocessing.get_context('spawn').Pool(num_workers, initializer=_set_single_thread_worker) as p:
+                split_full_stats = p.map(self._compute_and_store_spectrograms_and_stats_batch, split_preset_UIDs)
+            full_stats = {k: np.concatenate([stats[k] for stats in split_full_stats]) for k in split_full_stats[0]}
+        else:  # Debugging
+            num_workers = 1
+            full_stats = self._compute_and_store_spectrograms_and_stats_batch(self.valid_preset_UIDs)
         delta_t = (datetime.now() - t_start).total_seconds()
-        print("Finished generating {} spectrograms ({:.1f} min total, {:.1f}ms/spec)"
-              .format(self.nb_valid_audio_files, delta_t / 60.0, 1000.0 * delta_t / self.nb_valid_audio_files))
+        print("Finished generating {} spectrograms ({:.1f} min total, {:.1f}ms/spec using {} CPUs)"
+              .format(self.nb_valid_audio_files, delta_t / 60.0, 1000.0 * delta_t / self.nb_valid_audio_files,
+                      num_workers))
         self._store_spectrograms_stats(full_stats)
-        # 2) Normalize spectrograms
+        # 2) Normalize and gather all spectrograms into a single memory-mapped file
         print("Normalization of all rendered spectrogram....")
-        self._normalize_spectrograms()
+        self._build_spectrograms_store()
         # 3) Final display
         delta_t = (datetime.now() - t_start).total_seconds()
-        print("{} spectrograms processed and stored as .pt files (({:.1f} min total, {:.1f}ms/spec) \n"
+        print("{} spectrograms processed and stored into {} (({:.1f} min total, {:.1f}ms/spec) \n"
               "Location: {}\n"
               "Stats (before normalization) written _full.csv and .json files ({}) "
-              .format(self.nb_valid_audio_files, delta_t / 60.0, 1000.0 * delta_t / self.nb_valid_audio_files,
+              .format(self.nb_valid_audio_files, self._spectrograms_store_file.name, delta_t / 60.0,
+                      1000.0 * delta_t / self.nb_valid_audio_files,
                       self._spectrograms_folder, self._spectrogram_description))
 
     def _compute_and_store_spectrograms_and_stats_batch(self, preset_UIDs):
         """ Generates and stores spectrogram tensors, and returns a dict of spectrograms' stats
         using the given list of preset UIDs. """
-        full_stats = {'UID': np.zeros((self.nb_valid_audio_files,), dtype=np.int),
-                      'min': np.zeros((self.nb_valid_audio_files,)), 'max': np.zeros((self.nb_valid_audio_files,)),
-                      'mean': np.zeros((self.nb_valid_audio_files,)), 'var': np.zeros((self.nb_valid_audio_files,))}
+        nb_files = sum([len(self.midi_notes) * self.get_nb_variations_per_note(UID) for UID in preset_UIDs])
+        full_stats = {'UID': np.zeros((nb_files,), dtype=np.int64), 'min': np.zeros((nb_files,)),
+                      'max': np.zeros((nb_files,)), 'mean': np.zeros((nb_files,)), 'var': np.zeros((nb_files,))}
         i = 0
-        for preset_UID in self.valid_preset_UIDs:
+        for preset_UID in preset_UIDs:
+            # All notes and variations of a preset are processed as a single batch of waveforms
+            spec_files_paths, wavs = list(), list()
             for midi_note in self.midi_notes:
                 pitch, vel = midi_note[0], midi_note[1]
                 for variation in range(self.get_nb_variations_per_note(preset_UID)):
@@ -473,14 +732,27 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
                     if Fs != self.Fs:
                         raise ValueError("Wrong sampling frequency ({} instead of {}} preset UID = {}"
                                          .format(Fs, self.Fs, preset_UID))
-                    tensor_spectrogram = self.compute_spectrogram(x_wav)
-                    torch.save(tensor_spectrogram, self.get_spec_file_path(preset_UID, pitch, vel, variation))
-                    full_stats['UID'][i] = preset_UID
-                    full_stats['min'][i] = torch.min(tensor_spectrogram).item()
-                    full_stats['max'][i] = torch.max(tensor_spectrogram).item()
-                    full_stats['var'][i] = torch.var(tensor_spectrogram).item()
-                    full_stats['mean'][i] = torch.mean(tensor_spectrogram, dim=(0, 1)).item()
-                    i += 1
+                    wavs.append(x_wav)
+                    spec_files_paths.append(self.get_spec_file_path(preset_UID, pitch, vel, variation))
+            if all(len(x_wav) == len(wavs[0]) for x_wav in wavs):
+                batch_wavs = np.empty((len(wavs), len(wavs[0])), dtype=np.float32)
+                for j, x_wav in enumerate(wavs):
+                    batch_wavs[j, :] = x_wav
+                spectrograms = self.compute_spectrogram(batch_wavs)
+            else:  # Waveforms can't be zero-padded to the same length: spectrograms would be different
+                spectrograms = torch.stack([self.compute_spectrogram(x_wav) for x_wav in wavs])
+            for j, tensor_spectrogram in enumerate(torch.unbind(spectrograms, dim=0)):
+                _save_tensor_file(tensor_spectrogram, spec_files_paths[j])
+            # 2 fused reductions, and a single device-to-host copy of all stats for this batch
+            flat_spectrograms = spectrograms.reshape(spectrograms.shape[0], -1)
+            specs_min, specs_max = torch.aminmax(flat_spectrograms, dim=1)
+            specs_var, specs_mean = torch.var_mean(flat_spectrograms, dim=1)
+            specs_stats = torch.stack([specs_min, specs_max, specs_var, specs_mean]).cpu().numpy()
+            n_specs = spectrograms.shape[0]
+            full_stats['UID'][i:i+n_specs] = preset_UID
+            full_stats['min'][i:i+n_specs], full_stats['max'][i:i+n_specs] = specs_stats[0], specs_stats[1]
+            full_stats['var'][i:i+n_specs], full_stats['mean'][i:i+n_specs] = specs_stats[2], specs_stats[3]
+            i += n_specs
         return full_stats
 
     def _init_specs_and_stats_files(self):
@@ -505,27 +777,15 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
         full_stats = pd.DataFrame(full_stats)
         full_stats.to_csv(self._spectrogram_full_stats_file)
         self.spec_stats = dataset_stats
-        with open(self._spectrogram_stats_file, 'w') as f:
-            json.dump(dataset_stats, f)
-
-    def _normalize_spectrograms(self):
-        """ Loads all pre-computed spectrograms, normalizes them using global stats,
-         and writes normalized spectrogram over the pre-computed ones. """
-        for preset_UID in self.valid_preset_UIDs:
-            for midi_note in self.midi_notes:
-                pitch, vel = midi_note[0], midi_note[1]
-                for variation in range(self.get_nb_variations_per_note(preset_UID)):
-                    file_path = self.get_spec_file_path(preset_UID, pitch, vel, variation)
-                    tensor_spectrogram = torch.load(file_path)
-                    tensor_spectrogram = self.normalize_spectrogram(tensor_spectrogram)
-                    torch.save(tensor_spectrogram.clone(), file_path)
+        utils.jsonio.dump(dataset_stats, self._spectrogram_stats_file)
 
     def _delete_all_spectrogram_data(self, verbose=True):
         """ Removes all folders containing spectrogram data.
         Intended to be called if new audio data has been generated. """
         if verbose:
             print("Removing all pre-computed spectrograms data...")
-        dirs_to_del = [d for d in self.data_storage_path.glob("Specs_*") if d.is_dir()]
+        with os.scandir(self.data_storage_path) as dir_entries:  # DirEntry.is_dir(): no extra stat syscall
+            dirs_to_del = [pathlib.Path(e.path) for e in dir_entries if e.name.startswith("Specs_") and e.is_dir()]
         for d in dirs_to_del:
             shutil.rmtree(d)
             if verbose:
@@ -544,18 +804,18 @@ class AudioDataset(torch.utils.data.Dataset, ABC):
         
         This method is intended to be used by a subset sampler building method. Those invalid presets should NEVER
          be removed before building the train/validation/test subsets, otherwise the subsets would be mixed. """
-        specs_full_stats = pd.read_csv(self._spectrogram_full_stats_file)
+        # Other (unused) columns are not parsed
+        specs_full_stats = pd.read_csv(self._spectrogram_full_stats_file, usecols=['UID', 'max'],
+                                       dtype={'UID': np.int64, 'max': np.float32})
         specs_zero_volume_stats = specs_full_stats[np.isclose(specs_full_stats['max'], self.compute_spectrogram.min_dB)]
         UIDs_to_exclude = set(specs_zero_volume_stats['UID'].values)
-        indices_to_exclude = list()
-        for UID in UIDs_to_exclude:
-            idx = np.where(np.asarray(self.valid_preset_UIDs) == UID)[0]
-            if len(idx) == 0:
-                warnings.warn("Preset UID={} is zero-volume but is not part of this dataset (UID cannot be found)"
-                              .format(UID))
-            else:
-                indices_to_exclude.append(idx.item())
-        return indices_to_exclude
+        valid_UIDs = np.asarray(self.valid_preset_UIDs)
+        mask = np.isin(valid_UIDs, np.fromiter(UIDs_to_exclude, dtype=valid_UIDs.dtype, count=len(UIDs_to_exclude)))
+        missing_UIDs = UIDs_to_exclude - set(valid_UIDs[mask].tolist())
+        if len(missing_UIDs) > 0:
+            warnings.warn("Preset UIDs {} are zero-volume but are not part of this dataset (UIDs cannot be found)"
+                          .format(sorted(missing_UIDs)))
+        return np.where(mask)[0].tolist()
 
 
 class PresetDataset(AudioDataset):
@@ -580,6 +840,15 @@ class PresetDataset(AudioDataset):
                          n_mel_bins, mel_fmin, mel_fmax, normalize_audio, spectrogram_min_dB, spectrogram_normalization,
                          data_storage_root_path, random_seed, data_augmentation)
         self.learn_mod_wheel_params = learn_mod_wheel_params
+        # Learnable presets store (fully loaded into RAM) and its index: loaded on first use
+        self._presets_array = None  # type: Optional[np.ndarray]
+        self._presets_store_exists = None  # type: Optional[bool]  # Checked once, on first access
+        self._presets_store_index = None  # type: Optional[Dict[Tuple[int, int], Tuple[int, Tuple[int, ...]]]]
+        self._learnable_preset_files_paths = dict()  # type: Dict[Tuple[int, int], pathlib.Path]
+        self._learnable_preset_files_suffix = None  # type: Optional[str]  # Checked once, on first access
+        self._total_nb_variations = None  # type: Optional[int]  # Constant, computed on first use
+        # (preset_variation, audio_delay) for each variation index, built on first use (see _get_variation_args)
+        self._variation_args_table = None  # type: Optional[List[Tuple[int, int]]]
         # - - - - - Attributes to be set by the child concrete class - - - - -
         self.learnable_params_idx = list()  # Indexes of learnable VSTi params (some params may be constant or unused)
 
@@ -591,13 +860,14 @@ class PresetDataset(AudioDataset):
                     self._nb_audio_delay_variations_per_note, self._nb_preset_variations_per_note)
 
     def __getitem__(self, i):
-        spectrograms, uid_tensor, notes, labels = super().__getitem__(i)
-        preset_UID = uid_tensor.item()
-        preset_variation, audio_delay = self._get_variation_args(self._last_variation)
+        preset_UID, midi_note_indexes = self._get_preset_UID_and_midi_note_indexes(i)
+        variation = self._pick_variation(preset_UID)
+        spectrograms, uid_tensor, notes, labels = self._get_spectrograms_item(preset_UID, midi_note_indexes, variation)
+        preset_variation, audio_delay = self._get_variation_args(variation)
 
         # pre-computed learnable representations (otherwise: +300% __getitem__ time vs. spectrogram only)
-        preset_params = torch.load(self._get_learnable_preset_file_path(preset_UID, preset_variation))
-        return spectrograms, preset_params, uid_tensor, notes, labels
+        preset_params = self.load_learnable_preset(preset_UID, preset_variation)
+        return PresetSpecBatch(spectrograms, preset_params, uid_tensor, notes, labels)
 
     @abstractmethod
     def get_full_preset_params(self, preset_UID, preset_variation=0):
@@ -671,9 +941,8 @@ class PresetDataset(AudioDataset):
 
     @property
     def learnable_params_tensor_shape(self):
-        """ Shape of a learnable parameters tensor. """
-        item = self.__getitem__(0)  # future FIXME: corriger ça quand
-        return item[1].shape
+        """ Shape of a learnable parameters tensor (no data is loaded from the disk). """
+        return self.preset_indexes_helper.matrix_shape
 
     @property
     def vst_param_learnable_model(self):
@@ -706,7 +975,50 @@ class PresetDataset(AudioDataset):
         return self.data_storage_path.joinpath("LearnableTensorPresets")
 
     def _get_learnable_preset_file_path(self, preset_UID, preset_variation):
-        return self._learnable_preset_folder.joinpath("{:06d}_pvar{:03d}.pt".format(preset_UID, preset_variation))
+        """ Path to an individual learnable preset file (datasets generated before the presets store was available).
+        """
+        return self._learnable_preset_folder.joinpath("{:06d}_pvar{:03d}.npy".format(preset_UID, preset_variation))
+
+    @property
+    def _learnable_presets_store_file(self):
+        """ Single binary file containing all float32 learnable presets (all variations) of this dataset.
+        It is small enough (a few tens of MB) to be fully loaded into RAM. """
+        return self._learnable_preset_folder.joinpath('learnable_presets.bin')
+
+    @property
+    def _learnable_presets_store_index_file(self):
+        return self._learnable_preset_folder.joinpath('learnable_presets_index.npy')
+
+    def load_learnable_preset(self, preset_UID, preset_variation) -> torch.Tensor:
+        """ Returns a pre-computed learnable preset tensor, read from the in-RAM learnable presets store
+        or from an individual file (datasets generated before the store was available). """
+        if self._presets_array is None:
+            if self._presets_store_exists is None:
+                self._presets_store_exists = os.path.exists(self._learnable_presets_store_file)
+            if not self._presets_store_exists:
+                file_path = self._learnable_preset_files_paths.get((int(preset_UID), preset_variation), None)
+                if file_path is None:  # Paths are built once (pathlib and string formatting are slow for __getitem__)
+                    file_path = self._get_learnable_preset_file_path(preset_UID, preset_variation)
+                    if self._learnable_preset_files_suffix is None:
+                        self._learnable_preset_files_suffix = _get_tensor_files_suffix(file_path)
+                    file_path = file_path.with_suffix(self._learnable_preset_files_suffix)
+                    self._learnable_preset_files_paths[(int(preset_UID), preset_variation)] = file_path
+                return _load_tensor_file(file_path)
+            self._open_learnable_presets_store()
+        offset, shape = self._presets_store_index[(int(preset_UID), preset_variation)]
+        n_values = int(np.prod(shape))
+        # Copy, such that the returned tensor can be modified
+        return torch.from_numpy(self._presets_array[offset:offset + n_values].reshape(shape).copy())
+
+    def _open_learnable_presets_store(self):
+        index = np.load(self._learnable_presets_store_index_file)
+        self._presets_store_index = {
+            (int(row['UID']), int(row['variation'])): (int(row['offset']), (int(row['height']), int(row['width'])))
+            for row in index
+        }
+        # Not memory-mapped: no disk access at all after this (the array is also kept by copies of this dataset,
+        # e.g. train/validation datasets or dataloader workers)
+        self._presets_array = np.fromfile(self._learnable_presets_store_file, dtype=np.float32)
 
     @property
     def _learnable_presets_cat_params_stats_file(self):
@@ -730,29 +1042,21 @@ class PresetDataset(AudioDataset):
         if os.path.exists(self._learnable_preset_folder):
             shutil.rmtree(self._learnable_preset_folder)
         os.makedirs(self._learnable_preset_folder)
-        # dict for storing nb of samples for each class (categorical-learned params only)
-        cat_params_samples_per_class = dict()
-        # FIXME
-        for vst_index, learn_model in enumerate(self.vst_param_learnable_model):
-            if learn_model == 'cat':
-                cat_params_samples_per_class[vst_index] \
-                    = np.zeros(self.get_preset_param_cardinality(vst_index), dtype=int)
-        # Compute and store presets (learnable representation)  FIXME ALL OF THIS
-        for preset_UID in self.valid_preset_UIDs:
-            for preset_var in range(self._nb_preset_variations_per_note):
-                preset_params = self.get_full_preset_params(preset_UID, preset_variation=preset_var)
-                preset_tensor = preset_params.to_learnable_tensor()
-                # stats about classes for each cat-encoded synth parameter (for all variations)
-                for vst_idx in cat_params_samples_per_class:
-                    row = self.preset_indexes_helper._vst_idx_to_matrix_row[vst_idx]
-                    class_idx = int(preset_tensor[row, 0].item())
-                    cat_params_samples_per_class[vst_idx][class_idx] += 1
-                # FIXME DUMMY TEST
-                from data.preset2d import Preset2d
-                p = Preset2d(self, learnable_tensor_preset=preset_tensor)
-                r = p.to_raw()
-                # END FIXME
-                torch.save(preset_tensor.clone(), self._get_learnable_preset_file_path(preset_UID, preset_var))
+        # Compute presets (learnable representation) - multi-processed, results are gathered by this process
+        if sys.gettrace() is None:  # if No PyCharm debugger
+            num_workers = os.cpu_count()
+            split_preset_UIDs = np.array_split(self.valid_preset_UIDs, num_workers)
+            with multiprocessing.get_context('spawn').Pool(num_workers, initializer=_set_single_thread_worker) as p:
+                split_results = p.map(self._compute_learnable_presets_batch, split_preset_UIDs)
+        else:  # Debugging
+            split_results = [self._compute_learnable_presets_batch(self.valid_preset_UIDs)]
+        # nb of samples for each class (categorical-learned params only): sum of all batches, then converted to a
+        # dict for storing (keys are VST param indices)
+        cat_params_samples_counts = np.sum([batch_counts for _, batch_counts in split_results], axis=0)
+        cat_vst_indexes, cat_offsets = self._get_cat_learned_params_offsets()
+        cat_params_samples_per_class = {vst_idx: cat_params_samples_counts[cat_offsets[j]:cat_offsets[j + 1]]
+                                        for j, vst_idx in enumerate(cat_vst_indexes)}
+        self._write_learnable_presets_store([preset for batch_presets, _ in split_results for preset in batch_presets])
         # store classes samples counts
         with open(self._learnable_presets_cat_params_stats_file, 'wb') as f:
             pickle.dump(cat_params_samples_per_class, f)
@@ -763,6 +1067,59 @@ class PresetDataset(AudioDataset):
                   "file.".format(delta_t/60.0, len(self.valid_preset_UIDs), self._nb_preset_variations_per_note,
                                  1000.0*delta_t/(len(self.valid_preset_UIDs)*self._nb_preset_variations_per_note)))
 
+    def _write_learnable_presets_store(self, presets: List[Tuple[int, int, np.ndarray]]):
+        """ Writes the given (preset_UID, preset_variation, float32 learnable preset array) tuples into a single
+        binary file, and its .npy index. """
+        index = np.zeros((len(presets), ), dtype=[('UID', np.int64), ('variation', np.int64), ('offset', np.int64),
+                                                  ('height', np.int64), ('width', np.int64)])
+        offset = 0
+        tmp_store_file = self._learnable_presets_store_file.with_suffix('.tmp')
+        with open(tmp_store_file, 'wb', buffering=_store_write_buffer_size) as store_f:
+            for i, (preset_UID, preset_var, preset_array) in enumerate(presets):
+                store_f.write(np.ascontiguousarray(preset_array))  # No bytes copy if already contiguous
+                index[i] = (preset_UID, preset_var, offset, preset_array.shape[0], preset_array.shape[1])
+                offset += preset_array.size
+        np.save(self._learnable_presets_store_index_file, index)
+        # Atomic: the store is complete or does not exist
+        os.replace(tmp_store_file, self._learnable_presets_store_file)
+        self._presets_array, self._presets_store_index = None, None  # Will be re-loaded on next access
+        self._presets_store_exists = True
+
+    def _compute_learnable_presets_batch(self, preset_UIDs):
+        """ Computes the learnable presets (all variations) of the given preset UIDs.
+
+        :returns: A list of (preset_UID, preset_variation, float32 learnable preset array) tuples, and a 1D array of
+            samples count for each class of each categorical-learned synth param (see
+            _get_cat_learned_params_offsets).
+        """
+        # Categorical-learned params only: VST indexes and corresponding rows of learnable presets
+        cat_vst_indexes, cat_offsets = self._get_cat_learned_params_offsets()
+        cat_rows = [self.preset_indexes_helper._vst_idx_to_matrix_row[vst_idx] for vst_idx in cat_vst_indexes]
+        presets = list()
+        # FIXME ALL OF THIS
+        for preset_UID in preset_UIDs:
+            for preset_var in range(self._nb_preset_variations_per_note):
+                preset_params = self.get_full_preset_params(preset_UID, preset_variation=preset_var)
+                preset_tensor = preset_params.to_learnable_tensor()
+                presets.append((int(preset_UID), preset_var, preset_tensor.numpy().astype(np.float32)))
+        # stats about classes for each cat-encoded synth parameter (for all variations): class indexes of all presets
+        # (1 row per preset, 1 column per cat-learned param), then nb of samples for each class
+        cat_classes = np.asarray([preset_array[cat_rows, 0] for _, _, preset_array in presets],
+                                 dtype=np.int64).reshape((len(presets), len(cat_rows)))
+        cat_samples_counts = np.zeros((cat_offsets[-1], ), dtype=np.int64)
+        for j in range(len(cat_vst_indexes)):
+            cat_samples_counts[cat_offsets[j]:cat_offsets[j + 1]] \
+                = np.bincount(cat_classes[:, j], minlength=cat_offsets[j + 1] - cat_offsets[j])
+        return presets, cat_samples_counts
+
+    def _get_cat_learned_params_offsets(self):
+        """ Returns the VST indices of categorical-learned params, and the offsets of their classes in a flat
+        array of all classes of all these params (the last offset is the total number of classes). """
+        cat_vst_indexes = [vst_index for vst_index, learn_model in enumerate(self.vst_param_learnable_model)
+                           if learn_model == 'cat']
+        cardinalities = [self.get_preset_param_cardinality(vst_idx) for vst_idx in cat_vst_indexes]
+        return cat_vst_indexes, np.concatenate([[0], np.cumsum(cardinalities, dtype=np.int64)])
+
 
     # ================================== Constraints (on presets' parameters) =================================
 
@@ -777,25 +1134,25 @@ class PresetDataset(AudioDataset):
         return self.data_storage_path.joinpath("audio_render_constraints_file.json")
 
     def write_audio_render_constraints_file(self):
-        with open(self.audio_constraints_file_path, 'w') as f:
-            json.dump(self.audio_constraints, f)
+        utils.jsonio.dump(self.audio_constraints, self.audio_constraints_file_path)
 
     def check_audio_render_constraints_file(self):
         """ Raises a RuntimeError if the constraints used to pre-rendered audio are different from
         this instance constraints (e.g. S&H locked, filter/tune general params, ...) """
-        with open(self.audio_constraints_file_path, 'r') as f:
-            rendered_constraints = json.load(f)
-            for k, v in self.audio_constraints.items():
-                if rendered_constraints[k] != v:
-                    raise ValueError("Rendered audio does not correspond to this dataset's configuration. Bad value "
-                                     "for constraint '{}' (expected: {} ; rendered audio files: {})"
-                                     .format(k, v, rendered_constraints[k]))
+        rendered_constraints = utils.jsonio.load(self.audio_constraints_file_path)
+        for k, v in self.audio_constraints.items():
+            if rendered_constraints[k] != v:
+                raise ValueError("Rendered audio does not correspond to this dataset's configuration. Bad value "
+                                 "for constraint '{}' (expected: {} ; rendered audio files: {})"
+                                 .format(k, v, rendered_constraints[k]))
 
     # ========================== Data augmentation: presets variations + audio delays =========================
 
     def get_nb_variations_per_note(self, preset_UID=-1):
         # Same number of vars for each preset
-        return self._nb_preset_variations_per_note * self._nb_audio_delay_variations_per_note
+        if self._total_nb_variations is None:
+            self._total_nb_variations = self._nb_preset_variations_per_note * self._nb_audio_delay_variations_per_note
+        return self._total_nb_variations
 
     @property
     @abstractmethod
@@ -809,12 +1166,13 @@ class PresetDataset(AudioDataset):
 
     def _get_variation_args(self, variation):
         """ Transforms a variation index into (preset_variation, audio_delay) integers. """
-        if variation < 0 or variation >= self.get_nb_variations_per_note():  # same nb of vars for each preset
-            raise ValueError("Invalid variation (should be < {}".format(self.get_nb_variations_per_note()))
-        else:
-            preset_variation = variation // self._nb_audio_delay_variations_per_note
-            audio_delay = variation % self._nb_audio_delay_variations_per_note
-            return preset_variation, audio_delay
+        if self._variation_args_table is None:  # Lookup table: same nb of vars for each preset
+            n_delays = self._nb_audio_delay_variations_per_note
+            self._variation_args_table = [(v // n_delays, v % n_delays)
+                                          for v in range(self.get_nb_variations_per_note())]
+        if variation < 0 or variation >= len(self._variation_args_table):
+            raise ValueError("Invalid variation (should be < {}".format(len(self._variation_args_table)))
+        return self._variation_args_table[variation]
 
     def _get_variation_index_from_args(self, preset_variation, audio_delay):
         return audio_delay + preset_variation * self._nb_audio_delay_variations_per_note
@@ -2,6 +2,7 @@
 Utility function for building datasets and dataloaders using given configuration arguments.
 """
 import copy
+import os
 import sys
 import warnings
 from typing import Optional
@@ -55,6 +56,33 @@ def get_num_workers(train_config):
     return num_workers
 
 
+def preload_spectrograms_if_possible(train_config, datasets):
+    """ Preloads all spectrograms of the given datasets into shared RAM, if their total size is below the
+    train_config.dataloader_preload_spectrograms_max_GB limit. """
+    max_size_GB = getattr(train_config, 'dataloader_preload_spectrograms_max_GB', 0.0)  # Old configs: no attribute
+    if max_size_GB <= 0.0:
+        return
+    # Different datasets may use the same stores (e.g. train and validation merged datasets)
+    store_files = set([f for ds in datasets for f in ds.spectrograms_store_files])
+    total_size_GB = sum([os.path.getsize(f) for f in store_files]) / 1e9
+    if 0.0 < total_size_GB <= max_size_GB:
+        for ds in datasets:
+            ds.preload_spectrograms_store()
+        if train_config.verbosity >= 1:
+            print("[data/build.py] Spectrograms ({:.2f} GB) preloaded into RAM".format(total_size_GB))
+    elif total_size_GB > max_size_GB:
+        warnings.warn("Spectrograms ({:.2f} GB) will not be preloaded into RAM (limit: {:.2f} GB)"
+                      .format(total_size_GB, max_size_GB))
+
+
+def _get_workers_kwargs(train_config, ds, num_workers: int):
+    """ DataLoader kwargs which can be used only if num_workers > 0. """
+    if num_workers == 0:
+        return dict()
+    return {'prefetch_factor': getattr(train_config, 'dataloader_prefetch_factor', 2),  # Old configs: default value
+            'worker_init_fn': ds.worker_init_fn}
+
+
 def get_split_dataloaders(train_config, full_dataset,
                           num_workers: Optional[int] = None, persistent_workers=True):
     """ Returns a dict of train/validation/test DataLoader instances, and a dict which contains the
@@ -62,6 +90,8 @@ def get_split_dataloaders(train_config, full_dataset,
     # Num workers might be zero (no multiprocessing)
     if num_workers is None:
         num_workers = get_num_workers(train_config)
+    # Before copies of the dataset are created, such that all of them share the preloaded data
+    preload_spectrograms_if_possible(train_config, [full_dataset])
     # Dataloader easily build from samplers
     subset_samplers = data.sampler.build_subset_samplers(full_dataset, k_fold=train_config.current_k_fold,
                                                          k_folds_count=train_config.k_folds,
@@ -80,7 +110,8 @@ def get_split_dataloaders(train_config, full_dataset,
         dataloaders[k] = torch.utils.data.DataLoader(ds, batch_size=batch_size, drop_last=drop_last,
                                                      sampler=sampler, num_workers=num_workers,
                                                      pin_memory=train_config.dataloader_pin_memory,
-                                                     persistent_workers=((num_workers > 0) and persistent_workers))
+                                                     persistent_workers=((num_workers > 0) and persistent_workers),
+                                                     **_get_workers_kwargs(train_config, ds, num_workers))
         # actual nb of dataloader items length depends on drop last, or not
         if drop_last:
             sub_datasets_lengths[k] = (len(sampler.indices) // batch_size) * batch_size
@@ -99,17 +130,20 @@ def get_pretrain_dataloaders(model_config, train_config,
      Return is consistent with get_split_dataloaders(...). """
     use_wsampler = train_config.pretrain_synths_max_imbalance_ratio > 0.0  # Only for the training dataloader
     imbalance_ratio = train_config.pretrain_synths_max_imbalance_ratio if use_wsampler else None
+    preload_spectrograms_if_possible(train_config, [train_ds, valid_ds])
     train_dl, train_nb_items = \
         train_ds.get_dataloader(batch_size=train_config.minibatch_size, use_weighted_sampler=use_wsampler,
                                 max_imbalance_ratio=imbalance_ratio, num_workers=get_num_workers(train_config),
                                 pin_memory=train_config.dataloader_pin_memory,
-                                persistent_workers=train_config.dataloader_persistent_workers)
+                                persistent_workers=train_config.dataloader_persistent_workers,
+                                prefetch_factor=getattr(train_config, 'dataloader_prefetch_factor', 2))
     valid_dl, valid_nb_items = \
         valid_ds.get_dataloader(batch_size=train_config.minibatch_size, use_weighted_sampler=False,
                                 max_imbalance_ratio=None,
                                 num_workers=get_num_workers(train_config),
                                 pin_memory=train_config.dataloader_pin_memory,
-                                persistent_workers=train_config.dataloader_persistent_workers)
+                                persistent_workers=train_config.dataloader_persistent_workers,
+                                prefetch_factor=getattr(train_config, 'dataloader_prefetch_factor', 2))
     if train_config.verbosity >= 1:
         print("[data/build.py] Dataset 'train' contains {}/{} samples ({:.1f}% of train dataset)"
               .format(train_nb_items, len(train_ds), 100.0 * train_nb_items / len(train_ds)))
@@ -2,6 +2,7 @@
 A Dataset that merges different datasets (e.g. Dexed, Surge, NSynth, ...).
 Can be used for pre-training a part of a neural network (e.g. the audio VAE only, without preset inference)
 """
+import pathlib
 import warnings
 
 import numpy as np
@@ -11,7 +12,7 @@ from collections import OrderedDict
 import torch
 import torch.utils.data
 
-from data.abstractbasedataset import AudioDataset
+from data.abstractbasedataset import AudioDataset, PresetSpecBatch
 from data.nsynthdataset import NsynthDataset
 from data.surgedataset import SurgeDataset
 from synth import surge
@@ -106,7 +107,7 @@ class MergedDataset(AudioDataset):
             return super().__getitem__(i)
         else:
             spec, uid, notes, labels = super().__getitem__(i)
-            return spec, torch.zeros((1, )), uid, notes, labels
+            return PresetSpecBatch(spec, torch.zeros((1, )), uid, notes, labels)
 
     def _global_to_local_UID_and_ds(self, global_UID: int) -> Tuple[int, AudioDataset]:
         """ Converts a global UID (e.g. can be > 500 000) into a (local_UID, local_dataset) tuple. """
@@ -148,6 +149,18 @@ class MergedDataset(AudioDataset):
         local_UID, ds = self._global_to_local_UID_and_ds(preset_UID)
         return ds.get_spec_file_path(local_UID, midi_note, midi_velocity, variation)
 
+    def load_spectrogram(self, preset_UID, midi_note, midi_velocity, variation=0):
+        local_UID, ds = self._global_to_local_UID_and_ds(preset_UID)
+        return ds.load_spectrogram(local_UID, midi_note, midi_velocity, variation)
+
+    @property
+    def spectrograms_store_files(self) -> List[pathlib.Path]:
+        return [f for ds in self._datasets.values() for f in ds.spectrograms_store_files]
+
+    def preload_spectrograms_store(self):
+        for ds in self._datasets.values():
+            ds.preload_spectrograms_store()
+
     def _load_spectrogram_stats(self):
         raise NotImplementedError()  # TODO load stats from each merged dataset, extract global stats
 
@@ -201,7 +214,7 @@ class MergedDataset(AudioDataset):
 
     def get_dataloader(self, batch_size: int,
                        use_weighted_sampler=False, max_imbalance_ratio=10.0,
-                       num_workers=0, persistent_workers=True, pin_memory=False):
+                       num_workers=0, persistent_workers=True, pin_memory=False, prefetch_factor=2):
         """ Returns a dataloader properly configured to access this dataset, and the nb of items returns by this
         dataloader for each epoch.
 
@@ -214,6 +227,7 @@ class MergedDataset(AudioDataset):
         :param num_workers: (PyTorch DataLoader arg)
         :param persistent_workers: (PyTorch DataLoader arg)
         :param pin_memory: (PyTorch DataLoader arg)
+        :param prefetch_factor: (PyTorch DataLoader arg) Used only if num_workers > 0
         """
         drop_last = (self.dataset_type == 'train')
         if self.dataset_type == 'validation' and use_weighted_sampler:
@@ -253,9 +267,12 @@ class MergedDataset(AudioDataset):
                 nb_dataloader_items = (len(random_sampler) // batch_size) * batch_size
             else:
                 nb_dataloader_items = len(random_sampler)
+        workers_kwargs = {'prefetch_factor': prefetch_factor, 'worker_init_fn': self.worker_init_fn} \
+            if num_workers > 0 else dict()
         return (torch.utils.data.DataLoader(self, batch_size=batch_size, sampler=random_sampler, num_workers=num_workers,
                                             pin_memory=pin_memory, drop_last=drop_last,
-                                            persistent_workers=((num_workers > 0) and persistent_workers)),
+                                            persistent_workers=((num_workers > 0) and persistent_workers),
+                                            **workers_kwargs),
                 nb_dataloader_items)
 
 
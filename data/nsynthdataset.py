@@ -19,6 +19,7 @@ from collections import OrderedDict
 from typing import Optional, List, Dict
 
 from data import abstractbasedataset
+import utils.jsonio
 
 
 class NsynthDataset(abstractbasedataset.AudioDataset):
@@ -245,8 +246,8 @@ class NsynthDataset(abstractbasedataset.AudioDataset):
         instru_info = dict()  # key: UID
         for dataset_type in ['train', 'valid', 'test']:
             dataset_dir = self.data_storage_path.joinpath("nsynth-{}".format(dataset_type))
-            with open(dataset_dir.joinpath("examples_natsorted.json"), 'r') as f:
-                examples = json.load(f)
+            with open(dataset_dir.joinpath("examples_natsorted.json"), 'rb') as f:
+                examples = utils.jsonio.loads(f.read())  # Large file (up to 290k notes)
                 audio_dir = dataset_dir.joinpath('audio')
                 for instr_name_and_note, note_dict in examples.items():
                     # 1) TODO Create symlinks for all dataset notes
@@ -299,13 +300,12 @@ class NsynthDataset(abstractbasedataset.AudioDataset):
     def _sort_examples_json(self, dataset_type: str):
         """ Writes sorted versions of the examples.json files (natsort of main keys). """
         examples_natsorted = OrderedDict()
-        with open(self.data_storage_path.joinpath("nsynth-{}/examples.json".format(dataset_type)), 'r') as f:
-            examples = json.load(f)
-            new_keys = natsorted(examples.keys())
-            for k in new_keys:
-                examples_natsorted[k] = examples[k]
-        with open(self.data_storage_path.joinpath("nsynth-{}/examples_natsorted.json".format(dataset_type)), 'w') as f:
-            json.dump(examples_natsorted, f)
+        examples = utils.jsonio.load(self.data_storage_path.joinpath("nsynth-{}/examples.json".format(dataset_type)))
+        new_keys = natsorted(examples.keys())
+        for k in new_keys:
+            examples_natsorted[k] = examples[k]
+        utils.jsonio.dump(examples_natsorted,
+                          self.data_storage_path.joinpath("nsynth-{}/examples_natsorted.json".format(dataset_type)))
 
     def _init_symlinks_folder(self):
         self._audio_symlinks_base_dir.mkdir(parents=False, exist_ok=False)
@@ -188,6 +188,11 @@ class Preset2dHelper:
         """ Returns a clone of the pre-filled matrix (learnable preset). """
         return self._pre_filled_matrix.clone()
 
+    @property
+    def matrix_shape(self):
+        """ Shape of a learnable preset matrix. """
+        return self._pre_filled_matrix.shape
+
     def get_null_learnable_preset(self, batch_size: Optional[int] = None):
         """
         Returns a null learnable preset (useful to build an output, to retrieve sizes, for debugging, ...).
@@ -62,7 +62,9 @@ def get_preset_interpolator(m_config, eval_config: InterpEvalConfig):
     :param eval_config: general eval config
     :return: The preset interpolator using the model described by m_config
     """
-    model_loader = ModelLoader(m_config['base_model_path'], eval_config.device, eval_config.dataset_type)
+    # Inference only: BN layers can be folded into convolutions
+    model_loader = ModelLoader(m_config['base_model_path'], eval_config.device, eval_config.dataset_type,
+                               fuse_batch_norms=True)
     preset_interpolator = SynthPresetLatentInterpolation(
         model_loader, storage_path=m_config['interp_storage_path'],
         num_steps=eval_config.num_steps, u_curve=m_config['u_curve'], latent_interp=m_config['latent_interp'],
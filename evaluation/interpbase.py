@@ -7,6 +7,7 @@ import pathlib
 import pickle
 import shutil
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
 from typing import Optional, Tuple, Union, Dict, List, Any, Sequence
 from datetime import datetime
@@ -189,24 +190,45 @@ class InterpBase(ABC):
         timbre_proc.run()
         timbre_proc.post_process_features(self.storage_path)
 
+    # Results already loaded by this process. Keys are (file path, file mtime, filtering args) tuples
+    _interp_results_cache = dict()  # type: Dict[Tuple, Dict[str, pd.DataFrame]]
+
     @staticmethod
     def get_interp_results(storage_path: pathlib.Path, eval_config: Optional[InterpEvalConfig] = None):
-        with open(storage_path.joinpath('interp_results.pkl'), 'rb') as f:
-            multi_metrics_interp_results = pickle.load(f)
+        """ Returns a dict of interpolation results DataFrames (one per metric). Results are cached by this process
+        (e.g. when figures are re-drawn multiple times), until the results file is modified. The caller can freely
+        modify the returned DataFrames. """
+        results_file = storage_path.joinpath('interp_results.pkl')
         if eval_config is not None:
-            # filtering: remove unused columns (e.g. min / max), ...
-            for metric_name, interp_results_df in multi_metrics_interp_results.items():
-                for col in list(interp_results_df.columns):
-                    try:
-                        if eval_config.exclude_min_max_interp_features:
-                            if col.endswith('_min') or col.endswith('_max'):
-                                interp_results_df.drop(columns=[col], inplace=True)  # must be inplace inside the for loop
-                        for feat_name in eval_config.excluded_interp_features:
-                            if col.startswith(feat_name):
-                                interp_results_df.drop(columns=[col], inplace=True)  # must be inplace inside the for loop
-                    except KeyError:
-                        pass  # A feature might be removed multiple times (multiple overlapping removal criteria)
-        return multi_metrics_interp_results
+            filter_args = (eval_config.exclude_min_max_interp_features, tuple(eval_config.excluded_interp_features))
+        else:
+            filter_args = None
+        cache_key = (str(results_file), os.stat(results_file).st_mtime_ns, filter_args)
+        multi_metrics_interp_results = InterpBase._interp_results_cache.get(cache_key, None)
+        if multi_metrics_interp_results is None:
+            with open(results_file, 'rb') as f:
+                multi_metrics_interp_results = pickle.load(f)
+            if eval_config is not None:
+                # filtering: remove unused columns (e.g. min / max), ...
+                for metric_name, interp_results_df in multi_metrics_interp_results.items():
+                    excluded_cols = [col for col in interp_results_df.columns
+                                     if (eval_config.exclude_min_max_interp_features
+                                         and (col.endswith('_min') or col.endswith('_max')))
+                                     or any([col.startswith(feat_name)
+                                             for feat_name in eval_config.excluded_interp_features])]
+                    interp_results_df.drop(columns=excluded_cols, inplace=True)
+            InterpBase._interp_results_cache[cache_key] = multi_metrics_interp_results
+        return {k: df.copy() for k, df in multi_metrics_interp_results.items()}
+
+    @staticmethod
+    def get_multiple_interp_results(storage_paths: Sequence[pathlib.Path],
+                                    eval_config: Optional[InterpEvalConfig] = None):
+        """ Returns the list of interpolation results of each given storage path (see get_interp_results).
+        Results files are loaded concurrently (threads: I/O-bound loading). """
+        if len(storage_paths) == 0:
+            return []
+        with ThreadPoolExecutor(max_workers=min(8, len(storage_paths))) as executor:
+            return list(executor.map(lambda p: InterpBase.get_interp_results(p, eval_config), storage_paths))
 
     @staticmethod
     def _compute_interp_metrics(all_seqs_dfs: List[pd.DataFrame],
@@ -261,10 +283,8 @@ class InterpBase(ABC):
             'NoiseErg_med', 'NoiseErg_IQR' etc.
         """
         ref_interp_results = InterpBase.get_interp_results(eval_config.ref_model_interp_path, eval_config)
-        models_interp_results = [
-            InterpBase.get_interp_results(m_config['interp_storage_path'], eval_config)
-            for m_config in eval_config.other_models
-        ]
+        models_interp_results = InterpBase.get_multiple_interp_results(
+            [m_config['interp_storage_path'] for m_config in eval_config.other_models], eval_config)
         # We'll build a wide-form DF from a list of dicts
         improvements_df = []
         for model_idx, interp_results in enumerate(models_interp_results):
@@ -272,8 +292,8 @@ class InterpBase(ABC):
             # retrieve model hparams (train/model and interpolation hparams)
             nn_model_config, nn_train_config = evaluation.load.ModelLoader.get_model_train_configs(
                 interp_config['base_model_path'])
-            nn_model_config_dict = {'mdlcfg__' + k: v for k, v in nn_model_config.__dict__.items()}
-            nn_train_config_dict = {'trncfg__' + k: v for k, v in nn_train_config.__dict__.items()}
+            nn_model_config_dict = {'mdlcfg__' + k: v for k, v in nn_model_config.to_dict().items()}
+            nn_train_config_dict = {'trncfg__' + k: v for k, v in nn_train_config.to_dict().items()}
             # also 'manually' add interp hparams
             interp_config_dict = {'u_curve': interp_config['u_curve'], 'z_curve': interp_config['latent_interp'],
                                   'refine_level': interp_config['refine_level']}
@@ -447,7 +467,7 @@ class ModelBasedInterpolation(InterpBase):
         # We assume that batch size is an even number...
         for batch_idx, minibatch in enumerate(self.dataloader):
             end_sequence_with_next_item = False  # If True, the next item is the 2nd (last) of an InterpSequence
-            x_in, v_in, uid, notes, label = [m.to(self.device) for m in minibatch]
+            x_in, v_in, uid, notes, label = [m.to(self.device, non_blocking=True) for m in minibatch]
             N = x_in.shape[0]
             for i in range(N):
                 if not end_sequence_with_next_item:
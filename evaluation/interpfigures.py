@@ -43,7 +43,7 @@ def interp_results_boxplots(
     #    1st index: model index
     #    2nd index: metric type (e.g. smoothness, RSS, ...)
     #    3rd and 4th "dims": actual DataFrame whose index is an interp sequence index, columns are metrics' names
-    models_interp_results = [InterpBase.get_interp_results(p, eval_config) for p in storage_paths]
+    models_interp_results = InterpBase.get_multiple_interp_results(storage_paths, eval_config)
 
     # for each feature, compute normalisation factors from the 1st model, to be used for all models
     #   mean "without outliers" gives the best boxplots
@@ -61,22 +61,30 @@ def interp_results_boxplots(
     if len(metrics_to_plot) == 1:
         axes = [axes]  # Add singleton dimension, for compatibility
     for metric_idx, metric_name in enumerate(metrics_to_plot):
-        models_melted_results = list()
+        # Long-form data (same as pd.melt of each model's results): 'variable' (feature name), 'value' and
+        # 'model_name' arrays, pre-allocated then given directly to seaborn (no intermediate DataFrame)
+        # https://stackoverflow.com/questions/49554139/boxplot-of-multiple-columns-of-a-pandas-dataframe-on-the-same-figure-seaborn
+        total_rows = sum([interp_results[metric_name].size for interp_results in models_interp_results])
+        values = np.empty((total_rows, ), dtype=float)
+        variables = np.empty((total_rows, ), dtype=object)
+        model_names = np.empty((total_rows, ), dtype=object)
+        row = 0
         for model_idx, interp_results in enumerate(models_interp_results):
             results_df = interp_results[metric_name]
-            results_df = results_df / reference_norm_factors[metric_name]
-            # https://stackoverflow.com/questions/49554139/boxplot-of-multiple-columns-of-a-pandas-dataframe-on-the-same-figure-seaborn
-            melted_results_df = pd.melt(results_df)  # 2-cols DF: 'variable' (feature name) and 'value'
-            melted_results_df['model_name'] = models_names[model_idx]
-            models_melted_results.append(melted_results_df)
-        models_melted_results = pd.concat(models_melted_results)
+            norm_factors = reference_norm_factors[metric_name].reindex(results_df.columns).values
+            n_rows = results_df.size
+            # Column-major order, as pd.melt: all values of the 1st feature, then all values of the 2nd, ...
+            values[row:row + n_rows] = (results_df.values / norm_factors).T.ravel()
+            variables[row:row + n_rows] = np.repeat(results_df.columns.values, len(results_df))
+            model_names[row:row + n_rows] = models_names[model_idx]
+            row += n_rows
         # use bright colors (pastel palette) such that the black median line is easily visible
-        sns.boxplot(data=models_melted_results, x="variable", y="value", hue="model_name",
+        sns.boxplot(x=variables, y=values, hue=model_names,
                     ax=axes[metric_idx], showfliers=False, linewidth=1.0, palette="pastel")
         axes[metric_idx].set_ylim(ymin=0.0)
         '''
         sns.pointplot(
-            data=models_melted_results, x="variable", y="value", hue="model_name", ax=axes[metric_idx],
+            x=variables, y=values, hue=model_names, ax=axes[metric_idx],
             errwidth=1.0, marker='.', scale=0.5, ci="sd", dodge=0.4, join=False,  # SD instead of 95% CI
         )
         '''
@@ -142,11 +150,12 @@ def plot_improvements_vs_ref(
             log_scale = hparam.endswith('___LOGSCALE')
             if log_scale:
                 hparam = hparam.replace('___LOGSCALE', '')
+            # Means of all measurements, for each hparam value (sorted). Float equality: works OK with hparams
+            means_per_hparam = improvements_df.groupby(hparam)[list(measurements_to_plot)].mean()
+            h_params_values = means_per_hparam.index.values
             for j, measurement_name in enumerate(measurements_to_plot):
                 # draw the evolution of means using lines (as done in comet.ml)
-                h_params_values = np.unique(improvements_df[hparam].values)  # float equality: works OK with hparams
-                mean_per_hparam = [improvements_df.loc[improvements_df[hparam] == v][measurement_name].values.mean()
-                                   for v in h_params_values]
+                mean_per_hparam = means_per_hparam[measurement_name].values
                 axes2[i, j].plot(mean_per_hparam, h_params_values, color='k')  # 'vertical' plot
                 # Then draw the actual scatter plot
                 sns.scatterplot(data=improvements_df, x=measurement_name, y=hparam, ax=axes2[i, j],
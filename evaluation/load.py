@@ -9,11 +9,12 @@ import torch
 
 import config
 import data.build
+import model.convlayer
 import model.hierarchicalvae
 
 
 class ModelLoader:
-    def __init__(self, model_folder_path: Path, device='cpu', dataset_type='validation'):
+    def __init__(self, model_folder_path: Path, device='cpu', dataset_type='validation', fuse_batch_norms=False):
         """
         Loads model_config and train_config from the given folder, then builds the model and loads the last
         available checkpoint.
@@ -21,6 +22,8 @@ class ModelLoader:
 
         :param model_folder_path: e.g. Path('/home/user/saved/MMD_tests/model1')
         :param dataset_type: Usually 'validation' or 'test', but 'train' is accepted.
+        :param fuse_batch_norms: If True, the model is set to eval mode and BN layers are folded into the adjacent
+            convolutions (faster inference). The model must not be trained or saved afterwards.
         """
         self.device = device
         self.path_to_model_dir = model_folder_path
@@ -45,6 +48,9 @@ class ModelLoader:
             self.model_config, self.train_config, self.dataset.preset_indexes_helper)
         self.ae_model.load_checkpoints(
             self.path_to_model_dir.joinpath("checkpoint.tar"), map_location=torch.device(device))
+        if fuse_batch_norms:
+            self.ae_model.eval()
+            model.convlayer.fuse_batch_norms(self.ae_model)
 
         if device == 'cpu':
             torch.cuda.empty_cache()  # Checkpoints were usually GPU tensors (originally)
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Sequence, Dict
 
 import numpy as np
 import torch
@@ -7,7 +7,6 @@ from comet_ml import Experiment  # Needs to be imported first
 import matplotlib.pyplot as plt
 
 import config
-from data.abstractbasedataset import AudioDataset
 from logs.metrics import LatentMetric
 
 
@@ -82,6 +81,25 @@ class CometWriter:
         else:  # Log without context (e.g. scheduler, ...)
             self.experiment.log_metric(name, value)
 
+    def log_metrics_with_context(self, metrics: Dict[str, float]):
+        """ Logs scalar metrics using a single bulk call for each comet context (see log_metric_with_context). """
+        train_metrics, valid_metrics, other_metrics = dict(), dict(), dict()
+        for name, value in metrics.items():
+            if self._has_train_suffix(name):
+                train_metrics[self._remove_train_valid_suffix(name)] = value
+            elif self._has_validation_suffix(name):
+                valid_metrics[self._remove_train_valid_suffix(name)] = value
+            else:
+                other_metrics[name] = value
+        if len(train_metrics) > 0:
+            with self.experiment.train():
+                self.experiment.log_metrics(train_metrics)
+        if len(valid_metrics) > 0:
+            with self.experiment.validate():
+                self.experiment.log_metrics(valid_metrics)
+        if len(other_metrics) > 0:
+            self.experiment.log_metrics(other_metrics)
+
     def log_figure_with_context(self, name: str, fig, step: Optional[int] = None):
         """ Logs a MPL figure, and tries to set a comet context before doing it (see log_metric_with_context).
             Step can be forced if this method is called asynchronously (threaded plots). """
@@ -95,6 +113,18 @@ class CometWriter:
             self.experiment.log_figure(name, fig, step=step)
         plt.close(fig)
 
+    def log_image_with_context(self, name: str, image: np.ndarray, step: Optional[int] = None):
+        """ Logs an HWC image (e.g. a figure rendered by another process), and tries to set a comet context before
+            doing it (see log_figure_with_context). """
+        if self._has_train_suffix(name):
+            with self.experiment.train():
+                self.experiment.log_image(image, name=self._remove_train_valid_suffix(name), step=step)
+        elif self._has_validation_suffix(name):
+            with self.experiment.validate():
+                self.experiment.log_image(image, name=self._remove_train_valid_suffix(name), step=step)
+        else:
+            self.experiment.log_image(image, name=name, step=step)
+
     @staticmethod
     def _assert_is_train_or_valid_dataset_type(ds_type: str):
         """ Returns True if this is a training dataset, False if it is a validation dataset, raises an exception
@@ -122,6 +152,12 @@ class CometWriter:
         s_split.pop()
         return suffix_separator.join(s_split)
 
+    def log_histograms_3d(self, histograms: Dict[str, np.ndarray], step: int, epoch: int):
+        """ Logs all histograms of an epoch (keys are histograms' names). Comet has no bulk API for histograms, but
+        calls are only queued (sent by the experiment's background streamer), not sent one request at a time. """
+        for name, values in histograms.items():
+            self.experiment.log_histogram_3d(values, name=name, step=step, epoch=epoch)
+
     def log_latent_histograms(self, latent_metric: LatentMetric, dataset_type: str,
                               epoch: Optional[int] = None, step: Optional[int] = None):
         """
@@ -138,7 +174,9 @@ class CometWriter:
             self.experiment.log_histogram_3d(z0, name='z0', step=step, epoch=epoch)
             self.experiment.log_histogram_3d(zK, name='zK', step=step, epoch=epoch)
 
-    def log_latent_embedding(self, latent_metric: LatentMetric, dataset_type: str, epoch: int, dataset: AudioDataset):
+    def log_latent_embedding(self, latent_metric: LatentMetric, dataset_type: str, epoch: int,
+                             labels_names: Sequence[str]):
+        """ :param labels_names: Names of the labels of the dataset (e.g. AudioDataset.available_labels_names) """
         z_K = latent_metric.get_z('zK')
         embeddings = list()
         # labels converted to strings
@@ -153,7 +191,7 @@ class CometWriter:
             else:  # Only 1 label will be displayed (randomly chosen if multiple labels)
                 # TODO try add multiple labels ? or use metadata to build a secondary label ?
                 rng.shuffle(label_indices)  # in-place
-                labels.append(dataset.available_labels_names[label_indices[0]])
+                labels.append(labels_names[label_indices[0]])
                 embeddings.append(z_K[i, :])
         is_training = self._assert_is_train_or_valid_dataset_type(dataset_type)
         with self.experiment.train() if is_training else self.experiment.validate():
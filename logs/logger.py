@@ -1,49 +1,80 @@
-import copy
+import functools
 import multiprocessing
 import pickle
+import queue
 import threading
 import os
 import sys
 import time
 import shutil
-import json
 import datetime
 import pathlib
+import uuid
 import warnings
-from typing import List, Optional, Dict, Tuple
+from typing import List, Optional, Dict, Tuple, TYPE_CHECKING
 
 import numpy as np
 
 import torch
-import torchinfo
-
-import humanize
 
 import config
-from data.abstractbasedataset import AudioDataset
-import model.base
 import utils
-import utils.figures
+import utils.jsonio
 import utils.stat
-import model.hierarchicalvae
 from .tbwriter import TensorboardSummaryWriter  # Custom modified summary writer
 from .cometwriter import CometWriter
-import logs.logger_mp
+
+if TYPE_CHECKING:  # Annotations only: datasets (and pandas) are not imported by processes which only log data
+    from data.abstractbasedataset import AudioDataset
+    import model.hierarchicalvae
 
 _erase_security_time_s = 5.0
 
 
+@functools.lru_cache(maxsize=None)
+def _get_run_directories(logs_root_dir: str, model_name: str, run_name: str):
+    """ Returns the (model run, tensorboard run) directories. Paths are built once for each run. """
+    logs_root_path = pathlib.Path(logs_root_dir)
+    return logs_root_path.joinpath(model_name, run_name), logs_root_path.joinpath('runs', model_name, run_name)
+
+
 def get_model_run_directory(root_path, model_config: config.ModelConfig):
     """ Returns the directory where saved models and config.json are stored, for a particular run.
     Does not check whether the directory exists or not (it must have been created by the RunLogger) """
-    return pathlib.Path(model_config.logs_root_dir)\
-        .joinpath(model_config.name).joinpath(model_config.run_name)
+    return _get_run_directories(model_config.logs_root_dir, model_config.name, model_config.run_name)[0]
 
 
 def get_tensorboard_run_directory(root_path, model_config: config.ModelConfig):
     """ Returns the directory where Tensorboard model metrics are stored, for a particular run. """
-    return pathlib.Path(model_config.logs_root_dir).joinpath('runs')\
-        .joinpath(model_config.name).joinpath(model_config.run_name)
+    return _get_run_directories(model_config.logs_root_dir, model_config.name, model_config.run_name)[1]
+
+
+_deletion_threads = list()  # type: List[threading.Thread]
+
+
+def _delete_trash_directories(dir_path: pathlib.Path):
+    """ Deletes all renamed copies of dir_path (including leftovers of previous runs, e.g. killed processes). """
+    for trash_path in dir_path.parent.glob(dir_path.name + '.trash-*'):
+        shutil.rmtree(trash_path, ignore_errors=True)
+
+
+def _delete_directory_in_background(dir_path: pathlib.Path):
+    """ Renames a directory (single syscall, so its path can immediately be re-used), then deletes the renamed
+    directory from a background thread. The directory is deleted synchronously if it can't be renamed.
+    Deletion threads are not daemonic (they can't be killed halfway at exit), see also _join_deletion_threads(). """
+    trash_path = dir_path.with_name(dir_path.name + '.trash-{}'.format(uuid.uuid4().hex))
+    try:
+        os.rename(dir_path, trash_path)
+    except OSError:
+        shutil.rmtree(dir_path)
+    t = threading.Thread(target=_delete_trash_directories, args=(dir_path, ), name="RunDataDeletionThread")
+    t.start()
+    _deletion_threads.append(t)
+
+
+def _join_deletion_threads():
+    while len(_deletion_threads) > 0:
+        _deletion_threads.pop().join()
 
 
 def erase_run_data(root_path, model_config: config.ModelConfig):
@@ -55,10 +86,16 @@ def erase_run_data(root_path, model_config: config.ModelConfig):
         time.sleep(_erase_security_time_s)
     else:
         print("[RunLogger] '{}' run for model '{}' will be erased.".format(model_config.run_name, model_config.name))
-    shutil.rmtree(get_model_run_directory(root_path, model_config))  # config and saved models
-    shutil.rmtree(get_tensorboard_run_directory(root_path, model_config))  # tensorboard
+    _delete_directory_in_background(get_model_run_directory(root_path, model_config))  # config and saved models
+    _delete_directory_in_background(get_tensorboard_run_directory(root_path, model_config))  # tensorboard
 
 
+def _run_stats_figs_worker_loop(jobs_q: multiprocessing.Queue, results_q: multiprocessing.Queue):
+    """ Entry point of the plotting process. logs.logger_mp (and matplotlib) is imported by the child process only:
+    the training process imports it lazily, when the first stats figures are received. """
+    import logs.logger_mp  # local import: see docstring
+    logs.logger_mp.stats_figs_worker_loop(jobs_q, results_q)
+
 
 class RunLogger:
     """ Class for saving interesting data during a training run:
@@ -83,6 +120,7 @@ class RunLogger:
         # Configs are stored but not modified by this class
         self.model_config = model_config
         self.train_config = train_config
+        self.train_config.ensure_start_datetime()  # Before the config is logged or written to a file
         self.verbosity = train_config.verbosity
         global _erase_security_time_s  # Very dirty.... but quick
         _erase_security_time_s = train_config.init_security_pause
@@ -95,17 +133,17 @@ class RunLogger:
             self.current_step = 0
         self.current_step = 0
         # - - - - - Directories creation (if not exists) for model - - - - -
-        self.log_dir = pathlib.Path(model_config.logs_root_dir).joinpath(model_config.name)
+        # Parents of the (cached) run directories: no new path is built
+        self.log_dir = get_model_run_directory(root_path, model_config).parent
         self._make_dirs_if_dont_exist(self.log_dir)
         # Tensorboard directory is always required for the PyTorch Profiler to write its results
-        self.tensorboard_model_dir = pathlib.Path(model_config.logs_root_dir)\
-            .joinpath('runs').joinpath(model_config.name)
+        self.tensorboard_model_dir = get_tensorboard_run_directory(root_path, model_config).parent
         self._make_dirs_if_dont_exist(self.tensorboard_model_dir)
         # - - - - - Run directories and data management - - - - -
         if self.train_config.verbosity >= 1:
             print("[RunLogger] Starting logging into '{}'".format(self.log_dir))
-        self.run_dir = self.log_dir.joinpath(model_config.run_name)  # This is the run's reference folder
-        self.tensorboard_run_dir = self.tensorboard_model_dir.joinpath(model_config.run_name)  # Required for profiler
+        self.run_dir = get_model_run_directory(root_path, model_config)  # This is the run's reference folder
+        self.tensorboard_run_dir = get_tensorboard_run_directory(root_path, model_config)  # Required for profiler
         # Check: does the run folder already exist?
         if not os.path.exists(self.run_dir):
             if train_config.start_epoch != 0:
@@ -122,16 +160,21 @@ class RunLogger:
                     erase_run_data(root_path, model_config)  # module function
                     self._make_model_run_dirs()
         # - - - - - Epochs, Batches, ... - - - - -
+        # Scalars' names don't change during training: each name is checked once (see _get_scalar_key_info)
+        self._scalar_keys_info = dict()  # type: Dict[str, Tuple[bool, bool]]
         self.minibatch_duration_running_avg = 0.0
         self.minibatch_duration_avg_coeff = 0.05  # auto-regressive running average coefficient
-        self.last_minibatch_start_datetime = datetime.datetime.now()
-        self.epoch_start_datetimes = [datetime.datetime.now()]  # This value can be erased in init_with_model
+        self._last_minibatch_start_ns = time.perf_counter_ns()  # No datetime instance built for each minibatch
+        # Epochs durations: running sum (monotonic clock), the average duration does not require all durations
+        self._epoch_start_time = time.monotonic()  # This value can be erased in init_with_model
+        self._finished_epochs_count, self._finished_epochs_total_s = 0, 0.0
         self._last_large_plots_epoch = - train_config.large_plots_min_period
         # - - - - - Tensorboard / Comet - - - - -
         self.tensorboard, self.comet = None, None
         if 'tensorboard' in self.logger_type:
             warnings.warn("Tensorboard experiment logging is not maintained anymore", category=DeprecationWarning)
-            self.tensorboard = TensorboardSummaryWriter(log_dir=self.tensorboard_run_dir, flush_secs=5,
+            # Large queue: bursts of events (threaded plots) don't wait for the writer, and are flushed together
+            self.tensorboard = TensorboardSummaryWriter(log_dir=self.tensorboard_run_dir, flush_secs=5, max_queue=200,
                                                         model_config=model_config, train_config=train_config)
         if 'comet' in self.logger_type:
             self.comet = CometWriter(model_config, train_config)
@@ -140,6 +183,23 @@ class RunLogger:
         self.use_multiprocessing = use_multiprocessing and (not (sys.gettrace() is not None))
         # Processes will be started and joined from those threads
         self.figures_threads = {'stats': None, 'audio_samples': None}  # type: Dict[str, Optional[threading.Thread]]
+        # A single plotting process is started now (interpreter and matplotlib start-up while training starts),
+        # and will be used for all epochs
+        self._plot_process, self._plot_jobs_q, self._plot_results_q = None, None, None
+        if self.use_multiprocessing:
+            # 'fork' context must not be used: observed deadlock
+            #     - deadlock seems to be caused by serializing this instance
+            #     - 'forkserver' (or 'spawn' if not available): the plotting process is forked from a fresh server
+            #       process (no CUDA state, no lock held by another thread), in which the plotting modules are preloaded
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                ctx = multiprocessing.get_context('forkserver')
+                ctx.set_forkserver_preload(['logs.logger', 'logs.logger_mp'])
+            else:
+                ctx = multiprocessing.get_context('spawn')
+            self._plot_jobs_q, self._plot_results_q = ctx.Queue(), ctx.Queue()
+            self._plot_process = ctx.Process(target=_run_stats_figs_worker_loop,
+                                             args=(self._plot_jobs_q, self._plot_results_q), daemon=True)
+            self._plot_process.start()
 
     @staticmethod
     def _make_dirs_if_dont_exist(dir_path):
@@ -151,6 +211,18 @@ class RunLogger:
         os.makedirs(self.run_dir)
         os.makedirs(self.tensorboard_run_dir)  # Always required for profiling data
 
+    @staticmethod
+    def _write_if_changed(file_path: pathlib.Path, content: bytes):
+        try:
+            if os.path.getsize(file_path) == len(content):
+                with open(file_path, 'rb') as f:
+                    if f.read() == content:
+                        return
+        except FileNotFoundError:
+            pass
+        with open(file_path, 'wb') as f:
+            f.write(content)
+
     def init_with_model(self, main_model, input_tensor_size, write_graph=True):
         """ Finishes to initialize this logger given the fully-build model. This function must be called
          after all checks (configuration consistency, etc...) have been performed, because it overwrites files. """
@@ -159,16 +231,20 @@ class RunLogger:
         if self.comet is not None:  # Log the entire config.py file to comet
             self.comet.experiment.log_code(file_name=pathlib.Path(__file__).parent.parent.joinpath('config.py'))
         # Write configs to a JSON file, also pickle them to reload them easily
-        with open(self.run_dir.joinpath('config.json'), 'w') as f:
-            json.dump({'model': self.model_config.__dict__, 'train': self.train_config.__dict__}, f)
-        with open(self.run_dir.joinpath('config.pickle'), 'wb') as f:
-            pickle.dump({'model': self.model_config, 'train': self.train_config}, f)
+        # Files are not re-written if their content has not changed (mtime unchanged for backup/sync tools)
+        self._write_if_changed(self.run_dir.joinpath('config.json'), utils.jsonio.dumps(
+            {'model': self.model_config.to_dict(), 'train': self.train_config.to_dict()}))
+        self._write_if_changed(self.run_dir.joinpath('config.pickle'),
+                               pickle.dumps({'model': self.model_config, 'train': self.train_config}))
         # Graphs written at epoch 0 only
         if not self.restart_from_checkpoint:
             self.write_model_summary(main_model, input_tensor_size, 'VAE')
             if write_graph and self.tensorboard is not None:
-                self.tensorboard.add_graph(main_model, torch.zeros(input_tensor_size))
-        self.epoch_start_datetimes = [datetime.datetime.now()]
+                # Dummy input on the model's device (the model is not moved), no autograd graph needed for tracing
+                with torch.no_grad():
+                    self.tensorboard.add_graph(
+                        main_model, torch.zeros(input_tensor_size, device=next(main_model.parameters()).device))
+        self._epoch_start_time = time.monotonic()
 
     def log_hyper_parameters(self):
         if self.tensorboard is not None:
@@ -177,6 +253,8 @@ class RunLogger:
             self.comet.log_config_hparams(self.model_config, self.train_config)
 
     def write_model_summary(self, model, input_tensor_size, model_name):
+        if not getattr(self.train_config, 'write_model_summary', True):
+            return
         if not self.restart_from_checkpoint:  # Graphs written at epoch 0 only
             description = model.get_detailed_summary()
             if self.comet is not None:
@@ -186,8 +264,7 @@ class RunLogger:
 
     @property
     def config_from_json_file(self):
-        with open(self.run_dir.joinpath('config.json'), 'r') as f:
-            return json.load(f)
+        return utils.jsonio.load(self.run_dir.joinpath('config.json'))
 
     @property
     def configs_from_pickle_file(self) -> Tuple[config.ModelConfig, config.TrainConfig]:
@@ -199,14 +276,14 @@ class RunLogger:
         self.current_step += 1
         if self.comet is not None:
             self.comet.experiment.set_step(self.current_step)
-        minibatch_end_time = datetime.datetime.now()
-        delta_t = (minibatch_end_time - self.last_minibatch_start_datetime).total_seconds()
+        minibatch_end_ns = time.perf_counter_ns()
+        delta_t = (minibatch_end_ns - self._last_minibatch_start_ns) * 1e-9
         self.minibatch_duration_running_avg *= (1.0 - self.minibatch_duration_avg_coeff)
         self.minibatch_duration_running_avg += self.minibatch_duration_avg_coeff * delta_t  # TODO Log this
         if self.verbosity >= 3:
-            print("epoch {} batch {} delta t = {}ms" .format(len(self.epoch_start_datetimes)-1, minibatch_idx,
+            print("epoch {} batch {} delta t = {}ms" .format(self._finished_epochs_count, minibatch_idx,
                                                              int(1000.0 * self.minibatch_duration_running_avg)))
-        self.last_minibatch_start_datetime = minibatch_end_time
+        self._last_minibatch_start_ns = minibatch_end_ns
 
     def on_epoch_starts(self, epoch: int, scalars, super_metrics):
         self.current_epoch = epoch
@@ -234,18 +311,20 @@ class RunLogger:
     def on_epoch_finished(self, epoch):
         if epoch != self.current_epoch:
             raise RuntimeError("Given epoch is different from epoch given to on_epoch_starts(...)")
-        self.epoch_start_datetimes.append(datetime.datetime.now())
-        epoch_duration = self.epoch_start_datetimes[-1] - self.epoch_start_datetimes[-2]
-        avg_duration_s = np.asarray([(self.epoch_start_datetimes[i+1] - self.epoch_start_datetimes[i]).total_seconds()
-                                     for i in range(len(self.epoch_start_datetimes) - 1)])
-        avg_duration_s = avg_duration_s.mean()
-        run_total_epochs = self.train_config.n_epochs - self.train_config.start_epoch
-        remaining_datetime = avg_duration_s * (run_total_epochs - (epoch-self.train_config.start_epoch) - 1)
-        remaining_datetime = datetime.timedelta(seconds=int(remaining_datetime))
-        if self.verbosity >= 1:
+        epoch_end_time = time.monotonic()
+        epoch_duration_s = epoch_end_time - self._epoch_start_time
+        self._epoch_start_time = epoch_end_time
+        self._finished_epochs_count += 1
+        self._finished_epochs_total_s += epoch_duration_s
+        avg_duration_s = self._finished_epochs_total_s / self._finished_epochs_count
+        if self.verbosity >= 1:  # The remaining time (datetime/humanize objects) is only computed for this print
+            import humanize  # local import: only used for this console output
+            run_total_epochs = self.train_config.n_epochs - self.train_config.start_epoch
+            remaining_datetime = avg_duration_s * (run_total_epochs - (epoch-self.train_config.start_epoch) - 1)
+            remaining_datetime = datetime.timedelta(seconds=int(remaining_datetime))
             print("End of epoch {} ({}/{}). Duration={:.1f}s, avg={:.1f}s. Estimated remaining time: {} ({})"
                   .format(epoch, epoch-self.train_config.start_epoch+1, run_total_epochs,
-                          epoch_duration.total_seconds(), avg_duration_s,
+                          epoch_duration_s, avg_duration_s,
                           remaining_datetime, humanize.naturaldelta(remaining_datetime)))
         if self.comet is not None:
             self.comet.experiment.log_metric('epoch_duration_avg', avg_duration_s, include_context=False)
@@ -257,6 +336,12 @@ class RunLogger:
         for _, t in self.figures_threads.items():
             if t is not None:
                 t.join()
+        if self._plot_process is not None:
+            self._plot_jobs_q.put(None)  # Stops the plotting process' loop
+            self._plot_process.join()
+            self._plot_process.close()
+            self._plot_process = None
+        _join_deletion_threads()
         if self.tensorboard is not None:
             self.tensorboard.flush()
             self.tensorboard.close()
@@ -267,15 +352,28 @@ class RunLogger:
 
     # - - - - - - - - - - Scalars - - - - - - - - - -
 
+    def _get_scalar_key_info(self, k: str) -> Tuple[bool, bool]:
+        """ Returns (is_used, is_validation) for a scalar name. The result, which depends on the configs only,
+        is computed once per name. """
+        try:
+            return self._scalar_keys_info[k]
+        except KeyError:
+            # don't need to log everything for every train procedure (during pre-train, if no flow, etc...)
+            is_used = not ((self.train_config.pretrain_audio_only
+                            and (k.startswith('Controls') or k.startswith('Sched/Controls')))
+                           or (k.startswith('LatCorr/zK') and self.model_config.latent_flow_arch is None))
+            self._scalar_keys_info[k] = (is_used, 'valid' in k.lower())
+            return self._scalar_keys_info[k]
+
     def add_scalars(self, scalars):
+        comet_metrics = dict()  # Sent all at once (a few bulk messages instead of one message per scalar)
         for k, s in scalars.items():
-            # don't need to log everything for every train procedure (during pre-train, if no flow, etc...)
-            if (self.train_config.pretrain_audio_only and (k.startswith('Controls') or k.startswith('Sched/Controls'))) \
-                    or (k.startswith('LatCorr/zK') and self.model_config.latent_flow_arch is None):
+            is_used, is_validation = self._get_scalar_key_info(k)
+            if not is_used:
                 pass
             # if we did not perform validation: don't log (no new value, EpochMetrics would raise an Error anyway
             # because their buffer are empty)
-            elif not self.should_validate and 'valid' in k.lower():
+            elif not self.should_validate and is_validation:
                 pass
             # otherwise: ok, we can log this
             else:
@@ -286,20 +384,24 @@ class RunLogger:
                 if self.tensorboard is not None:
                     self.tensorboard.add_scalar(k, scalar_value, self.current_epoch)
                 if self.comet is not None:
-                    self.comet.log_metric_with_context(k, scalar_value)
+                    comet_metrics[k] = scalar_value
+        if self.comet is not None and len(comet_metrics) > 0:
+            self.comet.log_metrics_with_context(comet_metrics)
 
     # - - - - - - - - - - Non-threaded plots to comet/tensorbard - - - - - - - - - -
 
-    def plot_spectrograms(self, x_in, x_out, uid, notes, dataset: AudioDataset, name='Spectrogram/Valid'):
+    def plot_spectrograms(self, x_in, x_out, uid, notes, dataset: 'AudioDataset', name='Spectrogram/Valid'):
+        import utils.figures  # local import: matplotlib is loaded only if something is actually plotted
         fig, _ = utils.figures.plot_train_spectrograms(
             x_in, x_out, uid, notes, dataset, self.model_config, self.train_config)
         self.add_figure(name, fig)
 
-    def plot_decoder_interpolation(self, h_vae: model.hierarchicalvae.HierarchicalVAE,
-                                   z_minibatch, preset_UIDs, dataset: AudioDataset,
+    def plot_decoder_interpolation(self, h_vae: 'model.hierarchicalvae.HierarchicalVAE',
+                                   z_minibatch, preset_UIDs, dataset: 'AudioDataset',
                                    audio_channel=0, name='AudioDecoderInterp/Valid'):
         # "CUDA illegal memory access (stacktrace might be incorrect)" - seems to be fixed by torch 1.10, CUDA 11.3
         from evaluation.interp import LatentInterpolation  # local import to prevent circular import
+        import model.hierarchicalvae  # local import: only required by this plot
         generative_model = model.hierarchicalvae.AudioDecoder(h_vae)
         interpolator = LatentInterpolation(generator=generative_model, device=z_minibatch.device)
         # z start/end tensors must be be provided as 1 x D vectors
@@ -308,6 +410,7 @@ class RunLogger:
             x = x[:, audio_channel:audio_channel + 1, :, :]
         preset_names = [dataset.get_name_from_preset_UID(UID.item()) for UID in preset_UIDs[0:2]]  # FIXME
         title = "{} '{}' ----> {} '{}'".format(preset_UIDs[0], preset_names[0], preset_UIDs[1], preset_names[1])
+        import utils.figures  # local import: matplotlib is loaded only if something is actually plotted
         fig, _ = utils.figures.plot_spectrograms_interp(u, x, z=z, title=title, plot_delta_spectrograms=True)
         self.add_figure(name, fig)
 
@@ -321,7 +424,7 @@ class RunLogger:
         if self.comet is not None:  # Will check for a context suffix (e.g. /Valid) and activate this context if found
             self.comet.log_figure_with_context(name, fig)
 
-    def plot_stats__threaded(self, super_metrics, ae_model, validation_dataset: AudioDataset):
+    def plot_stats__threaded(self, super_metrics, ae_model, validation_dataset: 'AudioDataset'):
 
         if self.figures_threads['stats'] is not None:
             if self.figures_threads['stats'].is_alive():
@@ -329,48 +432,64 @@ class RunLogger:
                               "Please ignore this message if the training run is about to end. (Joining thread...)")
             self.figures_threads['stats'].join()
         # Data must absolutely be copied - this is multithread, not multiproc (shared data with GIL, no auto pickling)
+        # Super-metrics' snapshots share their arrays, which won't be modified anymore (reallocated at next epoch)
+        super_metrics_snapshot = {k: m.snapshot() for k, m in super_metrics.items()}
         networks_layers_params = dict()  # If remains empty: no plot
         # Don't plot ae_model weights histograms during first epochs (will get much tinier during training)
         if self.current_epoch > 2 * self.train_config.beta_warmup_epochs:
             # FIXME re-activate, get conv weights also - returns clones of layers' parameters
             pass  # networks_layers_params['Decoder'] = ae_model.decoder.get_fc_layers_parameters()
-        # Launch thread using copied data
+        # Launch thread using copied data. Epoch and step are ints (immutable). The thread does not access the
+        #     dataset itself, it only needs its labels names (copied into a tuple)
         self.figures_threads['stats'] = threading.Thread(
             target=self._plot_stats_thread,
-            args=(self.current_epoch, self.current_step, copy.deepcopy(super_metrics), networks_layers_params,
-                  copy.deepcopy(validation_dataset))
+            args=(self.current_epoch, self.current_step, super_metrics_snapshot, networks_layers_params,
+                  tuple(validation_dataset.available_labels_names))
         )
         self.figures_threads['stats'].name = "LoggerStatsPlottingThread"
         self.figures_threads['stats'].start()
 
+    def _get_plot_process_result(self, poll_period_s=1.0):
+        """ Waits for the next result of the plotting process. Raises an exception if this process has stopped
+        (e.g. killed by the OS), instead of waiting forever. """
+        while True:
+            try:
+                return self._plot_results_q.get(timeout=poll_period_s)
+            except queue.Empty:
+                if not self._plot_process.is_alive():
+                    raise RuntimeError("The plotting process has stopped unexpectedly (exit code: {})"
+                                       .format(self._plot_process.exitcode))
+
     def _plot_stats_thread(self, epoch: int, step: int, super_metrics, networks_layers_params,
-                           validation_dataset: AudioDataset):
+                           labels_names: Tuple[str, ...]):
         large_plots = (epoch - self._last_large_plots_epoch) >= self.train_config.large_plots_min_period
         if large_plots:
             self._last_large_plots_epoch = epoch
 
         # Asynchronous (delayed) plots: epoch and step are probably different from the current (self.) ones
+        import logs.logger_mp  # local import: matplotlib is loaded only if something is actually plotted
+        figs_dict, images_dict = dict(), dict()
         if not self.use_multiprocessing:
             figs_dict = logs.logger_mp.get_stats_figures(super_metrics, networks_layers_params)
-        else:
-            # 'spawn' context is slower, but solves observed deadlock
-            #     - deadlock seems to be caused by serializing this instance
-            #     - https://docs.python.org/3/library/multiprocessing.html 'spawn':
-            #       The parent process starts a fresh python interpreter process
-            ctx = multiprocessing.get_context('spawn')  # ctx used instead of multiproc
-            q = ctx.Queue()
-            p = ctx.Process(target=logs.logger_mp.get_stats_figs__multiproc,
-                            args=(q, super_metrics, networks_layers_params))
-            p.start()
-            figs_dict = q.get()  # Will block until an item is available
-            p.join()
-            p.close()
+        else:  # Jobs are processed one at a time (a thread waits for the previous one before starting)
+            self._plot_jobs_q.put((super_metrics, networks_layers_params))
+            # Figures are rendered by the plotting process, and retrieved as images (figures are not pickled)
+            result = self._get_plot_process_result()
+            if isinstance(result, str):  # Formatted exception: this epoch's stats figures are lost, not the others
+                warnings.warn("Stats figures could not be plotted for epoch {}:\n{}".format(epoch, result))
+            else:
+                images_dict = logs.logger_mp.read_shared_images(result)
 
         for fig_name, fig in figs_dict.items():
             if self.tensorboard is not None:
                 self.tensorboard.add_figure(fig_name, fig, epoch, close=True)
             if self.comet is not None:
                 self.comet.log_figure_with_context(fig_name, fig, step)
+        for image_name, image in images_dict.items():
+            if self.tensorboard is not None:
+                self.tensorboard.add_image(image_name, image, epoch, dataformats='HWC')
+            if self.comet is not None:
+                self.comet.log_image_with_context(image_name, image, step)
 
         # Those plots do not need to be here, but multi threading might help improve perfs a bit...
         if epoch > 0:
@@ -395,19 +514,23 @@ class RunLogger:
             if self.tensorboard is not None:
                 self.tensorboard.add_latent_embedding(super_metrics['LatentMetric/Valid'], 'Valid', epoch)
             if self.comet is not None:
-                self.comet.log_latent_embedding(super_metrics['LatentMetric/Valid'], 'Valid', epoch, validation_dataset)
-        # Network weights histograms
+                self.comet.log_latent_embedding(super_metrics['LatentMetric/Valid'], 'Valid', epoch, labels_names)
+        # Network weights histograms: each tensor is converted to a numpy array once, used by all writers
+        histograms = dict()
         for network_name, network_layers in networks_layers_params.items():  # key: e.g. 'Decoder'
             for layer_name, layer_params in network_layers.items():  # key: e.g. 'FC0'
                 for param_name, param_values in layer_params.items():  # key: e.g. 'weight_abs'
                     name = '{}/{}/{}'.format(network_name, layer_name, param_name)
+                    histograms[name] = param_values.detach().cpu().numpy()
                     if self.tensorboard is not None:
                         # Default bins estimator: 'tensorflow'. Other estimator: 'fd' (robust for outliers)
-                        self.tensorboard.add_histogram(name, param_values, epoch)
+                        self.tensorboard.add_histogram(name, histograms[name], epoch)
                         self.tensorboard.add_histogram('{}_no_outlier/{}/{}'.format(network_name, layer_name, param_name),
-                                                       utils.stat.remove_outliers(param_values), epoch)
-                    if self.comet is not None:
-                        self.comet.experiment.log_histogram_3d(param_values, name, step=step, epoch=epoch)
+                                                       utils.stat.remove_outliers(histograms[name]), epoch)
+        if self.comet is not None and len(histograms) > 0:
+            self.comet.log_histograms_3d(histograms, step, epoch)
+        if self.tensorboard is not None:
+            self.tensorboard.flush()  # A single flush for all figures and histograms of this epoch
 
 
 
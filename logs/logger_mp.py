@@ -4,6 +4,13 @@ They are out of the class to prevent serialization and deadlock issues.
 """
 
 import multiprocessing
+import traceback
+from multiprocessing import shared_memory
+from typing import Dict
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.pyplot as plt
 
 import utils.figures
 
@@ -32,5 +39,49 @@ def get_stats_figures(super_metrics, networks_layers_params):
 
 
 def get_stats_figs__multiproc(q: multiprocessing.Queue, super_metrics, networks_layers_params):
-    q.put(get_stats_figures(super_metrics, networks_layers_params))
+    """ Renders the stats figures to RGBA images, written into shared memory blocks (figures are not pickled).
+    Puts a dict of (shared memory name, image shape) tuples into q, to be read by read_shared_images(...). """
+    shared_images = dict()
+    try:
+        for fig_name, fig in get_stats_figures(super_metrics, networks_layers_params).items():
+            canvas = FigureCanvasAgg(fig)
+            canvas.draw()
+            image = np.asarray(canvas.buffer_rgba())
+            plt.close(fig)
+            shm = shared_memory.SharedMemory(create=True, size=image.nbytes)
+            shared_images[fig_name] = (shm.name, image.shape)  # Registered first, to be unlinked if anything fails
+            np.ndarray(image.shape, dtype=np.uint8, buffer=shm.buf)[:] = image
+            shm.close()  # The block will be unlinked by the reading process
+    except Exception:
+        # The reading process will never receive these blocks: they must be freed here, or they would leak
+        for shm_name, _ in shared_images.values():
+            shared_memory.SharedMemory(name=shm_name).unlink()
+        raise
+    q.put(shared_images)
+
+
+def stats_figs_worker_loop(jobs_q: multiprocessing.Queue, results_q: multiprocessing.Queue):
+    """ Main function of a long-lived plotting process: renders each (super_metrics, networks_layers_params) job
+    received from jobs_q (see get_stats_figs__multiproc), until a None job is received. If a job fails, the
+    formatted exception (str) is put into results_q instead of the images, and the process keeps running. """
+    while True:
+        job = jobs_q.get()
+        if job is None:
+            break
+        try:
+            get_stats_figs__multiproc(results_q, *job)
+        except Exception:
+            results_q.put(traceback.format_exc())
+
+
+def read_shared_images(shared_images) -> Dict[str, np.ndarray]:
+    """ Returns the images (HWC RGBA uint8 arrays) written by get_stats_figs__multiproc(...) and frees the
+    corresponding shared memory blocks. """
+    images = dict()
+    for fig_name, (shm_name, shape) in shared_images.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        images[fig_name] = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf).copy()
+        shm.close()
+        shm.unlink()
+    return images
 
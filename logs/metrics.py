@@ -13,6 +13,12 @@ import torch
 from model.hierarchicalvae import HierarchicalVAEOutputs
 
 
+def _read_only_view(a: np.ndarray):
+    v = a.view()
+    v.flags.writeable = False
+    return v
+
+
 class BufferedMetric:
     """ Can store a limited number of metric values in order to get a smoothed estimate of the metric. """
     def __init__(self, buffer_size=10):
@@ -64,24 +70,25 @@ class EpochMetric:
         """
         # :param epoch_end_metric: If given, this class will append end-of-epoch values to this BufferedMetric instance
         self.normalized_losses = normalized_losses
-        self.buffer = list()
+        self.on_new_epoch()
 
     def on_new_epoch(self):
-        self.buffer = list()
+        # Running sum: the mean is available at any time without storing all values
+        self._values_sum, self._values_count = 0.0, 0
 
     def append(self, value, minibatch_size=-1):
         if minibatch_size <= 0:
             assert self.normalized_losses is True
         if isinstance(value, torch.Tensor):
-            self.buffer.append(value.item())
-        else:
-            self.buffer.append(value)
+            value = value.item()
+        self._values_sum += value
+        self._values_count += 1
 
     def get(self):
         """ Returns the mean of values stored since last call to on_new_epoch() """
-        if len(self.buffer) == 0:
+        if self._values_count == 0:
             raise ValueError()
-        return np.asarray(self.buffer).mean()
+        return self._values_sum / self._values_count
 
     @property
     def value(self):
@@ -110,7 +117,7 @@ class VectorMetric:
             self._data = np.zeros((self.dataset_len, minibatch_data.shape[1]))
         batch_len = minibatch_data.shape[0]
         self._data[self.next_dataset_idx:(self.next_dataset_idx+batch_len), :] = \
-            minibatch_data.detach().clone().cpu().numpy()
+            minibatch_data.detach().cpu().numpy()  # No clone: assigning into _data copies the values
         self.next_dataset_idx += batch_len
 
     def get(self):
@@ -118,6 +125,13 @@ class VectorMetric:
             raise AssertionError("Too few items were appended before calling this get() method")
         return self._data
 
+    def snapshot(self):
+        """ Returns a copy of this metric which shares (read-only views of) this metric's data. The data is not
+        copied: the next on_new_epoch() call allocates new arrays instead of modifying the current ones. """
+        s = copy.copy(self)
+        s._data = _read_only_view(self._data)
+        return s
+
 
 
 class LatentMetric:
@@ -146,26 +160,37 @@ class LatentMetric:
         self._avg_abs_corr_spearman_zerodiag = {'z0': -1.0, 'zK': -1.0}
 
     def append(self, z_mu, z_var, z0_samples, zK_samples, labels=None):
-        """ Internally duplicates the latent values (and labels) of a minibatch """
+        """ Internally duplicates the latent values (and labels) of a minibatch (copied into pre-allocated storage,
+        tensors don't need to be cloned first) """
         batch_len = z0_samples.shape[0]
         if zK_samples is None:
             zK_samples = z0_samples
         # Use pre-allocated storage matrices
-        storage_rows = range(self.next_dataset_index, self.next_dataset_index+batch_len)
-        self._z['mu'][storage_rows, :] = z_mu[:, :].clone().detach().cpu().numpy()
-        self._z['sigma'][storage_rows, :] = np.sqrt(z_var[:, :].clone().detach().cpu().numpy())
-        self._z['z0'][storage_rows, :] = z0_samples.clone().detach().cpu().numpy()
-        self._z['zK'][storage_rows, :] = zK_samples.clone().detach().cpu().numpy()
+        storage_rows = slice(self.next_dataset_index, self.next_dataset_index+batch_len)
+        self._z['mu'][storage_rows, :] = z_mu.detach().cpu().numpy()
+        self._z['sigma'][storage_rows, :] = np.sqrt(z_var.detach().cpu().numpy())
+        self._z['z0'][storage_rows, :] = z0_samples.detach().cpu().numpy()
+        self._z['zK'][storage_rows, :] = zK_samples.detach().cpu().numpy()
         if 'label' in self.valid_keys:
             if labels is None:
                 raise ValueError("labels argument must be provided (dim_label was provided to class ctor)")
             else:
-                self._z['label'][storage_rows, :] = labels.clone().detach().cpu().numpy()
+                self._z['label'][storage_rows, :] = labels.detach().cpu().numpy()
         else:
             if labels is not None:
                 raise ValueError("labels argument cannot be provided because dim_label was not provided to class ctor")
         self.next_dataset_index += batch_len
 
+    def snapshot(self):
+        """ Returns a copy of this metric which shares (read-only views of) this metric's latent values. The data is
+        not copied: the next on_new_epoch() call allocates new arrays instead of modifying the current ones. """
+        s = copy.copy(self)
+        s._z = {k: _read_only_view(z) for k, z in self._z.items()}
+        s._spearman_corr_matrix = dict(self._spearman_corr_matrix)  # Small dicts, might be filled on demand
+        s._spearman_corr_matrix_zerodiag = dict(self._spearman_corr_matrix_zerodiag)
+        s._avg_abs_corr_spearman_zerodiag = dict(self._avg_abs_corr_spearman_zerodiag)
+        return s
+
     def append_hierarchical_latent(self, ae_out: HierarchicalVAEOutputs, label=None):
         z_sampled = ae_out.get_z_sampled_no_hierarchy()  # FIXME no zK yet (NFlows)
         self.append(ae_out.get_z_mu_no_hierarchy(), ae_out.get_z_var_no_hierarchy(), z_sampled, z_sampled, label)
@@ -200,7 +225,7 @@ class LatentMetric:
         if not (z_type == 'z0' or z_type == 'zK'):
             raise AssertionError("Cannot compute correlation for latent data '{}'".format(z_type))
         self._spearman_corr_matrix[z_type], _ = scipy.stats.spearmanr(self.get_z(z_type))  # We don't use p-values
-        self._spearman_corr_matrix_zerodiag[z_type] = copy.deepcopy(self._spearman_corr_matrix[z_type])
+        self._spearman_corr_matrix_zerodiag[z_type] = self._spearman_corr_matrix[z_type].copy()
         for i in range(self._spearman_corr_matrix_zerodiag[z_type].shape[0]):
             self._spearman_corr_matrix_zerodiag[z_type][i, i] = 0.0
         self._avg_abs_corr_spearman_zerodiag[z_type] = np.abs(self._spearman_corr_matrix_zerodiag[z_type]).mean()
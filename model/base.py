@@ -1,6 +1,9 @@
 """
 Contains base classes (abstract or not) for models.
 """
+import concurrent.futures
+import mmap
+import os
 import pathlib
 import warnings
 from abc import abstractmethod
@@ -12,6 +15,7 @@ import torch
 import torch.nn as nn
 
 import config
+import utils.jsonio
 
 
 def build_optimizer(train_config: config.TrainConfig, lr: float, parameters):
@@ -62,6 +66,189 @@ def set_optimizer_lr(optimizer, lr):
         param_group['lr'] = lr
 
 
+def _state_to_cpu(state, pinned_pool: Dict[tuple, List[torch.Tensor]], used_pinned_buffers: List[torch.Tensor]):
+    """ Returns a copy of a (nested) state dict whose tensors are CPU copies of the original ones (the copies can be
+    written to disk while the original tensors keep being modified). Device-to-host copies are non-blocking
+    (into pinned memory) and must be synchronized by the caller.
+
+    :param pinned_pool: Pinned buffers available for re-use (keys are (shape, dtype) tuples).
+    :param used_pinned_buffers: Pinned buffers used by the returned state dict will be appended to this list.
+    """
+    if isinstance(state, torch.Tensor):
+        if state.is_cuda:
+            available_buffers = pinned_pool.get((tuple(state.shape), state.dtype), None)
+            if available_buffers:
+                cpu_tensor = available_buffers.pop()
+            else:  # cudaHostAlloc is expensive: allocations are avoided as much as possible
+                cpu_tensor = torch.empty(state.shape, dtype=state.dtype, pin_memory=True)
+            used_pinned_buffers.append(cpu_tensor)
+            # Issued on the current stream of the tensor's device (see _synchronize_copies)
+            with torch.cuda.device(state.device):
+                return cpu_tensor.copy_(state.detach(), non_blocking=True)
+        else:
+            return state.detach().clone()
+    elif isinstance(state, dict):
+        return {k: _state_to_cpu(v, pinned_pool, used_pinned_buffers) for k, v in state.items()}
+    elif isinstance(state, (list, tuple)):
+        return type(state)(_state_to_cpu(v, pinned_pool, used_pinned_buffers) for v in state)
+    else:
+        return copy.deepcopy(state)
+
+
+# ================================== Loading-optimized weights store =================================
+# All tensors of the models' state dicts are stored as raw bytes into a single file (4kB-aligned), and a small JSON
+# index maps each tensor's name to [offset, nbytes, dtype, shape]. Tensors can then be loaded from a memory-mapped
+# file, without unpickling and without any intermediate storage allocation.
+_weights_store_alignment = 4096
+# torch.save issues many small writes: they are gathered into large chunks by the file object's buffer
+_checkpoint_write_buffer_size = 16 * 1024 * 1024
+
+
+def _get_weights_store_paths(checkpoint_path: pathlib.Path):
+    """ Returns the paths to the weights store and to its index, stored next to the checkpoint.tar file. """
+    return checkpoint_path.with_name('checkpoint_weights.bin'), checkpoint_path.with_name('checkpoint_weights.json')
+
+
+def _get_weights_store_index(state_dicts: Dict[str, Dict[str, torch.Tensor]]):
+    """ Returns the index (dict of [offset, nbytes, dtype, shape] lists, keys are 'group/param' names) of the given
+    dict of models' state dicts, and the total size (in bytes) of the weights file. """
+    index, offset = dict(), 0
+    for group_name, state_dict in state_dicts.items():
+        for param_name, t in state_dict.items():
+            if offset % _weights_store_alignment != 0:
+                offset += _weights_store_alignment - (offset % _weights_store_alignment)
+            nbytes = t.numel() * t.element_size()
+            index[group_name + '/' + param_name] = [offset, nbytes, str(t.dtype).replace('torch.', ''), list(t.shape)]
+            offset += nbytes
+    return index, offset
+
+
+def _tensor_bytes(t: torch.Tensor):
+    """ Returns a (uint8 memoryview, no copy for contiguous CPU tensors) buffer of the given tensor's data. """
+    return memoryview(t.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy())
+
+
+_iov_max = os.sysconf('SC_IOV_MAX') if hasattr(os, 'sysconf') and 'SC_IOV_MAX' in os.sysconf_names else 1024
+
+
+def _write_buffers_at(fd: int, buffers: List[memoryview], offset: int):
+    """ Writes the given buffers one after the other, starting at the given file offset. Vectored writes are
+    used if available (a single syscall for up to IOV_MAX buffers). """
+    buffers = [b for b in buffers if b.nbytes > 0]
+    if not hasattr(os, 'pwritev'):  # e.g. Windows
+        for b in buffers:
+            os.lseek(fd, offset, os.SEEK_SET)
+            offset += os.write(fd, b)  # Regular files: never a partial write without error
+        return
+    while len(buffers) > 0:
+        n_written = os.pwritev(fd, buffers[:_iov_max], offset)
+        offset += n_written
+        # Remove the written buffers (the last one might have been partially written)
+        i = 0
+        while i < len(buffers) and n_written >= buffers[i].nbytes:
+            n_written -= buffers[i].nbytes
+            i += 1
+        buffers = buffers[i:]
+        if n_written > 0:
+            buffers[0] = buffers[0][n_written:]
+
+
+def _write_weights_store(state_dicts: Dict[str, Dict[str, torch.Tensor]], checkpoint_path: pathlib.Path,
+                         use_gds=False):
+    """ Writes the given dict of models' state dicts (keys are param group names) as a weights store.
+
+    :param use_gds: If True, CUDA tensors are written directly from GPU memory using GPUDirect Storage.
+    """
+    weights_path, index_path = _get_weights_store_paths(checkpoint_path)
+    index, total_size = _get_weights_store_index(state_dicts)
+    tensors = {group_name + '/' + param_name: t
+               for group_name, state_dict in state_dicts.items() for param_name, t in state_dict.items()}
+    tmp_path = weights_path.with_suffix('.tmp')
+    gds_tensors = {name: t for name, t in tensors.items() if t.is_cuda} if use_gds else dict()
+    with open(tmp_path, 'wb') as f:
+        f.truncate(total_size)
+        # Contiguous runs of tensors (and zero-padding for alignment) are written using a few vectored writes
+        run_offset, run_end, run_buffers = 0, 0, list()
+        for name, t in tensors.items():
+            offset, nbytes = index[name][0], index[name][1]
+            if name in gds_tensors:  # The current run ends here (hole in the file, to be written by GDS)
+                _write_buffers_at(f.fileno(), run_buffers, run_offset)
+                run_offset, run_end, run_buffers = offset + nbytes, offset + nbytes, list()
+                continue
+            if offset > run_end:
+                run_buffers.append(memoryview(bytes(offset - run_end)))
+            run_buffers.append(_tensor_bytes(t))
+            run_end = offset + nbytes
+        _write_buffers_at(f.fileno(), run_buffers, run_offset)
+    if len(gds_tensors) > 0:
+        gds_file = torch.cuda.gds.GdsFile(str(tmp_path), os.O_RDWR)
+        for name, t in gds_tensors.items():
+            gds_file.save_storage(_get_exact_storage(t), index[name][0])
+        del gds_file  # Closes the file handle
+    os.replace(tmp_path, weights_path)
+    utils.jsonio.dump(index, index_path)
+
+
+def _get_exact_storage(t: torch.Tensor):
+    """ Returns a storage which contains exactly the bytes of the given tensor (a contiguous copy is made if the
+    tensor is a view which does not use its entire storage). """
+    if t.is_contiguous() and t.storage_offset() == 0 and t.untyped_storage().nbytes() == t.numel() * t.element_size():
+        return t.untyped_storage()
+    else:
+        return t.detach().clone(memory_format=torch.contiguous_format).untyped_storage()
+
+
+def is_gds_available():
+    """ Returns True if GPUDirect Storage can be used to read/write checkpoints. """
+    return torch.cuda.is_available() and hasattr(torch.cuda, 'gds')
+
+
+def _read_weights_store(checkpoint_path: pathlib.Path) -> Dict[str, Dict[str, torch.Tensor]]:
+    """ Returns the models' state dicts (keys are param group names) from a memory-mapped weights store. Returned
+    tensors are views of the mapped file, and should be copied (e.g. by load_state_dict) into actual params. """
+    weights_path, index_path = _get_weights_store_paths(checkpoint_path)
+    index = utils.jsonio.load(index_path)
+    with open(weights_path, 'rb') as f:
+        # Copy-on-write mapping: writable buffer (required by torch.frombuffer), the file is never modified
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY) if os.fstat(f.fileno()).st_size > 0 else b''
+    state_dicts = dict()
+    for name, (offset, nbytes, dtype, shape) in index.items():
+        group_name, param_name = name.split('/', 1)
+        dtype = getattr(torch, dtype)
+        if nbytes > 0:
+            t = torch.frombuffer(mm, dtype=torch.uint8, count=nbytes, offset=offset).view(dtype).reshape(shape)
+        else:
+            t = torch.empty(shape, dtype=dtype)
+        state_dicts.setdefault(group_name, dict())[param_name] = t
+    return state_dicts
+
+
+def _load_weights_store_gds(checkpoint_path: pathlib.Path, group_modules: Dict[str, nn.Module]):
+    """ Loads CUDA params and buffers of the given modules (keys are param group names) directly from the weights
+    store into GPU memory, using GPUDirect Storage. Returns the names ('group/param') of the loaded tensors. """
+    weights_path, index_path = _get_weights_store_paths(checkpoint_path)
+    index = utils.jsonio.load(index_path)
+    gds_file = torch.cuda.gds.GdsFile(str(weights_path), os.O_RDONLY)
+    loaded_names = set()
+    with torch.no_grad():
+        for group_name, group_module in group_modules.items():
+            for param_name, t in group_module.state_dict(keep_vars=True).items():
+                name = group_name + '/' + param_name
+                if name not in index or not t.is_cuda:
+                    continue
+                offset, nbytes, dtype, shape = index[name]
+                if getattr(torch, dtype) != t.dtype or list(t.shape) != shape:
+                    raise ValueError("'{}' tensor from {} (dtype={}, shape={}) does not match the model's tensor "
+                                     "(dtype={}, shape={})".format(name, weights_path, dtype, shape, t.dtype, t.shape))
+                storage = _get_exact_storage(t)
+                gds_file.load_storage(storage, offset)
+                if storage.data_ptr() != t.untyped_storage().data_ptr():  # Data was loaded into a copy
+                    t.copy_(torch.empty(0, dtype=t.dtype, device=t.device).set_(storage).view(t.shape))
+                loaded_names.add(name)
+    del gds_file
+    return loaded_names
+
+
 class TrainableModel(nn.Module):
     def __init__(self, train_config: Optional[config.TrainConfig] = None, model_type: Optional[str] = None):
         """
@@ -174,6 +361,12 @@ class TrainableMultiGroupModel(nn.Module):
         self.param_group_names, self.trained_param_group_names = param_group_names, trained_param_group_names
         self._optimizers = {k: None for k in param_group_names}
         self._schedulers = {k: None for k in param_group_names}
+        # Single-thread executor (created when first needed), such that a single checkpoint is written at once
+        self._checkpoint_executor = None  # type: Optional[concurrent.futures.ThreadPoolExecutor]
+        self._checkpoint_saving_future = None  # type: Optional[concurrent.futures.Future]
+        # Pinned CPU buffers for non-blocking checkpoints: re-used by all checkpoints (keys are (shape, dtype) tuples)
+        self._checkpoint_pinned_pool = dict()  # type: Dict[tuple, List[torch.Tensor]]
+        self._checkpoint_pinned_buffers_in_use = list()  # type: List[torch.Tensor]
 
     @property
     def pre_training_audio(self):
@@ -220,8 +413,14 @@ class TrainableMultiGroupModel(nn.Module):
             else:
                 self._schedulers[k].step()
 
-    def save_checkpoints(self, model_dir: pathlib.Path):
-        """ Saves all sub-models into a unique checkpoint.tar file (non-trained sub-models will be saved as None). """
+    def save_checkpoints(self, model_dir: pathlib.Path, blocking=True):
+        """ Saves all sub-models into a unique checkpoint.tar file (non-trained sub-models will be saved as None).
+
+        :param blocking: If False, this method returns as soon as all tensors have been copied to CPU memory, and
+            the file is written by a background thread (see wait_for_checkpoints_saved()).
+        """
+        self.wait_for_checkpoints_saved()  # A previous checkpoint might still be being written
+        checkpoint_path = model_dir.joinpath("checkpoint.tar")
         checkpoint_dict = dict()
         for k in self.param_group_names:
             checkpoint_dict[k] = dict()
@@ -235,20 +434,93 @@ class TrainableMultiGroupModel(nn.Module):
                 checkpoint_dict[k] = {
                     'model_state_dict': None, 'optimizer_state_dict': None, 'scheduler_state_dict': None
                 }
-        torch.save(checkpoint_dict, model_dir.joinpath("checkpoint.tar"))
+        if self.use_gds:  # Weights written first, directly from GPU memory (before any copy to CPU memory)
+            _write_weights_store({k: c['model_state_dict'] for k, c in checkpoint_dict.items()
+                                  if c['model_state_dict'] is not None}, checkpoint_path, use_gds=True)
+        if blocking:
+            self._write_checkpoints(checkpoint_dict, checkpoint_path)
+        else:
+            checkpoint_dict = _state_to_cpu(checkpoint_dict, self._checkpoint_pinned_pool,
+                                            self._checkpoint_pinned_buffers_in_use)
+            # Wait for all non-blocking device-to-host copies: only the streams which received copies are
+            #    synchronized, on all devices which hold a part of the model (torch.cuda.synchronize() would wait
+            #    for all streams of the current device only)
+            devices = {p.device for p in self.parameters() if p.is_cuda}
+            for device in devices:
+                torch.cuda.current_stream(device).synchronize()
+            if self._checkpoint_executor is None:
+                self._checkpoint_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix='CheckpointWriter')
+            self._checkpoint_saving_future = self._checkpoint_executor.submit(
+                self._write_checkpoints, checkpoint_dict, checkpoint_path)
+
+    @property
+    def use_gds(self):
+        """ Whether checkpoints weights are directly read from / written to GPU memory (GPUDirect Storage). """
+        return getattr(self._train_config, 'use_gds', False) and is_gds_available()
+
+    def _write_checkpoints(self, checkpoint_dict, checkpoint_path: pathlib.Path):
+        if not self.use_gds:  # Otherwise, already written
+            _write_weights_store({k: c['model_state_dict'] for k, c in checkpoint_dict.items()
+                                  if c['model_state_dict'] is not None}, checkpoint_path)
+        # Models' weights are not pickled again: checkpoint.tar contains the optimizers and schedulers only
+        lean_checkpoint_dict = {k: dict(c, model_state_dict=None, weights_in_store=(c['model_state_dict'] is not None))
+                                for k, c in checkpoint_dict.items()}
+        # Written to a temp file first: checkpoints are never partial
+        tmp_path = checkpoint_path.with_suffix('.tmp')
+        with open(tmp_path, 'wb', buffering=_checkpoint_write_buffer_size) as f:
+            torch.save(lean_checkpoint_dict, f)
+        os.replace(tmp_path, checkpoint_path)
         if self._train_config.verbosity >= 1:
-            print("[RunLogger] Saved checkpoint (models, optimizers, schedulers) to {}"
-                  .format(model_dir.joinpath("checkpoint.tar")))
+            print("[RunLogger] Saved checkpoint (models, optimizers, schedulers) to {}".format(checkpoint_path))
+
+    def wait_for_checkpoints_saved(self):
+        """ Blocks until the checkpoint written by a non-blocking save_checkpoints(...) call is on disk. Exceptions
+        raised while writing the checkpoint are re-raised here. """
+        try:
+            if self._checkpoint_saving_future is not None:
+                future, self._checkpoint_saving_future = self._checkpoint_saving_future, None
+                future.result()
+        finally:
+            # Pinned buffers can be re-used once they have been written to disk
+            for buffer in self._checkpoint_pinned_buffers_in_use:
+                self._checkpoint_pinned_pool.setdefault((tuple(buffer.shape), buffer.dtype), list()).append(buffer)
+            self._checkpoint_pinned_buffers_in_use = list()
 
     def load_checkpoints(self, checkpoints_path: pathlib.Path, reload_opt_sched=False, map_location=None):
         """ Loads weights from pre-trained submodels (dicts corresponding to non-pretrained sub-models are set
-        to None values). """
-        checkpoint_dict = torch.load(checkpoints_path, map_location=map_location)
+        to None values). If available, weights are loaded from the memory-mapped weights store saved next to the
+        checkpoint.tar file (map_location is then useless: tensors are copied directly into this model's params). """
+        checkpoints_path = pathlib.Path(checkpoints_path)
+        if _get_weights_store_paths(checkpoints_path)[1].exists():
+            checkpoint_dict = {k: {'model_state_dict': state_dict}
+                               for k, state_dict in _read_weights_store(checkpoints_path).items()}
+            if self.use_gds:  # CUDA tensors already loaded, the others will be loaded from the mmap-ed file
+                gds_loaded_names = _load_weights_store_gds(
+                    checkpoints_path, {k: self.get_custom_group_module(k) for k in checkpoint_dict.keys()})
+                for k, submodel_checkpoint in checkpoint_dict.items():
+                    state_dict = submodel_checkpoint['model_state_dict']
+                    for param_name in list(state_dict.keys()):
+                        if k + '/' + param_name in gds_loaded_names:
+                            del state_dict[param_name]
+                    submodel_checkpoint['strict'] = False
+        else:  # Older checkpoints
+            if map_location is None:  # Directly onto this model's device (not onto the device it was saved from)
+                map_location = next(self.parameters()).device
+            try:  # Storages are lazily mapped from the file, instead of being read entirely into RAM first
+                checkpoint_dict = torch.load(checkpoints_path, map_location=map_location, weights_only=True,
+                                             mmap=True)
+            except (RuntimeError, TypeError):  # Legacy (non-zipfile) format, or torch < 2.1 (no mmap arg)
+                checkpoint_dict = torch.load(checkpoints_path, map_location=map_location, weights_only=True)
+            if any([c.get('weights_in_store', False) for c in checkpoint_dict.values() if c is not None]):
+                raise FileNotFoundError("Weights of {} are stored in {}, which is missing".format(
+                    checkpoints_path, _get_weights_store_paths(checkpoints_path)[0]))
         for k, submodel_checkpoint in checkpoint_dict.items():
             assert k in self.param_group_names  # e.g. 'audio', 'latent' or 'preset'
             if submodel_checkpoint is not None and submodel_checkpoint['model_state_dict'] is not None:
                 group_module = self.get_custom_group_module(k)
-                group_module.load_state_dict(submodel_checkpoint['model_state_dict'])
+                group_module.load_state_dict(submodel_checkpoint['model_state_dict'],
+                                             strict=submodel_checkpoint.get('strict', True))
                 if self._train_config.verbosity >= 1:
                     print("[TrainableMultiGroupModel] Loaded '{}' model_state_dict from {}".format(k, checkpoints_path))
                 if reload_opt_sched:  # FIXME TODO???
@@ -3,6 +3,7 @@
 Defines some basic layer Classes to be integrated into bigger networks
 """
 import copy
+import math
 from typing import Optional, Tuple
 from abc import ABC, abstractmethod
 
@@ -17,24 +18,35 @@ import torch.nn.utils
 import warnings
 
 
+def _get_act_instance(act: nn.Module):
+    """ Returns the given activation module itself if it is stateless (e.g. ReLU, no params or buffers: it can be
+    shared by several layers), or a deep copy of it otherwise (e.g. PReLU). """
+    if next(act.parameters(), None) is None and next(act.buffers(), None) is None:
+        return act
+    return copy.deepcopy(act)
+
+
 class AdaIN(nn.Module):
     def __init__(self, num_style_features, num_conv_ch):
         """ Adaptive Instance Normalization, inspired by the StyleGAN generator architecture. """
         super().__init__()
-        self.norm = nn.InstanceNorm2d(num_conv_ch, affine=False)  # No learnable params
+        self.norm = nn.InstanceNorm2d(num_conv_ch, affine=False)  # No learnable params (only eps is used)
         # Affine transforms (through basic affine FC layers) to compute normalization bias and scale
         self.bias_nn = nn.Linear(num_style_features, num_conv_ch)
         self.scale_nn = nn.Linear(num_style_features, num_conv_ch)
 
     def forward(self, x, w_style):
         """ Normalizes and rescales/re-biases the 2D feature maps x using style vectors w. """
-        x = self.norm(x)
         b, s = self.bias_nn(w_style), self.scale_nn(w_style)
         # x shape : N x C x H x W  (W: time ; H: frequency)
         # w shape : N x C
-        b = torch.unsqueeze(torch.unsqueeze(b, 2), 3).expand(-1, -1, x.shape[2], x.shape[3])
-        s = torch.unsqueeze(torch.unsqueeze(s, 2), 3).expand(-1, -1, x.shape[2], x.shape[3])
-        return x * s + b
+        # Instance norm and style affine transform are folded into a per-(N, C) scale and bias (small tensors,
+        #    broadcast over H and W), then applied by a single fused kernel: no normalized N x C x H x W tensor
+        # Stats are computed in float32: the H x W reduction could overflow or lose precision in half precision
+        var, mean = torch.var_mean(x.float(), dim=(2, 3), correction=0, keepdim=True)
+        scale = s[:, :, None, None] * torch.rsqrt(var + self.norm.eps)
+        bias = b[:, :, None, None] - mean * scale
+        return torch.addcmul(bias.to(x.dtype), x, scale.to(x.dtype))
 
 
 class ActAndNorm(nn.Module):
@@ -102,6 +114,7 @@ class SelfAttentionConv2D(nn.Module):
                 self._precomputed_pos_enc = self.get_sinusoidal_position_encoding_2d(dummy_x)
         self.C = n_ch
         self.Cint = ((self.C // 8) if internal_n_ch is None else internal_n_ch)
+        self._attention_scale = 1.0 / math.sqrt(self.Cint)  # Python float: no tensor op to compute the scale
         # Key, Query and Value matrices implemented using 1x1 1D convolutions (flattened input) without bias
         self.Wq = nn.Conv1d(self.C, self.Cint, kernel_size=(1,), bias=False)
         self.Wk = nn.Conv1d(self.C, self.Cint, kernel_size=(1,), bias=False)
@@ -161,14 +174,16 @@ class SelfAttentionConv2D(nn.Module):
 
     def forward(self, x):
         if self._use_position_encoding:  # Recompute if necessary
-            if self._precomputed_pos_enc is None \
-               or (self._precomputed_pos_enc is not None and self._precomputed_pos_enc.shape[2:] != x.shape[2:]):
-                self._precomputed_pos_enc = self.get_sinusoidal_position_encoding_2d(x)
-            x += self._precomputed_pos_enc.to(x.device).expand(x.shape[0], -1, -1, -1)
+            if self._precomputed_pos_enc is None or self._precomputed_pos_enc.shape[2:] != x.shape[2:]:
+                self._precomputed_pos_enc = self.get_sinusoidal_position_encoding_2d(x[0:1])
+            if self._precomputed_pos_enc.device != x.device:  # Moved once (not copied to the GPU at each forward)
+                self._precomputed_pos_enc = self._precomputed_pos_enc.to(x.device)
+            x += self._precomputed_pos_enc  # 1 x C x H x W encodings, broadcast to all minibatch items
         # SAGAN paper: Feature maps are represented as 2D (with C input channels) in Fig.2,
         # but input features are described as flattened to CxN (1D, not CxWxH 2D data) in the paper itself
         L = x.shape[2] * x.shape[3]  # Corresponds to the sequence length (if this was an NLP model)
-        x_flat = x.view(x.shape[0], x.shape[1], L)  # compatible strides, shared memory
+        # compatible strides, shared memory (a contiguous copy is made if x uses the channels_last memory format)
+        x_flat = x.reshape(x.shape[0], x.shape[1], L)
         # If we consider batch item 0 only:
         # Query, key and value are matrices with shape Cint x N     where N = W*H
         query, key, value = self.Wq(x_flat), self.Wk(x_flat), self.Wv(x_flat)
@@ -178,11 +193,20 @@ class SelfAttentionConv2D(nn.Module):
         #     - QT.K to compute similarity between pixels (instead of Q.KT) because channels/pixel pos axes
         #          instead of word position / embedding coordinates
         #     - Apply softmax along the rows axis, such that each column sums to 1
-        att = torch.bmm(query.transpose(1, 2), key) / np.sqrt(self.Cint)
-        att = F.softmax(att, dim=1)
-        att_output = torch.bmm(value, att)
-        # Increase number of channels before adding to the input
-        return x + self.W_out_v(att_output).view(x.shape) * self.gamma  # TODO use contiguous after final reshape ?
+        if hasattr(F, 'scaled_dot_product_attention'):  # torch >= 2.0
+            # Fused (Flash or memory-efficient) kernel: the N x N attention matrix is never entirely stored.
+            # Softmax along the rows of QT.K is the usual attention, with the roles of Q and K swapped
+            #     (keys are the 'sequence queries'). Default scale is 1/sqrt(Cint). Shapes: N x 1 head x L x Cint
+            att_output = F.scaled_dot_product_attention(
+                key.transpose(1, 2).unsqueeze(1), query.transpose(1, 2).unsqueeze(1), value.transpose(1, 2).unsqueeze(1)
+            ).squeeze(1).transpose(1, 2)
+        else:
+            att = torch.bmm(query.transpose(1, 2), key) * self._attention_scale
+            att = F.softmax(att, dim=1)
+            att_output = torch.bmm(value, att)
+        # Increase number of channels before adding to the input (single fused kernel for gamma scaling and add)
+        #     reshape: att_output from the fused kernel is not contiguous (copied if W_out_v is an identity)
+        return torch.add(x, self.W_out_v(att_output).reshape(x.shape), alpha=self.gamma)
 
 
 class Conv2D(ActAndNorm):
@@ -220,7 +244,7 @@ class ResConv2DBase(nn.Module, ABC):
         self.conv1_act_bn = None  # to be set by child class
         self.conv2 = None
         self.residuals_conv = nn.Conv2d(in_ch, out_ch, (1, 1)) if (in_ch != out_ch) else None
-        self.act_norm_2 = ActAndNorm(in_ch, out_ch, copy.deepcopy(act),
+        self.act_norm_2 = ActAndNorm(in_ch, out_ch, _get_act_instance(act),
                                      norm_layer, adain_num_style_features)
 
     @abstractmethod
@@ -288,18 +312,20 @@ class ResTConv2D(ResConv2DBase):
 
 
 class Upsampling2d(nn.Module):
-    def __init__(self, scale_factor: Tuple[int, int], w_input_exists=True):
-        """ Upsampling module that can be used inside a sequence of conv modules with conditioning vector w. """
+    def __init__(self, scale_factor: Tuple[int, int], w_input_exists=True, mode='bilinear'):
+        """ Upsampling module that can be used inside a sequence of conv modules with conditioning vector w.
+
+        :param mode: 'bilinear' (default, used by trained models) or 'nearest' (much cheaper, memory-bound only)
+        """
         super().__init__()
         self.w_input_exists = w_input_exists
-        self.scale_factor = scale_factor
+        self.scale_factor = tuple(float(f) for f in scale_factor)  # Integer factors: same output size and sampling
+        self.mode = mode
+        self.align_corners = False if mode == 'bilinear' else None  # Must be None for 'nearest'
 
     def forward(self, x_and_w):
         x, w = (x_and_w[0], x_and_w[1]) if self.w_input_exists else (x_and_w, None)
-        output_feature_maps_size = list(x.shape[2:4])
-        output_feature_maps_size[0] *= self.scale_factor[0]
-        output_feature_maps_size[1] *= self.scale_factor[1]
-        x = F.interpolate(x, output_feature_maps_size, mode='bilinear', align_corners=False)
+        x = F.interpolate(x, scale_factor=self.scale_factor, mode=self.mode, align_corners=self.align_corners)
         return (x, w) if self.w_input_exists else x
 
 
@@ -339,7 +365,7 @@ class ResBlock3Layers(nn.Module):
         norm_name = 'bn' if bn else ('adain' if adain else None)  # 1st layer: BN has the priority over AdaIN
         self.res_convs.add_module('redu1x1',
                                   Conv2D(in_ch, internal_3x3_ch, (1, 1), (1, 1), (0, 0),  # kernel, stride, padding
-                                         act=copy.deepcopy(act), reverse_order=True,
+                                         act=_get_act_instance(act), reverse_order=True,
                                          norm_layer=norm_name, adain_num_style_features=adain_num_style_features))
 
         norm_name = 'adain' if adain else ('bn' if bn else None)  # 2nd layer: AdaIN has the priority over BN
@@ -367,19 +393,30 @@ class ResBlock3Layers(nn.Module):
                                                                #padding=(conv_stride[0] - 1, conv_stride[1] - 1)))
         self.res_convs.add_module('conv3x3',
                                   Conv2D(internal_3x3_ch, internal_3x3_ch, (3, 3), conv_stride, conv_padding,
-                                         act=copy.deepcopy(act), reverse_order=True,
+                                         act=_get_act_instance(act), reverse_order=True,
                                          norm_layer=norm_name, adain_num_style_features=adain_num_style_features))
 
         norm_name = 'bn' if bn else ('adain' if adain else None)  # 3rd layer: BN has the priority over AdaIN
         self.res_convs.add_module('incr1x1',
                                   Conv2D(internal_3x3_ch, out_ch, (1, 1), (1, 1), (0, 0),
-                                         act=copy.deepcopy(act), reverse_order=True,
+                                         act=_get_act_instance(act), reverse_order=True,
                                          norm_layer=norm_name, adain_num_style_features=adain_num_style_features))
 
         if len(self.resize_module) == 0:
             del self.resize_module
             self.resize_module = None
 
+        # Decreasing number of channels: input channels are split into out_ch groups, and the average of each group
+        #    is added to the residuals. All averages are computed at once by a 1x1 conv with constant weights
+        #    (not saved into state dicts: identical for all models with the same in/out ch)
+        if self.in_ch > self.out_ch:
+            group_average_weights = torch.zeros((self.out_ch, self.in_ch, 1, 1))
+            for out_ch_index, in_ch_indices in enumerate(np.array_split(np.arange(0, self.in_ch), self.out_ch)):
+                group_average_weights[out_ch_index, in_ch_indices, 0, 0] = 1.0 / in_ch_indices.shape[0]
+            self.register_buffer('group_average_weights', group_average_weights, persistent=False)
+        else:
+            self.group_average_weights = None
+
     def forward(self, x_and_w):
         """
         :param x_and_w: Tuple: Feature maps x, conditiong (style) vector w
@@ -405,11 +442,7 @@ class ResBlock3Layers(nn.Module):
             x = res
         elif self.in_ch > self.out_ch:  # Decreasing number of channels (e.g. in a decoder)
             # Split input channels into out_ch groups, add (and normalize) all channels from each group
-            in_ch_split_indices = np.array_split(np.arange(0, self.in_ch), self.out_ch)
-            for out_ch_index, in_ch_indices in enumerate(in_ch_split_indices):
-                for in_ch_index in list(in_ch_indices):
-                    res[:, out_ch_index, :, :] += (x[:, in_ch_index, :, :] / in_ch_indices.shape[0])
-            x = res
+            x = res + F.conv2d(x, self.group_average_weights)
 
         return x, w
 
@@ -455,6 +488,44 @@ class ConvBlock2D(nn.Sequential):
     def out_channels(self):
         return self.c.out_channels
 
+    @torch.no_grad()
+    def fuse_batch_norm(self) -> bool:
+        """ Folds the BN layer into the weights and bias of an adjacent nn.Conv2d (no activation between them), using
+        BN running stats. The BN layer is then replaced by an identity. Must be used for inference only (eval mode).
+
+        :returns: True if the BN layer has been folded, False if this block can't be fused.
+        """
+        modules_keys = list(self._modules.keys())
+        if not ('n' in modules_keys and 'c' in modules_keys and isinstance(self.n, nn.BatchNorm2d)
+                and isinstance(self.c, nn.Conv2d) and abs(modules_keys.index('n') - modules_keys.index('c')) == 1):
+            return False
+        conv, bn = self.c, self.n
+        bn_before_conv = modules_keys.index('n') < modules_keys.index('c')
+        # BN->conv is exact if zero-padded borders do not exist (they would not be BN-biased), single group only
+        if bn_before_conv and (conv.groups != 1 or any([p != 0 for p in conv.padding])):
+            return False
+        bn_scale = bn.weight * torch.rsqrt(bn.running_var + bn.eps)  # BN(x) = x * bn_scale + bn_bias
+        bn_bias = bn.bias - bn.running_mean * bn_scale
+        if conv.bias is None:
+            conv.bias = nn.Parameter(torch.zeros(conv.out_channels, dtype=conv.weight.dtype,
+                                                 device=conv.weight.device))
+        if not bn_before_conv:  # conv->BN: output channels are rescaled
+            conv.weight.mul_(bn_scale[:, None, None, None])
+            conv.bias.mul_(bn_scale).add_(bn_bias)
+        else:  # BN->conv: input channels are rescaled
+            conv.bias.add_((conv.weight * bn_bias[None, :, None, None]).sum(dim=(1, 2, 3)))
+            conv.weight.mul_(bn_scale[None, :, None, None])
+        self.n = nn.Identity()
+        return True
+
+
+def fuse_batch_norms(module: nn.Module) -> int:
+    """ Folds BN layers into adjacent convolutions, for all ConvBlock2D sub-modules of the given module (which must
+    be in eval mode, and must not be trained anymore). Returns the number of folded BN layers. """
+    if module.training:
+        raise RuntimeError("BN layers can be fused in eval mode only")
+    return sum([int(m.fuse_batch_norm()) for m in list(module.modules()) if isinstance(m, ConvBlock2D)])
+
 # TODO depth-separable conv block (more channels after 1x1, wider depth-separable kernels)
 
 
@@ -97,6 +97,8 @@ class HierarchicalVAE(model.base.TrainableMultiGroupModel):
         self._input_audio_tensor_size = model_config.input_audio_tensor_size
         self._dkl_auto_gamma = train_config.dkl_auto_gamma
         self._latent_free_bits = train_config.latent_free_bits
+        self._channels_last = getattr(train_config, 'use_channels_last', False)  # Older pickled configs: disabled
+        self._use_amp = getattr(train_config, 'use_amp', False)
         self.beta_warmup_ongoing = train_config.beta_warmup_epochs > 0  # Will be modified when warmup has ended
 
         # Pre-process configuration
@@ -175,6 +177,8 @@ class HierarchicalVAE(model.base.TrainableMultiGroupModel):
 
         # Optimizers and schedulers (all sub-nets, param groups must have been created at this point)
         self._init_optimizers_and_schedulers()
+        if self._channels_last:  # Params are modified in-place (optimizers still refer to the same params)
+            self.to(memory_format=torch.channels_last)  # 4D tensors (conv weights) only
 
     @property
     def dim_z_per_level(self):
@@ -212,14 +216,19 @@ class HierarchicalVAE(model.base.TrainableMultiGroupModel):
             raise ValueError(pass_index)
 
         # Encode, sample, decode
-        z_mu, z_var = self.encoder(x_input, u_input, midi_notes)
-        z_sampled = self.sample_z(z_mu, z_var)
-        # TODO maybe don't use x_target if auto-encoding preset only
-        x_decoded_proba, x_sampled, x_target_NLL, preset_decoder_out = self.decoder(
-            z_sampled,
-            u_target=u_target,
-            x_target=x_target, compute_x_out=(x_target is not None)
-        )
+        if self._channels_last and x_input is not None:  # Single layout conversion, at the model's input
+            x_input = x_input.contiguous(memory_format=torch.channels_last)
+        # Autocast is enabled here, not by the caller: DataParallel replicas run in other threads (thread-local
+        #    autocast state), and would not use bfloat16
+        with torch.autocast('cuda', dtype=torch.bfloat16, enabled=self._use_amp):
+            z_mu, z_var = self.encoder(x_input, u_input, midi_notes)
+            z_sampled = self.sample_z(z_mu, z_var)
+            # TODO maybe don't use x_target if auto-encoding preset only
+            x_decoded_proba, x_sampled, x_target_NLL, preset_decoder_out = self.decoder(
+                z_sampled,
+                u_target=u_target,
+                x_target=x_target, compute_x_out=(x_target is not None)
+            )
 
         # Outputs: return all available values using Tensor only, for this method to remain usable
         #     with multi-GPU training (mini-batch split over GPUs, all output tensors will be concatenated).
@@ -229,7 +238,11 @@ class HierarchicalVAE(model.base.TrainableMultiGroupModel):
         for lat_lvl in range(len(z_mu)):
             out_list += [z_mu[lat_lvl], z_var[lat_lvl], z_sampled[lat_lvl]]
         out_list += [x_decoded_proba, x_sampled, x_target_NLL]
-        return tuple(out_list) + preset_decoder_out
+        out_list += list(preset_decoder_out)
+        if self._use_amp:  # Losses and metrics are computed from float32 outputs
+            out_list = [(t.float() if isinstance(t, torch.Tensor) and t.dtype == torch.bfloat16 else t)
+                        for t in out_list]
+        return tuple(out_list)
 
     def sample_z(self, z_mu, z_var):
         # For each latent level, sample z_l from q_phi(z_l|x) using reparametrization trick (no conditional posterior)
@@ -363,6 +376,8 @@ class HierarchicalVAE(model.base.TrainableMultiGroupModel):
             self.decoder.preset_decoder.child_decoder.scheduled_sampling_p = p
 
     def get_detailed_summary(self):
+        # Summaries are computed on the model's current device (torchinfo would move the model to the given device)
+        device = next(self.parameters()).device
         sep_str = '************************************************************************************************\n'
         summary = sep_str + '********** ENCODER audio single-channel conv **********\n' + sep_str
         summary += str(self.encoder.get_single_ch_conv_summary()) + '\n\n'
@@ -377,24 +392,25 @@ class HierarchicalVAE(model.base.TrainableMultiGroupModel):
         summary += str(self.decoder.get_single_ch_conv_summary()) + '\n\n'
         if self.decoder.preset_decoder is not None:
             summary += sep_str + '********** DECODER preset **********\n' + sep_str
-            summary += str(self.decoder.preset_decoder.get_summary()) + '\n\n'
+            summary += str(self.decoder.preset_decoder.get_summary(device)) + '\n\n'
         summary += sep_str + '********** FULL VAE SUMMARY **********\n' + sep_str
         if self._preset_helper is None:
             input_data = (torch.rand(self._input_audio_tensor_size) - 0.5, )
         else:
             input_u = self._preset_helper.get_null_learnable_preset(self._input_audio_tensor_size[0])
             input_data = (torch.rand(self._input_audio_tensor_size) - 0.5, input_u)
-        summary += str(torchinfo.summary(
-            self, input_data=input_data, depth=5, device=torch.device('cpu'), verbose=0,
-            col_names=("input_size", "output_size", "num_params", "mult_adds"),
-            row_settings=("depth", "var_names")
-        ))
+        with torch.no_grad():
+            summary += str(torchinfo.summary(
+                self, input_data=input_data, depth=5, device=device, verbose=0,
+                col_names=("input_size", "output_size", "num_params", "mult_adds"),
+                row_settings=("depth", "var_names")
+            ))
         # TODO also retrieve total number of mult-adds/item and parameters
         return summary
 
 
 def process_minibatch(
-        ae_model: HierarchicalVAE, ae_model_parallel: nn.DataParallel, main_device,
+        ae_model: HierarchicalVAE, ae_model_parallel: Union[nn.DataParallel, HierarchicalVAE], main_device,
         x_in, v_in, uid, notes, label,
         epoch: int, scalars: Dict[str, Any], super_metrics: Dict[str, Any]
 ):
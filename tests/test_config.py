@@ -0,0 +1,115 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import types
+import unittest
+import warnings
+from unittest import mock
+
+import config
+
+
+# Stand-in for the utils/config_confidential.py file, which is created by each user (not part of the repo)
+_confidential = types.SimpleNamespace(data_root_path='/data', logs_root_dir='/logs', comet_api_key='',
+                                      comet_project_name='', comet_workspace='')
+
+
+class TestConfigOverlay(unittest.TestCase):
+
+    def test_derived_attributes(self):
+        base_config = config.ModelConfig.from_dict({'midi_notes': ((41, 75), (56, 75)), 'stack_spectrograms': False})
+        self.assertTrue(base_config.increased_dataset_size)
+        overlay = config.ConfigOverlay(base_config)
+        overlay.stack_spectrograms = True
+        self.assertFalse(overlay.increased_dataset_size)
+        self.assertFalse(overlay.to_dict()['increased_dataset_size'])
+        self.assertFalse(overlay.materialize().increased_dataset_size)
+        self.assertTrue(base_config.increased_dataset_size)  # Base config is never modified
+
+
+@mock.patch.object(config, '_load_confidential', new=lambda: _confidential)
+class TestDynamicConfigParams(unittest.TestCase):
+
+    def test_synth_args_str(self):
+        for synth_args, labels, expected_str in (((None, None), None, 'al*_op*_lab*'),
+                                                 (([1, 2], [1, 2, 3]), None, 'al1.2_op123_lab*'),
+                                                 ((None, [4]), ('harmonic', 'percussive'), 'al*_op4_harm_perc')):
+            model_config, train_config = config.ModelConfig(), config.TrainConfig()
+            model_config.dataset_synth_args, model_config.dataset_labels = synth_args, labels
+            config.update_dynamic_config_params(model_config, train_config)
+            self.assertEqual(model_config.synth_args_str, expected_str)
+
+
+class _LegacyModelConfig:
+    """ ModelConfig class, as it was before __slots__ were used. """
+    pass
+
+
+_LegacyModelConfig.__module__, _LegacyModelConfig.__qualname__ = 'config', 'ModelConfig'
+
+
+@mock.patch.object(config, '_load_confidential', new=lambda: _confidential)
+class TestConfigSerialization(unittest.TestCase):
+
+    def test_pickle_round_trip(self):
+        model_config, train_config = config.ModelConfig(), config.TrainConfig()
+        model_config.midi_notes = ((41, 75), (56, 75))
+        for c in (model_config, train_config):
+            unpickled_config = pickle.loads(pickle.dumps(c))
+            self.assertIsInstance(unpickled_config, type(c))
+            self.assertEqual(unpickled_config.to_dict(), c.to_dict())
+
+    def test_load_pre_slots_pickle(self):
+        state = config.ModelConfig().to_dict(include_derived=False)
+        state['midi_notes'], state['stack_spectrograms'] = ((41, 75), (56, 75)), False
+        state['increased_dataset_size'] = False  # Derived attribute (stored in the former __dict__): ignored
+        state['deprecated_attribute'] = 0
+        legacy_model_config = _LegacyModelConfig()
+        legacy_model_config.__dict__.update(state)
+        with mock.patch.object(config, 'ModelConfig', _LegacyModelConfig):
+            pickled_config = pickle.dumps(legacy_model_config)
+        with warnings.catch_warnings(record=True) as caught_warnings:
+            warnings.simplefilter('always')
+            model_config = pickle.loads(pickled_config)
+        self.assertIsInstance(model_config, config.ModelConfig)
+        self.assertEqual(model_config.midi_notes, ((41, 75), (56, 75)))
+        self.assertTrue(model_config.increased_dataset_size)  # Computed from the unpickled attributes
+        self.assertFalse(hasattr(model_config, 'deprecated_attribute'))
+        self.assertEqual(len(caught_warnings), 1)
+        self.assertIn('deprecated_attribute', str(caught_warnings[0].message))
+
+    def test_json_bytes(self):
+        model_config, train_config = config.ModelConfig(), config.TrainConfig()
+        json_bytes = config.configs_to_json_bytes(model_config, train_config)
+        header, body = json_bytes.split(b'\n', 1)
+        self.assertEqual(header, b'# content-version: ' + hashlib.sha1(body).hexdigest().encode())
+        loaded_model_config, loaded_train_config = config.configs_from_json_bytes(json_bytes)
+        self.assertEqual(loaded_model_config.to_dict(), model_config.to_dict())
+        self.assertEqual(loaded_train_config.to_dict(), train_config.to_dict())
+        self.assertIsInstance(loaded_model_config.midi_notes, tuple)
+        self.assertIsInstance(loaded_model_config.midi_notes[0], tuple)
+        self.assertIsInstance(loaded_model_config.dataset_synth_args[1], list)
+
+    def test_load_configs_json(self):
+        model_config, train_config = config.ModelConfig(), config.TrainConfig()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, 'config.json')
+            with open(json_path, 'wb') as f:
+                f.write(config.configs_to_json_bytes(model_config, train_config))
+            loaded_model_config, loaded_train_config = config.load_configs_json(json_path)
+            self.assertEqual(loaded_model_config.to_dict(), model_config.to_dict())
+            self.assertEqual(loaded_train_config.to_dict(), train_config.to_dict())
+            self.assertIsInstance(loaded_model_config.stft_args, tuple)
+            # Configs returned from the parsing cache must not share any container
+            loaded_model_config.dataset_synth_args[1].append(7)
+            reloaded_model_config, _ = config.load_configs_json(json_path)
+            self.assertEqual(reloaded_model_config.dataset_synth_args, model_config.dataset_synth_args)
+            with open(json_path, 'wb') as f:
+                f.write(b'{}')
+            with self.assertRaises(ValueError):  # No content-version header
+                config.load_configs_json(json_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
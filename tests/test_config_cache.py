@@ -0,0 +1,57 @@
+import os
+import pathlib
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import config
+import utils.config_cache
+
+
+class TestConfigCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        tmp_path = pathlib.Path(self._tmp_dir.name)
+        self.signature_file = tmp_path.joinpath('signature_file.py')
+        self.signature_file.write_text('a = 0\n')
+        self.cache_dir = tmp_path.joinpath('cache')
+        self._patches = [mock.patch.object(utils.config_cache, '_cache_dir', self.cache_dir),
+                         mock.patch.object(utils.config_cache, '_signature_files', (self.signature_file, )),
+                         mock.patch.object(utils.config_cache, '_in_process_cache', dict()),
+                         # utils/config_confidential.py is created by each user (not part of the repo)
+                         mock.patch.object(config, '_load_confidential', return_value=types.SimpleNamespace(
+                             data_root_path='/data', logs_root_dir='/logs', comet_api_key='',
+                             comet_project_name='', comet_workspace=''))]
+        for p in self._patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self._patches:
+            p.stop()
+        self._tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        model_config, train_config = utils.config_cache.load(update_dynamic_params=False)
+        self.assertEqual(model_config.to_dict(), config.ModelConfig().to_dict())
+        self.assertEqual(train_config.to_dict(), config.TrainConfig().to_dict())
+        self.assertIsInstance(model_config.midi_notes, tuple)
+        # Restored from the cache file: same values, new instances
+        model_config_2, _ = utils.config_cache.load(update_dynamic_params=False)
+        self.assertEqual(model_config.to_dict(), model_config_2.to_dict())
+        self.assertIsNot(model_config.comet_tags, model_config_2.comet_tags)
+
+    def test_invalidation(self):
+        utils.config_cache.load(update_dynamic_params=False)
+        cache_files = os.listdir(self.cache_dir)
+        self.assertEqual(len(cache_files), 1)
+        self.signature_file.write_text('a = 10\n')  # Different size (and mtime): different signature
+        utils.config_cache.load(update_dynamic_params=False)
+        new_cache_files = os.listdir(self.cache_dir)
+        self.assertEqual(len(new_cache_files), 1)  # Stale cache file has been pruned
+        self.assertNotEqual(cache_files, new_cache_files)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from data import abstractbasedataset
+from data.abstractbasedataset import AudioDataset, PresetDataset
+
+
+class _DummyDatasetMixin:
+    """ Implements the abstract methods of AudioDataset: data are written by the tests themselves (no audio). """
+    @property
+    def synth_name(self) -> str:
+        return 'dummy'
+
+    @property
+    def total_nb_presets(self):
+        return 3
+
+    def get_name_from_preset_UID(self, preset_UID: int, long_name=False) -> str:
+        return 'preset{}'.format(preset_UID)
+
+    def get_original_instrument_family(self, preset_UID: int) -> str:
+        return 'unknown'
+
+    def save_labels(self, labels_names, labels_per_UID):
+        pass
+
+    def get_wav_file(self, preset_UID, midi_note, midi_velocity, variation=0):
+        raise NotImplementedError()
+
+    def get_audio_file_stem(self, preset_UID, midi_note, midi_velocity, variation=0):
+        return '{:05d}_pitch{:03d}vel{:03d}_var{:03d}'.format(preset_UID, midi_note, midi_velocity, variation)
+
+
+class _DummyAudioDataset(_DummyDatasetMixin, AudioDataset):
+    def __init__(self, data_storage_root_path, spectrogram_normalization):
+        super().__init__((3.0, 1.0), 512, 256, 16000, midi_notes=((40, 100), (60, 100)),
+                         spectrogram_normalization=spectrogram_normalization,
+                         data_storage_root_path=data_storage_root_path, data_augmentation=False)
+        self.valid_preset_UIDs = np.arange(3)
+
+
+class _DummyPresetDataset(_DummyDatasetMixin, PresetDataset):
+    def __init__(self, data_storage_root_path):
+        super().__init__((3.0, 1.0), 512, 256, 16000, data_storage_root_path=data_storage_root_path,
+                         data_augmentation=False)
+        self.valid_preset_UIDs = np.arange(3)
+
+    def get_full_preset_params(self, preset_UID, preset_variation=0):
+        raise NotImplementedError()
+
+    @property
+    def preset_param_types(self):
+        return ['numerical'] * self.total_nb_vst_params
+
+    @property
+    def total_nb_vst_params(self):
+        return 4
+
+    def _render_audio(self, preset_params, midi_note, midi_velocity, custom_note_duration=None):
+        raise NotImplementedError()
+
+    @property
+    def preset_indexes_helper(self):
+        raise NotImplementedError()
+
+    @property
+    def _nb_preset_variations_per_note(self):
+        return 2
+
+    @property
+    def _nb_audio_delay_variations_per_note(self):
+        return 1
+
+
+class TestSpectrogramsStore(unittest.TestCase):
+
+    def _check_store(self, spectrogram_normalization, atol):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ds = _DummyAudioDataset(tmp_dir, spectrogram_normalization)
+            ds.spec_stats = {'min': -120.0, 'max': 0.0, 'mean': -60.0, 'std': 20.0}
+            os.makedirs(ds._spectrograms_folder)
+            # Individual (un-normalized) spectrogram files, of different sizes
+            spectrograms = dict()
+            for preset_UID in ds.valid_preset_UIDs:
+                for midi_pitch, midi_vel in ds.midi_notes:
+                    spectrogram = -120.0 * torch.rand((5, 7 + int(preset_UID)))
+                    abstractbasedataset._save_tensor_file(
+                        spectrogram, ds.get_spec_file_path(preset_UID, midi_pitch, midi_vel))
+                    spectrograms[(int(preset_UID), midi_pitch, midi_vel)] = spectrogram
+            ds._build_spectrograms_store()
+            self.assertEqual(ds.spectrograms_store_files, [ds._spectrograms_store_file])
+            remaining_files = os.listdir(ds._spectrograms_folder)
+            self.assertEqual(sorted(remaining_files), sorted([ds._spectrograms_store_file.name,
+                                                              ds._spectrograms_store_index_file.name]))
+            unpickled_ds = pickle.loads(pickle.dumps(ds))  # e.g. spawned dataloader workers
+            preloaded_ds = pickle.loads(pickle.dumps(ds))
+            preloaded_ds.preload_spectrograms_store()
+            for d in (ds, unpickled_ds, preloaded_ds):
+                for (preset_UID, midi_pitch, midi_vel), spectrogram in spectrograms.items():
+                    loaded_spectrogram = d.load_spectrogram(preset_UID, midi_pitch, midi_vel)
+                    self.assertEqual(loaded_spectrogram.dtype, torch.float32)
+                    self.assertEqual(loaded_spectrogram.shape, spectrogram.shape)
+                    expected_spectrogram = ds.normalize_spectrogram(spectrogram)
+                    self.assertTrue(torch.allclose(loaded_spectrogram, expected_spectrogram, rtol=0.0, atol=atol))
+
+    def test_float32_store(self):  # Not normalized: exact values
+        self._check_store(None, 0.0)
+
+    def test_float16_store(self):  # Normalized into [-1, 1], then stored as float16 values
+        self._check_store('min_max', 1e-3)
+
+    def test_individual_files(self):
+        """ Datasets generated before the store was available """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ds = _DummyAudioDataset(tmp_dir, None)
+            os.makedirs(ds._spectrograms_folder)
+            spectrogram = torch.rand((5, 7))
+            abstractbasedataset._save_tensor_file(spectrogram, ds.get_spec_file_path(1, 40, 100))
+            self.assertEqual(ds.spectrograms_store_files, [])
+            self.assertTrue(torch.equal(ds.load_spectrogram(1, 40, 100), spectrogram))
+        with tempfile.TemporaryDirectory() as tmp_dir:  # Even older datasets: .pt files
+            ds = _DummyAudioDataset(tmp_dir, None)
+            os.makedirs(ds._spectrograms_folder)
+            spectrogram = torch.rand((5, 7))
+            torch.save(spectrogram, ds.get_spec_file_path(1, 40, 100).with_suffix('.pt'))
+            self.assertTrue(torch.equal(ds.load_spectrogram(1, 40, 100), spectrogram))
+
+
+class TestLearnablePresetsStore(unittest.TestCase):
+
+    def test_store(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ds = _DummyPresetDataset(tmp_dir)
+            os.makedirs(ds._learnable_preset_folder)
+            presets = [(int(preset_UID), preset_var, np.random.rand(4, 3 + preset_var).astype(np.float32))
+                       for preset_UID in ds.valid_preset_UIDs for preset_var in range(2)]
+            # Individual files (datasets generated before the store was available)
+            for preset_UID, preset_var, preset_array in presets:
+                abstractbasedataset._save_tensor_file(torch.from_numpy(preset_array),
+                                                      ds._get_learnable_preset_file_path(preset_UID, preset_var))
+            for preset_UID, preset_var, preset_array in presets:
+                self.assertTrue(torch.equal(ds.load_learnable_preset(preset_UID, preset_var),
+                                            torch.from_numpy(preset_array)))
+            ds._write_learnable_presets_store(presets)
+            unpickled_ds = pickle.loads(pickle.dumps(ds))  # e.g. spawned dataloader workers
+            for preset_UID, preset_var, preset_array in presets:  # Not read by datasets which use the store
+                os.remove(ds._get_learnable_preset_file_path(preset_UID, preset_var))
+            for preset_UID, preset_var, preset_array in presets:
+                for d in (ds, unpickled_ds):
+                    loaded_preset = d.load_learnable_preset(preset_UID, preset_var)
+                    self.assertTrue(torch.equal(loaded_preset, torch.from_numpy(preset_array)))
+                    loaded_preset[:] = -1.0  # Returned tensors are copies, which can be modified
+                self.assertTrue(torch.equal(ds.load_learnable_preset(preset_UID, preset_var),
+                                            torch.from_numpy(preset_array)))
+
+
+if __name__ == "__main__":
+    unittest.main()
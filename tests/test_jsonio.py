@@ -0,0 +1,44 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import utils.jsonio
+
+
+class TestJsonio(unittest.TestCase):
+    # NSynth-like content: nested dicts and lists, unicode strings, floats, non-str keys
+    _obj = {'bass_synthetic_033-022-050': {'pitch': 22, 'velocity': 50, 'qualities': [0, 1, 0, 0],
+                                           'qualities_str': ['distortion'], 'instrument_source_str': 'synthétique',
+                                           'sample_rate': 16000, 'gain': 0.1, 'small': 1e-7, 'valid': True,
+                                           'note': None},
+            12: [1.5, -3, 'a'], 'empty': {}}
+
+    def _check_equivalence_with_json(self):
+        json_bytes = utils.jsonio.dumps(self._obj)
+        self.assertIsInstance(json_bytes, bytes)
+        self.assertNotIn(b': ', json_bytes)  # Compact separators
+        self.assertNotIn(b', ', json_bytes)
+        expected_obj = json.loads(json.dumps(self._obj))  # Reference: json standard module (int keys become str)
+        self.assertEqual(utils.jsonio.loads(json_bytes), expected_obj)
+        self.assertEqual(json.loads(json_bytes), expected_obj)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, 'examples.json')
+            utils.jsonio.dump(self._obj, json_path)
+            self.assertEqual(utils.jsonio.load(json_path), expected_obj)
+            with open(json_path, 'w') as f:  # Files written by the json standard module
+                json.dump(self._obj, f, indent=4)
+            self.assertEqual(utils.jsonio.load(json_path), expected_obj)
+
+    @unittest.skipIf(utils.jsonio.orjson is None, "orjson is not installed")
+    def test_orjson(self):
+        self._check_equivalence_with_json()
+
+    def test_json_fallback(self):
+        with mock.patch.object(utils.jsonio, 'orjson', None):
+            self._check_equivalence_with_json()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,14 @@
 
+import pathlib
+import tempfile
 import unittest
+from unittest import mock
 
 import torch
 import torch.nn as nn
 
+import config
+from model import base
 from model import convlayer
 
 
@@ -100,6 +105,120 @@ class TestResBlock3Layers(unittest.TestCase):
                     for middle_ch_ratio in [2, 4]:
                         self._try_get_output(in_ch, out_ch//middle_ch_ratio, out_ch, upsample, downsample)
 
+    def test_decreasing_num_channels(self):
+        for in_ch, out_ch in [(64, 32), (64, 25), (47, 25)]:
+            res_block = convlayer.ResBlock3Layers(in_ch, 8, out_ch, norm_layer='bn+adain', adain_num_style_features=3)
+            dummy_m = DummyModel(res_block)
+            x_input = torch.rand((4, in_ch, 5, 5))
+            x_output, _ = dummy_m(x_input)
+            # Reference: average of each group of input channels, added to the residuals
+            x_expected, res = dummy_m.get_x_and_res_before_add(x_input)
+            for out_ch_index, in_ch_indices in enumerate(torch.tensor_split(torch.arange(in_ch), out_ch)):
+                res[:, out_ch_index, :, :] += x_expected[:, in_ch_indices, :, :].mean(dim=1)
+            self.assertTrue(torch.allclose(x_output, res, atol=1e-5))
+
+
+class TestAdaIN(unittest.TestCase):
+    def test_instance_norm_and_style(self):
+        adain = convlayer.AdaIN(3, 16)
+        x, w_style = torch.rand((4, 16, 7, 9)), torch.rand((4, 3))
+        s = adain.scale_nn(w_style)[:, :, None, None]
+        b = adain.bias_nn(w_style)[:, :, None, None]
+        self.assertTrue(torch.allclose(adain(x, w_style), adain.norm(x) * s + b, atol=1e-5))
+
+
+class TestConvBlock2D(unittest.TestCase):
+    def test_fuse_batch_norm(self):
+        for order, padding in [('cn', 1), ('nc', 0), ('can', 1)]:
+            block = convlayer.ConvBlock2D(nn.Conv2d(8, 6, (3, 3), padding=padding), nn.ReLU(), 'bn', order)
+            block.train()
+            for _ in range(3):  # Non-trivial BN running stats
+                block(torch.randn((16, 8, 5, 5)))
+            block.eval()
+            x = torch.randn((4, 8, 5, 5))
+            y = block(x)
+            self.assertEqual(block.fuse_batch_norm(), order != 'can')  # Activation between conv and BN: no fusion
+            self.assertTrue(torch.allclose(block(x), y, atol=1e-5))
+
+
+class _DummyMultiGroupModel(base.TrainableMultiGroupModel):
+    def __init__(self):
+        train_config = config.TrainConfig()
+        train_config.verbosity = 0
+        super().__init__(train_config, ['audio', 'preset'], ['audio', 'preset'])
+        self.audio_module = nn.Sequential(nn.Linear(5, 3), nn.BatchNorm1d(3))
+        self.preset_module = nn.Linear(7, 2, bias=False)
+
+    def get_custom_group_module(self, group_name: str) -> nn.Module:
+        return self.audio_module if group_name == 'audio' else self.preset_module
+
+
+class TestWeightsStore(unittest.TestCase):
+    @staticmethod
+    def _get_state_dicts():
+        """ Tensors whose sizes are not multiples of the store's alignment, with various dtypes and layouts. """
+        return {
+            'audio': {'weight': torch.randn((3, 5)), 'transposed': torch.randn((4, 6)).t(),
+                      'num_batches_tracked': torch.tensor(3), 'empty': torch.empty((0, 3))},
+            'preset': {'half': torch.randn((7, )).half(), 'mask': torch.rand((11, )) > 0.5,
+                       'large': torch.randn((1500, ))}
+        }
+
+    def _check_round_trip(self):
+        state_dicts = self._get_state_dicts()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint_path = pathlib.Path(tmp_dir).joinpath('checkpoint.tar')
+            base._write_weights_store(state_dicts, checkpoint_path)
+            index, _ = base._get_weights_store_index(state_dicts)
+            for offset, _, _, _ in index.values():
+                self.assertEqual(offset % base._weights_store_alignment, 0)
+            loaded_state_dicts = base._read_weights_store(checkpoint_path)
+            self.assertEqual(loaded_state_dicts.keys(), state_dicts.keys())
+            for group_name, state_dict in state_dicts.items():
+                self.assertEqual(loaded_state_dicts[group_name].keys(), state_dict.keys())
+                for param_name, t in state_dict.items():
+                    loaded_t = loaded_state_dicts[group_name][param_name]
+                    self.assertEqual(loaded_t.dtype, t.dtype)
+                    self.assertEqual(loaded_t.shape, t.shape)
+                    self.assertTrue(torch.equal(loaded_t, t))
+            del loaded_state_dicts  # Releases the memory-mapped file before the directory is removed
+
+    def test_round_trip(self):
+        self._check_round_trip()
+
+    def test_round_trip_without_vectored_writes(self):
+        with mock.patch.object(base.os, 'pwritev', create=True):  # Restored when the test ends
+            del base.os.pwritev  # e.g. Windows
+            self._check_round_trip()
+
+    def test_round_trip_small_iov_max(self):
+        with mock.patch.object(base, '_iov_max', 2):  # Several vectored writes
+            self._check_round_trip()
+
+    def test_load_checkpoints(self):
+        model, loaded_model, legacy_loaded_model = _DummyMultiGroupModel(), _DummyMultiGroupModel(), \
+            _DummyMultiGroupModel()
+        model.audio_module(torch.randn((4, 5)))  # Non-default BN running stats
+        state_dicts = {k: model.get_custom_group_module(k).state_dict() for k in model.param_group_names}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Weights store
+            checkpoint_path = pathlib.Path(tmp_dir).joinpath('store', 'checkpoint.tar')
+            checkpoint_path.parent.mkdir()
+            model._write_checkpoints({k: {'model_state_dict': sd, 'optimizer_state_dict': None,
+                                          'scheduler_state_dict': None} for k, sd in state_dicts.items()},
+                                     checkpoint_path)
+            loaded_model.load_checkpoints(checkpoint_path)
+            # Fallback: older checkpoints, weights pickled into the checkpoint.tar file
+            legacy_checkpoint_path = pathlib.Path(tmp_dir).joinpath('legacy', 'checkpoint.tar')
+            legacy_checkpoint_path.parent.mkdir()
+            torch.save({k: {'model_state_dict': sd} for k, sd in state_dicts.items()}, legacy_checkpoint_path)
+            legacy_loaded_model.load_checkpoints(legacy_checkpoint_path)
+        for m in (loaded_model, legacy_loaded_model):
+            for k, state_dict in state_dicts.items():
+                loaded_state_dict = m.get_custom_group_module(k).state_dict()
+                for param_name, t in state_dict.items():
+                    self.assertTrue(torch.equal(loaded_state_dict[param_name], t))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import utils.stat
+
+
+class TestMeansWithoutOutliers(unittest.TestCase):
+
+    def test_equivalence_with_remove_outliers(self):
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({'normal': rng.normal(size=200), 'outliers': rng.normal(size=200),
+                           'int': rng.integers(0, 10, size=200), 'constant': np.full((200, ), 2.5)})
+        df.loc[[3, 50, 120], 'outliers'] = [40.0, -35.0, 100.0]
+        for IQR_factor in (0.0, 0.5, 1.5, 3.0):
+            means = utils.stat.means_without_outliers(df, IQR_factor)
+            # Reference: outliers removed from each column separately
+            expected_means = pd.Series({col: utils.stat.remove_outliers(df[col].values, IQR_factor).mean()
+                                        for col in df.columns})
+            self.assertListEqual(list(means.index), list(df.columns))
+            np.testing.assert_allclose(means.values, expected_means.values)
+
+
+if __name__ == "__main__":
+    unittest.main()
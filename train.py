@@ -37,6 +37,7 @@ import utils.profiling
 from utils.hparams import LinearDynamicParam
 import utils.figures
 import utils.exception
+import utils.config_cache
 
 
 
@@ -49,7 +50,8 @@ def train_model(model_config: config.ModelConfig, train_config: config.TrainConf
     # https://pytorch.org/docs/stable/notes/randomness.html
     torch.manual_seed(0)
     # deterministically selects a (possibly suboptimal) convolution algorithm - negligible perf loss on an RTX 3090
-    torch.backends.cudnn.benchmark = False
+    torch.backends.cudnn.benchmark = train_config.cudnn_benchmark  # False by default
+    torch.backends.cuda.matmul.allow_tf32 = train_config.allow_tf32_matmul
     # Deterministic algorithms also require to set an env var w/ CUDA version >= 10.2
     # https://docs.nvidia.com/cuda/cublas/index.html#cublasApi_reproducibility
     # os.environ['CUBLAS_WORKSPACE_CONFIG'] = ":4096:8"
@@ -105,13 +107,17 @@ def train_model(model_config: config.ModelConfig, train_config: config.TrainConf
         # We use all available GPUs - the main one must be first in list
         parallel_device_ids = [i for i in range(torch.cuda.device_count()) if i != train_config.main_cuda_device_idx]
         parallel_device_ids.insert(0, train_config.main_cuda_device_idx)
-    ae_model_parallel = nn.DataParallel(ae_model, device_ids=parallel_device_ids, output_device=device)
+    ae_model.to(device)  # DataParallel requires the module to be on its first device (params modified in-place)
+    if len(parallel_device_ids) == 1:  # No scatter/gather of inputs and outputs: the model is called directly
+        ae_model_parallel = ae_model
+    else:
+        ae_model_parallel = nn.DataParallel(ae_model, device_ids=parallel_device_ids, output_device=device)
 
 
     # ========== Load weights from pre-trained models? ==========
     if not pretrain_audio:
         if model_config.pretrained_VAE_checkpoint is not None:
-            ae_model.load_checkpoints(model_config.pretrained_VAE_checkpoint)  # FIXME specify device for map_location
+            ae_model.load_checkpoints(model_config.pretrained_VAE_checkpoint)  # Loaded onto ae_model's device
         else:
             if train_config.verbosity >= 1:
                 print("Training starts from scratch (model_config.pretrained_VAE_checkpoint is None).")
@@ -193,7 +199,8 @@ def train_model(model_config: config.ModelConfig, train_config: config.TrainConf
             dataloader_iter = iter(dataloader['train'])
             for i in range(len(dataloader['train'])):
                 minibatch = next(dataloader_iter)
-                x_in, v_in, uid, notes, label = [m.to(device) for m in minibatch]
+                # non_blocking: asynchronous host-to-device copies if the dataloader uses pinned memory
+                x_in, v_in, uid, notes, label = [m.to(device, non_blocking=True) for m in minibatch]
                 model.hierarchicalvae.process_minibatch(
                     ae_model, ae_model_parallel, device,
                     x_in, v_in, uid, notes, label,
@@ -212,7 +219,7 @@ def train_model(model_config: config.ModelConfig, train_config: config.TrainConf
                 v_out_backup, v_in_backup = [], []  # Params inference error (Comet/Tensorboard plot)
                 i_to_plot = np.random.default_rng(seed=epoch).integers(0, len(dataloader['validation'])-1)
                 for i, minibatch in enumerate(dataloader['validation']):
-                    x_in, v_in, uid, notes, label = [m.to(device) for m in minibatch]
+                    x_in, v_in, uid, notes, label = [m.to(device, non_blocking=True) for m in minibatch]
                     ae_out_audio, ae_out_preset = model.hierarchicalvae.process_minibatch(
                         ae_model, ae_model_parallel, device,
                         x_in, v_in, uid, notes, label,
@@ -257,8 +264,9 @@ def train_model(model_config: config.ModelConfig, train_config: config.TrainConf
 
 
     # ========== Logger final stats + save Model/Optimizers/Scheduler checkpoints ==========
-    ae_model.save_checkpoints(logger.run_dir)
+    ae_model.save_checkpoints(logger.run_dir, blocking=False)  # Written to disk while the logger finishes
     logger.on_training_finished()  # Might have to wait for threads
+    ae_model.wait_for_checkpoints_saved()
 
 
     # ========== "Manual GC" (to try to prevent random CUDA out-of-memory between enqueued runs) ==========
@@ -289,7 +297,7 @@ def train_model(model_config: config.ModelConfig, train_config: config.TrainConf
 
 if __name__ == "__main__":
     # Normal run, current values from config.py will be used to parametrize learning and models
-    _model_config, _train_config = config.ModelConfig(), config.TrainConfig()
-    config.update_dynamic_config_params(_model_config, _train_config)  # Required before any actual train
+    # Dynamic params are already updated (required before any actual train)
+    _model_config, _train_config = utils.config_cache.load()
     train_model(_model_config, _train_config)
 
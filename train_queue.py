@@ -19,6 +19,7 @@ import torch
 import config
 import train
 import utils.exception
+import utils.config_cache
 
 
 # TODO intercept Ctrl-C sigint and ask for confirmation
@@ -75,7 +76,7 @@ if __name__ == "__main__":
         else:
             print("[[DUPLICATED FORKED train_queue.py]] Training queue is about to start...")
 
-    base_model_config, base_train_config = config.ModelConfig(), config.TrainConfig()
+    base_model_config, base_train_config = utils.config_cache.load(update_dynamic_params=False)
 
     assert len(model_config_mods) == len(train_config_mods)
 
@@ -95,11 +96,11 @@ if __name__ == "__main__":
                     run_name = base_model_config.run_name + '_kf{}'.format(fold_idx)
                 model_config_mods_kfolds[-1]['run_name'] = run_name
         model_config_mods, train_config_mods = model_config_mods_kfolds, train_config_mods_kfolds
-    del base_model_config, base_train_config
 
     # = = = = = = = = = = Training queue: main loop = = = = = = = = = =
     for run_index in range(len(model_config_mods)):
-        model_config, train_config = config.ModelConfig(), config.TrainConfig()  # Start from defaults from config.py
+        # Start from defaults from config.py: overlays store the modified attributes only (base configs not copied)
+        model_config, train_config = config.ConfigOverlay(base_model_config), config.ConfigOverlay(base_train_config)
 
         print("================================================================")
         print("=============== Enqueued Training Run {}/{} starts ==============="
@@ -110,9 +111,11 @@ if __name__ == "__main__":
         train_config.plot_period = plot_period
         # Per-run config modifications
         for k, v in model_config_mods[run_index].items():
-            model_config.__dict__[k] = v
+            setattr(model_config, k, v)
         for k, v in train_config_mods[run_index].items():
-            train_config.__dict__[k] = v
+            setattr(train_config, k, v)
+        # Actual config instances (derived attributes are invalidated if their inputs have been modified)
+        model_config, train_config = model_config.materialize(), train_config.materialize()
         # Required before any actual train - after hparams have been properly set
         config.update_dynamic_config_params(model_config, train_config)
 
@@ -0,0 +1,96 @@
+"""
+On-disk and in-process cache of the default parameters described in config.py.
+
+Cache entries are keyed by the (st_mtime_ns, st_size, st_ino) signature of config.py (and of
+utils/config_confidential.py), such that any modification of those files invalidates the cache.
+Repeated runs (train.py, enqueued runs, evaluation scripts) then restore the configs from a small
+JSON file (see config.configs_to_json_bytes) instead of re-building them and re-running
+update_dynamic_config_params(...).
+
+Cache files are stored in the user's cache directory ($XDG_CACHE_HOME/spinvae, default ~/.cache/spinvae) in a
+sub-directory specific to this source checkout, not in the checkout itself. Files built from older versions of the config files are deleted when a new file is written.
+"""
+
+import hashlib
+import os
+import pathlib
+import threading
+from typing import Tuple
+
+import config
+
+
+_root_path = pathlib.Path(__file__).resolve().parent.parent
+# One sub-directory per source checkout, such that checkouts don't prune each other's cache files
+_cache_dir = pathlib.Path(os.environ.get('XDG_CACHE_HOME') or pathlib.Path.home().joinpath('.cache'))\
+    .joinpath('spinvae', 'config_cache', hashlib.sha1(str(_root_path).encode()).hexdigest()[:16])
+_signature_files = (_root_path.joinpath('config.py'), _root_path.joinpath('utils', 'config_confidential.py'))
+
+_cache_lock = threading.Lock()
+_in_process_cache = dict()  # Keys are (files signature, update_dynamic_params), values are cache files paths
+
+
+def _get_signature():
+    """ Returns a tuple of (st_mtime_ns, st_size, st_ino) tuples, one per existing config file. """
+    signature = list()
+    for p in _signature_files:
+        try:
+            st = os.stat(p)
+        except FileNotFoundError:
+            continue
+        signature.append((st.st_mtime_ns, st.st_size, st.st_ino))
+    return tuple(signature)
+
+
+def _get_signature_str(signature):
+    return '_'.join(['{}-{}-{}'.format(*s) for s in signature])
+
+
+def _prune_cache_files(signature_str: str):
+    """ Deletes the cache files which were not built from the current config files (given signature). """
+    with os.scandir(_cache_dir) as dir_entries:
+        for entry in dir_entries:
+            if entry.name.endswith('.config.json') \
+                    and entry.name not in (signature_str + '.config.json', signature_str + '_static.config.json'):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:  # Pruned by another process
+                    pass
+
+
+def _write_cache_file(cache_file: pathlib.Path, update_dynamic_params: bool, signature_str: str):
+    model_config, train_config = config.ModelConfig(), config.TrainConfig()
+    if update_dynamic_params:
+        config.update_dynamic_config_params(model_config, train_config)
+    os.makedirs(_cache_dir, exist_ok=True)
+    tmp_file = cache_file.with_suffix('.tmp')
+    with open(tmp_file, 'wb') as f:
+        f.write(config.configs_to_json_bytes(model_config, train_config))
+    os.replace(tmp_file, cache_file)  # Atomic: other processes never read a partial file
+    _prune_cache_files(signature_str)
+
+
+def load(update_dynamic_params=True) -> Tuple[config.ModelConfig, config.TrainConfig]:
+    """
+    Returns new (model_config, train_config) instances, built from the current config.py file.
+    The returned instances can be freely modified by the caller.
+
+    :param update_dynamic_params: If False, update_dynamic_config_params(...) has not been applied yet
+        and must be called by the caller (e.g. after relative modifications of the configs).
+    """
+    key = (_get_signature(), update_dynamic_params)
+    signature_str = _get_signature_str(key[0])
+    with _cache_lock:
+        cache_file = _in_process_cache.get(key, None)
+        if cache_file is None:
+            cache_file = _cache_dir.joinpath('{}{}.config.json'.format(
+                signature_str, '' if update_dynamic_params else '_static'))
+            if not cache_file.exists():
+                _write_cache_file(cache_file, update_dynamic_params, signature_str)
+            _in_process_cache[key] = cache_file
+    try:
+        return config.load_configs_json(cache_file)
+    except (ValueError, OSError):  # Corrupted or deleted cache file: re-build it
+        with _cache_lock:
+            _write_cache_file(cache_file, update_dynamic_params, signature_str)
+        return config.load_configs_json(cache_file)
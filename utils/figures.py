@@ -72,7 +72,7 @@ def plot_dataset_item(dataset: Optional[AudioDataset], item_index: int,
         midi_pitch, midi_vel = dataset.default_midi_note
     else:
         midi_pitch, midi_vel = dataset.midi_notes[midi_note_index]
-    spectrogram = torch.load(dataset.get_spec_file_path(item_UID, midi_pitch, midi_vel)).numpy()
+    spectrogram = dataset.load_spectrogram(item_UID, midi_pitch, midi_vel).numpy()
     im = librosa.display.specshow(spectrogram, shading='flat', ax=ax, cmap='magma')
     if add_colorbar:
         clb = fig.colorbar(im, ax=ax, orientation='vertical')
@@ -0,0 +1,34 @@
+"""
+Fast JSON serialization, using orjson if available (falls back to the json standard module otherwise).
+Serialized data is always compact UTF-8 bytes.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    """ Serializes obj into compact JSON bytes. Non-str dict keys are converted to str (as json.dumps does),
+    NumPy arrays and scalars are also serialized if orjson is available. """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def loads(json_bytes):
+    return orjson.loads(json_bytes) if orjson is not None else json.loads(json_bytes)
+
+
+def dump(obj, path):
+    with open(path, 'wb') as f:
+        f.write(dumps(obj))
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
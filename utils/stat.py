@@ -23,8 +23,13 @@ def remove_outliers(x: np.ndarray, IQR_factor=1.5):
 def means_without_outliers(df: pd.DataFrame, IQR_factor=1.5):
     """ Returns a Pandas Series containing the "no-outlier" mean of each column of the input DataFrame, i.e.
     means are computed after outliers of each column have been removed. """
-    d = {col: remove_outliers(df[col].values, IQR_factor).mean() for col in df.columns}
-    return pd.Series(d)  # build a dict, return it as a Series
+    # All columns are processed at once (same bounds as get_outliers_bounds, computed for each column)
+    x = df.values.astype(float)
+    Q1, Q3 = np.quantile(x, [0.25, 0.75], axis=0)
+    is_inlier = ((Q1 - (Q3 - Q1) * IQR_factor) <= x) & (x <= (Q3 + (Q3 - Q1) * IQR_factor))
+    with np.errstate(invalid='ignore', divide='ignore'):  # Empty columns: NaN mean
+        means = np.where(is_inlier, x, 0.0).sum(axis=0) / np.count_nonzero(is_inlier, axis=0)
+    return pd.Series(means, index=df.columns)
 
 
 def get_random_subset_keep_minmax(x: np.array, subset_len: int):
@@ -1,5 +1,6 @@
 import copy
 import multiprocessing.pool
+import os
 import pickle
 import queue
 import subprocess
@@ -162,7 +163,8 @@ class InterpolationTimbreToolbox(ToolboxLogger):
 
     def get_audio_sub_folders(self):
         """ :returns: The List of sub-folders of the data_root_path folder. """
-        return [f for f in self.data_root_path.iterdir() if f.is_dir()]
+        with os.scandir(self.data_root_path) as dir_entries:  # DirEntry.is_dir(): no extra stat syscall
+            return [pathlib.Path(e.path) for e in dir_entries if e.is_dir()]
 
     def _clean_folders(self):
         """
@@ -170,10 +172,10 @@ class InterpolationTimbreToolbox(ToolboxLogger):
         TODO Also remove list of folders to be analyzed by each Matlab subprocess.
         """
         for sub_dir in self.get_audio_sub_folders():
-            files_to_remove = list(sub_dir.glob('*.csv'))
-            files_to_remove += list(sub_dir.glob('*.mat'))
+            with os.scandir(sub_dir) as dir_entries:  # Single scan for both extensions
+                files_to_remove = [e.path for e in dir_entries if e.name.endswith(('.csv', '.mat'))]
             for f in files_to_remove:
-                f.unlink(missing_ok=False)
+                os.remove(f)
         for f in list(self.data_root_path.glob("*_input_args.txt")):
             f.unlink(missing_ok=False)
 
@@ -12,7 +12,10 @@ import torch
 class Spectrogram:
     """ Class for dB spectrogram computation from a raw audio waveform.
     The min spectrogram value must be provided.
-    The default windowing function is Hann. """
+    The default windowing function is Hann.
+
+    A batch of same-length waveforms (2D array, 1st dim is the batch dim) can be provided
+    to compute all spectrograms at once (3D output tensor). """
     def __init__(self, n_fft, fft_hop, min_dB, dynamic_range_dB=None, log_scale=True):
         self.n_fft = n_fft
         self.fft_hop = fft_hop
@@ -23,7 +26,7 @@ class Spectrogram:
         self.spectrogram_norm_factor = torch.fft.rfft(self.window).abs().max().item()
 
     def get_stft(self, x_wav):
-        """ Returns the complex, non-normalized STFT computed from given audio. """
+        """ Returns the complex, non-normalized STFT computed from given audio (1D, or 2D batch of waveforms). """
         warnings.filterwarnings("ignore", category=UserWarning)  # Deprecation warning from PyTorch compiled-code
         spectrogram = torch.stft(torch.tensor(x_wav, dtype=torch.float32), n_fft=self.n_fft, hop_length=self.fft_hop,
                                  window=self.window, center=True,
@@ -67,15 +70,18 @@ class MelSpectrogram(Spectrogram):
         # TODO add fmin, fmax arguments
         self.Fs = Fs
         self.n_mel_bins = n_mel_bins
+        # Same filters as librosa.feature.melspectrogram(S=..., n_mels=...), which was used with its default sr arg.
+        # norm=None for linear/mel specs magnitude compatibility
+        self.mel_basis = torch.from_numpy(librosa.filters.mel(sr=22050, n_fft=self.n_fft, n_mels=self.n_mel_bins,
+                                                              norm=None))
 
     def __call__(self, x_wav):
         """ Returns a log-scale spectrogram with limited dynamic range """
         spectrogram = self.get_stft(x_wav).abs()
         spectrogram = spectrogram / self.spectrogram_norm_factor
-        # Torch-Numpy arrays share the same memory location (very fast convert)
-        spectrogram = librosa.feature.melspectrogram(S=spectrogram, n_mels=self.n_mel_bins,
-                                                     norm=None)  # for linear/mel specs magnitude compatibility
-        return self.linear_to_log_scale(torch.from_numpy(spectrogram))
+        # (n_mels, n_freqs) x (..., n_freqs, n_frames) matrix product: also works for batches of spectrograms
+        spectrogram = torch.matmul(self.mel_basis, spectrogram)
+        return self.linear_to_log_scale(spectrogram)
 
     def mel_dB_to_STFT(self, mel_spectrogram):
         """ Inverses the Mel-filters and and log-amplitude transformations applied to a spectrogram. """